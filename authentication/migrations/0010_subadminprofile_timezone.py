@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_subadminprofile_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subadminprofile',
+            name='timezone',
+            field=models.CharField(default='UTC', max_length=50),
+        ),
+    ]
@@ -0,0 +1,150 @@
+# Generated by Django 4.2.23 on 2026-10-19 12:00
+
+import authentication.models
+from django.db import migrations, models
+
+# Frozen here (from the tz database's zone.tab and iso3166.tab) so later edits to app code can't change
+# what this migration did. Only countries whose zones all keep the same clock are listed; restaurants
+# elsewhere (the US, Canada, Australia, Brazil, Mexico, Russia, ...) are left without a timezone and
+# keep using the server clock until the owner picks their zone in the profile.
+COUNTRY_CODES = {
+    'afghanistan': 'AF', 'albania': 'AL', 'algeria': 'DZ', 'andorra': 'AD', 'angola': 'AO', 'anguilla': 'AI',
+    'antigua & barbuda': 'AG', 'argentina': 'AR', 'armenia': 'AM', 'aruba': 'AW', 'austria': 'AT',
+    'azerbaijan': 'AZ', 'bahamas': 'BS', 'bahrain': 'BH', 'bangladesh': 'BD', 'barbados': 'BB',
+    'belarus': 'BY', 'belgium': 'BE', 'belize': 'BZ', 'benin': 'BJ', 'bermuda': 'BM', 'bharat': 'IN',
+    'bhutan': 'BT', 'bolivia': 'BO', 'bosnia & herzegovina': 'BA', 'botswana': 'BW', 'britain (uk)': 'GB',
+    'british indian ocean territory': 'IO', 'brunei': 'BN', 'bulgaria': 'BG', 'burkina faso': 'BF',
+    'burundi': 'BI', 'cambodia': 'KH', 'cameroon': 'CM', 'cape verde': 'CV', 'caribbean nl': 'BQ',
+    'cayman islands': 'KY', 'central african rep.': 'CF', 'chad': 'TD', 'china': 'CN',
+    'christmas island': 'CX', 'cocos (keeling) islands': 'CC', 'colombia': 'CO', 'comoros': 'KM',
+    'congo (rep.)': 'CG', 'cook islands': 'CK', 'costa rica': 'CR', 'croatia': 'HR', 'cuba': 'CU',
+    'curaçao': 'CW', 'cyprus': 'CY', 'czech republic': 'CZ', 'czechia': 'CZ', "côte d'ivoire": 'CI',
+    'denmark': 'DK', 'djibouti': 'DJ', 'dominica': 'DM', 'dominican republic': 'DO', 'east timor': 'TL',
+    'egypt': 'EG', 'el salvador': 'SV', 'england': 'GB', 'equatorial guinea': 'GQ', 'eritrea': 'ER',
+    'estonia': 'EE', 'eswatini (swaziland)': 'SZ', 'ethiopia': 'ET', 'falkland islands': 'FK',
+    'faroe islands': 'FO', 'fiji': 'FJ', 'finland': 'FI', 'france': 'FR', 'french guiana': 'GF',
+    'french s. terr.': 'TF', 'gabon': 'GA', 'gambia': 'GM', 'georgia': 'GE', 'germany': 'DE', 'ghana': 'GH',
+    'gibraltar': 'GI', 'great britain': 'GB', 'greece': 'GR', 'grenada': 'GD', 'guadeloupe': 'GP',
+    'guam': 'GU', 'guatemala': 'GT', 'guernsey': 'GG', 'guinea': 'GN', 'guinea-bissau': 'GW', 'guyana': 'GY',
+    'haiti': 'HT', 'honduras': 'HN', 'hong kong': 'HK', 'hungary': 'HU', 'iceland': 'IS', 'india': 'IN',
+    'iran': 'IR', 'iraq': 'IQ', 'ireland': 'IE', 'isle of man': 'IM', 'israel': 'IL', 'italy': 'IT',
+    'ivory coast': 'CI', 'jamaica': 'JM', 'japan': 'JP', 'jersey': 'JE', 'jordan': 'JO', 'kenya': 'KE',
+    'korea': 'KR', 'korea (north)': 'KP', 'korea (south)': 'KR', 'ksa': 'SA', 'kuwait': 'KW',
+    'kyrgyzstan': 'KG', 'laos': 'LA', 'latvia': 'LV', 'lebanon': 'LB', 'lesotho': 'LS', 'liberia': 'LR',
+    'libya': 'LY', 'liechtenstein': 'LI', 'lithuania': 'LT', 'luxembourg': 'LU', 'macau': 'MO',
+    'madagascar': 'MG', 'malawi': 'MW', 'malaysia': 'MY', 'maldives': 'MV', 'mali': 'ML', 'malta': 'MT',
+    'martinique': 'MQ', 'mauritania': 'MR', 'mauritius': 'MU', 'mayotte': 'YT', 'moldova': 'MD',
+    'monaco': 'MC', 'montenegro': 'ME', 'montserrat': 'MS', 'morocco': 'MA', 'mozambique': 'MZ',
+    'myanmar (burma)': 'MM', 'namibia': 'NA', 'nauru': 'NR', 'nepal': 'NP', 'netherlands': 'NL',
+    'new caledonia': 'NC', 'nicaragua': 'NI', 'niger': 'NE', 'nigeria': 'NG', 'niue': 'NU',
+    'norfolk island': 'NF', 'north macedonia': 'MK', 'northern mariana islands': 'MP', 'norway': 'NO',
+    'oman': 'OM', 'pakistan': 'PK', 'palau': 'PW', 'panama': 'PA', 'paraguay': 'PY', 'peru': 'PE',
+    'philippines': 'PH', 'pitcairn': 'PN', 'poland': 'PL', 'puerto rico': 'PR', 'qatar': 'QA',
+    'romania': 'RO', 'rwanda': 'RW', 'réunion': 'RE', 'samoa (american)': 'AS', 'samoa (western)': 'WS',
+    'san marino': 'SM', 'sao tome & principe': 'ST', 'saudi arabia': 'SA', 'scotland': 'GB', 'senegal': 'SN',
+    'serbia': 'RS', 'seychelles': 'SC', 'sierra leone': 'SL', 'singapore': 'SG', 'slovakia': 'SK',
+    'slovenia': 'SI', 'solomon islands': 'SB', 'somalia': 'SO', 'south africa': 'ZA',
+    'south georgia & the south sandwich islands': 'GS', 'south korea': 'KR', 'south sudan': 'SS',
+    'sri lanka': 'LK', 'st barthelemy': 'BL', 'st helena': 'SH', 'st kitts & nevis': 'KN', 'st lucia': 'LC',
+    'st maarten (dutch)': 'SX', 'st martin (french)': 'MF', 'st pierre & miquelon': 'PM', 'st vincent': 'VC',
+    'sudan': 'SD', 'suriname': 'SR', 'svalbard & jan mayen': 'SJ', 'sweden': 'SE', 'switzerland': 'CH',
+    'syria': 'SY', 'taiwan': 'TW', 'tajikistan': 'TJ', 'tanzania': 'TZ', 'thailand': 'TH',
+    'the netherlands': 'NL', 'togo': 'TG', 'tokelau': 'TK', 'tonga': 'TO', 'trinidad & tobago': 'TT',
+    'tunisia': 'TN', 'turkey': 'TR', 'turkiye': 'TR', 'turkmenistan': 'TM', 'turks & caicos is': 'TC',
+    'tuvalu': 'TV', 'uae': 'AE', 'uganda': 'UG', 'uk': 'GB', 'united arab emirates': 'AE',
+    'united kingdom': 'GB', 'uruguay': 'UY', 'uzbekistan': 'UZ', 'vanuatu': 'VU', 'vatican city': 'VA',
+    'venezuela': 'VE', 'vietnam': 'VN', 'virgin islands (uk)': 'VG', 'virgin islands (us)': 'VI',
+    'wales': 'GB', 'wallis & futuna': 'WF', 'western sahara': 'EH', 'yemen': 'YE', 'zambia': 'ZM',
+    'zimbabwe': 'ZW', 'åland islands': 'AX',
+}
+
+COUNTRY_TIMEZONES = {
+    'AD': 'Europe/Andorra', 'AE': 'Asia/Dubai', 'AF': 'Asia/Kabul', 'AG': 'America/Antigua',
+    'AI': 'America/Anguilla', 'AL': 'Europe/Tirane', 'AM': 'Asia/Yerevan', 'AO': 'Africa/Luanda',
+    'AR': 'America/Argentina/Buenos_Aires', 'AS': 'Pacific/Pago_Pago', 'AT': 'Europe/Vienna',
+    'AW': 'America/Aruba', 'AX': 'Europe/Mariehamn', 'AZ': 'Asia/Baku', 'BA': 'Europe/Sarajevo',
+    'BB': 'America/Barbados', 'BD': 'Asia/Dhaka', 'BE': 'Europe/Brussels', 'BF': 'Africa/Ouagadougou',
+    'BG': 'Europe/Sofia', 'BH': 'Asia/Bahrain', 'BI': 'Africa/Bujumbura', 'BJ': 'Africa/Porto-Novo',
+    'BL': 'America/St_Barthelemy', 'BM': 'Atlantic/Bermuda', 'BN': 'Asia/Brunei', 'BO': 'America/La_Paz',
+    'BQ': 'America/Kralendijk', 'BS': 'America/Nassau', 'BT': 'Asia/Thimphu', 'BW': 'Africa/Gaborone',
+    'BY': 'Europe/Minsk', 'BZ': 'America/Belize', 'CC': 'Indian/Cocos', 'CF': 'Africa/Bangui',
+    'CG': 'Africa/Brazzaville', 'CH': 'Europe/Zurich', 'CI': 'Africa/Abidjan', 'CK': 'Pacific/Rarotonga',
+    'CM': 'Africa/Douala', 'CN': 'Asia/Shanghai', 'CO': 'America/Bogota', 'CR': 'America/Costa_Rica',
+    'CU': 'America/Havana', 'CV': 'Atlantic/Cape_Verde', 'CW': 'America/Curacao', 'CX': 'Indian/Christmas',
+    'CY': 'Asia/Nicosia', 'CZ': 'Europe/Prague', 'DE': 'Europe/Berlin', 'DJ': 'Africa/Djibouti',
+    'DK': 'Europe/Copenhagen', 'DM': 'America/Dominica', 'DO': 'America/Santo_Domingo',
+    'DZ': 'Africa/Algiers', 'EE': 'Europe/Tallinn', 'EG': 'Africa/Cairo', 'EH': 'Africa/El_Aaiun',
+    'ER': 'Africa/Asmara', 'ET': 'Africa/Addis_Ababa', 'FI': 'Europe/Helsinki', 'FJ': 'Pacific/Fiji',
+    'FK': 'Atlantic/Stanley', 'FO': 'Atlantic/Faroe', 'FR': 'Europe/Paris', 'GA': 'Africa/Libreville',
+    'GB': 'Europe/London', 'GD': 'America/Grenada', 'GE': 'Asia/Tbilisi', 'GF': 'America/Cayenne',
+    'GG': 'Europe/Guernsey', 'GH': 'Africa/Accra', 'GI': 'Europe/Gibraltar', 'GM': 'Africa/Banjul',
+    'GN': 'Africa/Conakry', 'GP': 'America/Guadeloupe', 'GQ': 'Africa/Malabo', 'GR': 'Europe/Athens',
+    'GS': 'Atlantic/South_Georgia', 'GT': 'America/Guatemala', 'GU': 'Pacific/Guam', 'GW': 'Africa/Bissau',
+    'GY': 'America/Guyana', 'HK': 'Asia/Hong_Kong', 'HN': 'America/Tegucigalpa', 'HR': 'Europe/Zagreb',
+    'HT': 'America/Port-au-Prince', 'HU': 'Europe/Budapest', 'IE': 'Europe/Dublin', 'IL': 'Asia/Jerusalem',
+    'IM': 'Europe/Isle_of_Man', 'IN': 'Asia/Kolkata', 'IO': 'Indian/Chagos', 'IQ': 'Asia/Baghdad',
+    'IR': 'Asia/Tehran', 'IS': 'Atlantic/Reykjavik', 'IT': 'Europe/Rome', 'JE': 'Europe/Jersey',
+    'JM': 'America/Jamaica', 'JO': 'Asia/Amman', 'JP': 'Asia/Tokyo', 'KE': 'Africa/Nairobi',
+    'KG': 'Asia/Bishkek', 'KH': 'Asia/Phnom_Penh', 'KM': 'Indian/Comoro', 'KN': 'America/St_Kitts',
+    'KP': 'Asia/Pyongyang', 'KR': 'Asia/Seoul', 'KW': 'Asia/Kuwait', 'KY': 'America/Cayman',
+    'LA': 'Asia/Vientiane', 'LB': 'Asia/Beirut', 'LC': 'America/St_Lucia', 'LI': 'Europe/Vaduz',
+    'LK': 'Asia/Colombo', 'LR': 'Africa/Monrovia', 'LS': 'Africa/Maseru', 'LT': 'Europe/Vilnius',
+    'LU': 'Europe/Luxembourg', 'LV': 'Europe/Riga', 'LY': 'Africa/Tripoli', 'MA': 'Africa/Casablanca',
+    'MC': 'Europe/Monaco', 'MD': 'Europe/Chisinau', 'ME': 'Europe/Podgorica', 'MF': 'America/Marigot',
+    'MG': 'Indian/Antananarivo', 'MK': 'Europe/Skopje', 'ML': 'Africa/Bamako', 'MM': 'Asia/Yangon',
+    'MO': 'Asia/Macau', 'MP': 'Pacific/Saipan', 'MQ': 'America/Martinique', 'MR': 'Africa/Nouakchott',
+    'MS': 'America/Montserrat', 'MT': 'Europe/Malta', 'MU': 'Indian/Mauritius', 'MV': 'Indian/Maldives',
+    'MW': 'Africa/Blantyre', 'MY': 'Asia/Kuala_Lumpur', 'MZ': 'Africa/Maputo', 'NA': 'Africa/Windhoek',
+    'NC': 'Pacific/Noumea', 'NE': 'Africa/Niamey', 'NF': 'Pacific/Norfolk', 'NG': 'Africa/Lagos',
+    'NI': 'America/Managua', 'NL': 'Europe/Amsterdam', 'NO': 'Europe/Oslo', 'NP': 'Asia/Kathmandu',
+    'NR': 'Pacific/Nauru', 'NU': 'Pacific/Niue', 'OM': 'Asia/Muscat', 'PA': 'America/Panama',
+    'PE': 'America/Lima', 'PH': 'Asia/Manila', 'PK': 'Asia/Karachi', 'PL': 'Europe/Warsaw',
+    'PM': 'America/Miquelon', 'PN': 'Pacific/Pitcairn', 'PR': 'America/Puerto_Rico', 'PW': 'Pacific/Palau',
+    'PY': 'America/Asuncion', 'QA': 'Asia/Qatar', 'RE': 'Indian/Reunion', 'RO': 'Europe/Bucharest',
+    'RS': 'Europe/Belgrade', 'RW': 'Africa/Kigali', 'SA': 'Asia/Riyadh', 'SB': 'Pacific/Guadalcanal',
+    'SC': 'Indian/Mahe', 'SD': 'Africa/Khartoum', 'SE': 'Europe/Stockholm', 'SG': 'Asia/Singapore',
+    'SH': 'Atlantic/St_Helena', 'SI': 'Europe/Ljubljana', 'SJ': 'Arctic/Longyearbyen',
+    'SK': 'Europe/Bratislava', 'SL': 'Africa/Freetown', 'SM': 'Europe/San_Marino', 'SN': 'Africa/Dakar',
+    'SO': 'Africa/Mogadishu', 'SR': 'America/Paramaribo', 'SS': 'Africa/Juba', 'ST': 'Africa/Sao_Tome',
+    'SV': 'America/El_Salvador', 'SX': 'America/Lower_Princes', 'SY': 'Asia/Damascus', 'SZ': 'Africa/Mbabane',
+    'TC': 'America/Grand_Turk', 'TD': 'Africa/Ndjamena', 'TF': 'Indian/Kerguelen', 'TG': 'Africa/Lome',
+    'TH': 'Asia/Bangkok', 'TJ': 'Asia/Dushanbe', 'TK': 'Pacific/Fakaofo', 'TL': 'Asia/Dili',
+    'TM': 'Asia/Ashgabat', 'TN': 'Africa/Tunis', 'TO': 'Pacific/Tongatapu', 'TR': 'Europe/Istanbul',
+    'TT': 'America/Port_of_Spain', 'TV': 'Pacific/Funafuti', 'TW': 'Asia/Taipei',
+    'TZ': 'Africa/Dar_es_Salaam', 'UG': 'Africa/Kampala', 'UY': 'America/Montevideo', 'UZ': 'Asia/Tashkent',
+    'VA': 'Europe/Vatican', 'VC': 'America/St_Vincent', 'VE': 'America/Caracas', 'VG': 'America/Tortola',
+    'VI': 'America/St_Thomas', 'VN': 'Asia/Ho_Chi_Minh', 'VU': 'Pacific/Efate', 'WF': 'Pacific/Wallis',
+    'WS': 'Pacific/Apia', 'YE': 'Asia/Aden', 'YT': 'Indian/Mayotte', 'ZA': 'Africa/Johannesburg',
+    'ZM': 'Africa/Lusaka', 'ZW': 'Africa/Harare',
+}
+
+
+def timezone_from_country(apps, schema_editor):
+    """Existing restaurants got 'UTC' when the field was added; read their hours in their country's zone"""
+    SubAdminProfile = apps.get_model('authentication', 'SubAdminProfile')
+
+    for profile in SubAdminProfile.objects.filter(timezone='UTC').only('id', 'country'):
+        country = (profile.country or '').strip()
+        if not country:
+            # A profile still being set up in the product's home market
+            tz_name = 'Asia/Kolkata'
+        else:
+            code = country.upper() if len(country) == 2 else COUNTRY_CODES.get(country.lower())
+            tz_name = COUNTRY_TIMEZONES.get(code)
+        SubAdminProfile.objects.filter(pk=profile.pk).update(timezone=tz_name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_subadminprofile_timezone'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subadminprofile',
+            name='timezone',
+            field=models.CharField(blank=True, default=authentication.models.default_restaurant_timezone, max_length=50, null=True),
+        ),
+        migrations.RunPython(timezone_from_country, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 # accounts/models.py
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.utils.timezone import now
@@ -56,6 +57,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
 
 
+def default_restaurant_timezone():
+    return getattr(settings, 'RESTAURANT_DEFAULT_TIMEZONE', 'Asia/Kolkata')
+
+
 class SubAdminProfile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='subadmin_profile')
     profile_image = models.ImageField(upload_to='profile_images/subadmins/', blank=True, null=True)
@@ -69,6 +74,8 @@ class SubAdminProfile(models.Model):
     country = models.CharField(max_length=100)
     website_url = models.URLField(blank=True, null=True)
     restaurant_description = models.TextField(blank=True, null=True)
+    # IANA name, e.g. 'Asia/Kolkata'; unset means the server clock (settings.TIME_ZONE)
+    timezone = models.CharField(max_length=50, blank=True, null=True, default=default_restaurant_timezone)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
     def __str__(self):
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from .models import CustomUser, SubAdminProfile, UserProfile
 from django.contrib.auth import authenticate
+from zoneinfo import available_timezones
+
+# Scanned from the tz database once per process
+TIMEZONES = frozenset(available_timezones())
 
 # ---------- User Registration Serializer ----------
 class RegisterSerializer(serializers.ModelSerializer):
@@ -35,6 +39,12 @@ class SubAdminProfileSerializer(serializers.ModelSerializer):
         model = SubAdminProfile
         exclude = ['user']
 
+    def validate_timezone(self, value):
+        # Blank clears it: the restaurant's hours go back to the server clock
+        if value and value not in TIMEZONES:
+            raise serializers.ValidationError("Enter a valid IANA timezone, e.g. 'America/New_York'.")
+        return value or None
+
     def update(self, instance, validated_data):
         user_data = validated_data.pop('user', {})
         for attr, value in user_data.items():
@@ -1,3 +1,38 @@
+from importlib import import_module
+
+from django.apps import apps
 from django.test import TestCase
 
-# Create your tests here.
+from .models import CustomUser, SubAdminProfile
+
+timezone_migration = import_module('authentication.migrations.0011_subadminprofile_timezone_from_country')
+
+
+class TimezoneBackfillTests(TestCase):
+    def make_profile(self, email, country):
+        profile = CustomUser.objects.create_user(email, 'pw', role='subdir').subadmin_profile
+        SubAdminProfile.objects.filter(pk=profile.pk).update(country=country, timezone='UTC')
+        return profile
+
+    def test_countries_with_one_clock_get_their_zone(self):
+        india = self.make_profile('in@example.com', 'India')
+        germany = self.make_profile('de@example.com', ' germany ')
+        kenya = self.make_profile('ke@example.com', 'KE')
+        unset = self.make_profile('new@example.com', '')
+
+        timezone_migration.timezone_from_country(apps, None)
+
+        zones = dict(SubAdminProfile.objects.values_list('pk', 'timezone'))
+        self.assertEqual(zones[india.pk], 'Asia/Kolkata')
+        self.assertEqual(zones[germany.pk], 'Europe/Berlin')
+        self.assertEqual(zones[kenya.pk], 'Africa/Nairobi')
+        self.assertEqual(zones[unset.pk], 'Asia/Kolkata')
+
+    def test_countries_spanning_zones_are_left_for_the_owner(self):
+        us = self.make_profile('us@example.com', 'United States')
+        unknown = self.make_profile('xx@example.com', 'Atlantis')
+
+        timezone_migration.timezone_from_country(apps, None)
+
+        self.assertIsNone(SubAdminProfile.objects.get(pk=us.pk).timezone)
+        self.assertIsNone(SubAdminProfile.objects.get(pk=unknown.pk).timezone)
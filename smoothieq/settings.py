@@ -64,6 +64,26 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Shared cache for IVR snapshots and call state; Redis when REDIS_URL is set
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        },
+    }
+else:
+    # Without Redis the cache lives in a table (created by `migrate`), never in process
+    # memory: turn locks, snapshot and routing versions and speculative turns must be seen by every worker
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+            "LOCATION": "ivr_cache",
+        },
+    }
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
@@ -192,10 +212,117 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
 
 
+# Phone routing index (subadmin.phone_index)
+PHONE_DEFAULT_COUNTRY_CODE = config('PHONE_DEFAULT_COUNTRY_CODE', default='91')
+PHONE_INDEX_CACHE_TTL = 300
+# Business hours of new restaurants are read in this zone until they pick their own (subadmin.schedule)
+RESTAURANT_DEFAULT_TIMEZONE = config('RESTAURANT_DEFAULT_TIMEZONE', default='Asia/Kolkata')
+
+# Per-restaurant IVR snapshot (subadmin.snapshot)
+RESTAURANT_SNAPSHOT_TTL = 60 * 60 * 24
+
+# Live IVR call state (twilio_bot.session_store)
+# Call state stays in the cache only when that cache is Redis; otherwise each turn uses the UserSession row
+IVR_SESSION_STORE = config(
+    'IVR_SESSION_STORE',
+    default='twilio_bot.session_store.CacheSessionStore' if REDIS_URL else 'twilio_bot.session_store.DatabaseSessionStore',
+)
+IVR_SESSION_TTL = 60 * 60
+
+# Twilio webhook retry dedup (twilio_bot.idempotency)
+IVR_TURN_DEDUP_TTL = 120
+IVR_TURN_LOCK_TIMEOUT = 15
+IVR_TURN_DEDUP_WAIT = 10
+
+# Speculative turns from Gather partial speech results (twilio_bot.speculation)
+IVR_PARTIAL_RESULTS = config('IVR_PARTIAL_RESULTS', default=True, cast=bool)
+IVR_SPECULATION_TTL = 60
+
+# Real-time IVR over Twilio Media Streams (twilio_bot.consumers.TwilioMediaStreamConsumer);
+# e.g. wss://example.com/ws/twilio_media/ - empty keeps the <Gather> webhook flow
+IVR_MEDIA_STREAM_URL = config('IVR_MEDIA_STREAM_URL', default='')
+IVR_VAD_RMS_THRESHOLD = 500
+IVR_VAD_SILENCE_MS = 600
+IVR_VAD_MIN_SPEECH_MS = 200
+IVR_VAD_MAX_UTTERANCE_MS = 15000
+
+# Pre-rendered prompt recordings under MEDIA_ROOT/prompt_audio (twilio_bot.prompt_audio, render_prompt_audio)
+IVR_PROMPT_AUDIO = config('IVR_PROMPT_AUDIO', default=True, cast=bool)
+IVR_PROMPT_VOICE = 'en-US-JennyNeural'
+# Seconds each worker keeps the list of rendered prompts before re-reading it from the cache
+IVR_PROMPT_AUDIO_MANIFEST_TTL = 60
+
+# Menu/item lists are read out this many options per page ("press 9 for more"); at most 8
+IVR_MENU_PAGE_SIZE = 5
+
+# Per-worker admission control for new calls (twilio_bot.admission)
+IVR_ADMISSION_MAX_IN_FLIGHT = config('IVR_ADMISSION_MAX_IN_FLIGHT', default=40, cast=int)
+IVR_ADMISSION_MAX_STREAMS = config('IVR_ADMISSION_MAX_STREAMS', default=25, cast=int)
+IVR_ADMISSION_MAX_QUEUED_TURNS = 20
+IVR_BUSY_SMS_COOLDOWN = 60 * 10
+
+# Repeat-caller profiles (subadmin.caller_profile)
+IVR_CALLER_PROFILE_TTL = 60 * 60
+IVR_CALLER_RECENT_ORDERS = 3
+
+# Live call registry for debug/monitoring (twilio_bot.session_registry)
+IVR_LIVE_SESSION_TTL = 60 * 15
+IVR_LIVE_SESSION_MAX = 10000
+
+# Order notification queue (twilio_bot.notifications, run_notification_worker)
+NOTIFICATION_RETRY_BASE_SECONDS = 30
+NOTIFICATION_RETRY_MAX_SECONDS = 60 * 60
+NOTIFICATION_LOCK_TIMEOUT_SECONDS = 300
+
+# Twilio call status events -> CallRecord (twilio_bot.call_events, flush_call_events)
+CALL_EVENTS_QUEUE_KEY = 'twilio:call-events'
+CALL_EVENTS_BATCH_SIZE = 500
+
+# Subscription entitlements (superadmin.entitlements)
+PLAN_VALIDITY_DAYS = 90
+ENTITLEMENT_CACHE_TTL = 60
+
+
 TWILIO_ACCOUNT_SID = config('TWILIO_ACCOUNT_SID')
 TWILIO_AUTH_TOKEN = config('TWILIO_AUTH_TOKEN')
 TWILIO_PHONE_NUMBER = config('TWILIO_PHONE_NUMBER')
 
+# Shared Twilio client and outbound SMS throttling (twilio_bot.twilio_client)
+TWILIO_HTTP_TIMEOUT = 10
+TWILIO_SMS_RATE_PER_SECOND = config('TWILIO_SMS_RATE_PER_SECOND', default=10, cast=float)
+TWILIO_SMS_BURST = config('TWILIO_SMS_BURST', default=20, cast=int)
+TWILIO_SMS_WORKERS = 8
+# Public base URL of this API, used for Twilio status callbacks (empty disables them)
+TWILIO_STATUS_CALLBACK_BASE_URL = config('TWILIO_STATUS_CALLBACK_BASE_URL', default='')
+
+# Outbound call campaigns (twilio_bot.campaigns, run_call_campaigns)
+TWILIO_CALLS_PER_SECOND = config('TWILIO_CALLS_PER_SECOND', default=1, cast=float)
+TWILIO_CALLS_BURST = 1
+CAMPAIGN_DIALER_WORKERS = 8
+CAMPAIGN_MAX_RECIPIENTS = 10000
+CAMPAIGN_CALL_TIMEOUT_SECONDS = 30 * 60
+
+# Vapi voice assistant calls (subadmin.vapi_client)
+VAPI_API_KEY = config('VAPI_API_KEY', default='')
+VAPI_BASE_URL = 'https://api.vapi.ai'
+VAPI_CONNECT_TIMEOUT = 3.05
+VAPI_READ_TIMEOUT = 10
+# Seconds the primary endpoint gets before the fallback is raced against it. Off (None: fall back only
+# on failure) because both endpoints accepting the same POST dials the customer twice
+VAPI_HEDGE_AFTER = None
+VAPI_HTTP_WORKERS = 8
+# Persistent per-restaurant assistants (subadmin.vapi_assistants, sync_vapi_assistants)
+VAPI_VOICE_ID = config('VAPI_VOICE_ID', default='21m00Tcm4TlvDq8ikWAM')
+# Order event webhooks to restaurant POS systems (twilio_bot.order_webhooks, run_webhook_dispatcher)
+WEBHOOK_BATCH_SIZE = 50
+WEBHOOK_WORKERS = 8
+WEBHOOK_CONNECT_TIMEOUT = 3.05
+WEBHOOK_READ_TIMEOUT = 10
+WEBHOOK_RETRY_BASE_SECONDS = 10
+WEBHOOK_RETRY_MAX_SECONDS = 60 * 60
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_LOCK_TIMEOUT_SECONDS = 300
+
 
 OPENAI_API_KEY = config('OPENAI_API_KEY')
 
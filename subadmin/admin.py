@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import  BusinessHour, Menu, RestaurantLink, SMSFallbackSettings, UserSession, Order, OrderItem, MenuItem
+from .models import  BusinessHour, Menu, RestaurantLink, SMSFallbackSettings, UserSession, Order, OrderItem, MenuItem, RestaurantPhoneNumber, RestaurantAssistant
 
 
 
@@ -63,4 +63,23 @@ class MenuItemAdmin(admin.ModelAdmin):
     search_fields = ('name', 'menu__name')
     list_filter = ('menu__subadmin_profile', 'is_available')   
 
-admin.site.register(MenuItem, MenuItemAdmin)
\ No newline at end of file
+admin.site.register(MenuItem, MenuItemAdmin)
+
+
+
+class RestaurantPhoneNumberAdmin(admin.ModelAdmin):
+    list_display = ('id', 'phone_number', 'restaurant', 'is_primary', 'created_at')
+    search_fields = ('phone_number', 'national_number', 'restaurant__restaurant_name')
+    list_filter = ('is_primary',)
+    readonly_fields = ('national_number',)
+
+admin.site.register(RestaurantPhoneNumber, RestaurantPhoneNumberAdmin)
+
+
+
+class RestaurantAssistantAdmin(admin.ModelAdmin):
+    list_display = ('id', 'restaurant', 'assistant_id', 'synced_at', 'updated_at')
+    search_fields = ('assistant_id', 'restaurant__restaurant_name')
+    readonly_fields = ('payload_hash', 'synced_at', 'last_error')
+
+admin.site.register(RestaurantAssistant, RestaurantAssistantAdmin)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SubadminConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'subadmin'
+
+    def ready(self):
+        import subadmin.signals
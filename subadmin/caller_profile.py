@@ -0,0 +1,115 @@
+# caller_profile.py
+import re
+from dataclasses import dataclass
+from typing import Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+PROFILE_KEY = "ivr:caller:{restaurant_id}:{phone}"
+
+
+@dataclass(frozen=True)
+class PastOrderItem:
+    item_id: int
+    name: str
+    quantity: int
+
+
+@dataclass(frozen=True)
+class PastOrder:
+    order_id: int
+    menu_id: int
+    items: Tuple[PastOrderItem, ...]
+    created_at: object
+
+
+@dataclass(frozen=True)
+class CallerProfile:
+    """A caller's most recent orders at one restaurant"""
+    restaurant_id: int
+    phone: str
+    recent_orders: Tuple[PastOrder, ...] = ()
+
+    @property
+    def last_order(self):
+        return self.recent_orders[0] if self.recent_orders else None
+
+
+def phone_key(phone_number):
+    """Last 10 digits of the caller number, the form the IVR stores in Order.customer_phone"""
+    digits = re.sub(r'\D', '', phone_number or '')[-10:]
+    return digits or None
+
+
+def _ttl():
+    return getattr(settings, 'IVR_CALLER_PROFILE_TTL', 60 * 60)
+
+
+def build_profile(restaurant_id, phone):
+    """Two queries on the (restaurant, customer_phone, created_at) index: orders, then their items"""
+    from .models import Order, OrderItem
+
+    orders = (
+        Order.objects
+        .filter(restaurant_id=restaurant_id, customer_phone=phone)
+        .order_by('-created_at')
+        .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('menu_item')))
+        [:getattr(settings, 'IVR_CALLER_RECENT_ORDERS', 3)]
+    )
+    return CallerProfile(
+        restaurant_id=restaurant_id,
+        phone=phone,
+        recent_orders=tuple(
+            PastOrder(
+                order_id=order.pk,
+                menu_id=order.menu_id,
+                items=tuple(
+                    PastOrderItem(item_id=item.menu_item_id, name=item.menu_item.name, quantity=item.quantity)
+                    for item in order.items.all()
+                ),
+                created_at=order.created_at,
+            )
+            for order in orders
+        ),
+    )
+
+
+def get_profile(restaurant_id, phone_number):
+    """Cached profile for a caller (new callers are cached too, as an empty profile)"""
+    phone = phone_key(phone_number)
+    if restaurant_id is None or phone is None:
+        return None
+
+    key = PROFILE_KEY.format(restaurant_id=restaurant_id, phone=phone)
+    profile = cache.get(key)
+    if profile is None:
+        profile = build_profile(restaurant_id, phone)
+        cache.set(key, profile, timeout=_ttl())
+    return profile
+
+
+async def aget_profile(restaurant_id, phone_number):
+    phone = phone_key(phone_number)
+    if restaurant_id is None or phone is None:
+        return None
+
+    key = PROFILE_KEY.format(restaurant_id=restaurant_id, phone=phone)
+    profile = await cache.aget(key)
+    if profile is None:
+        # prefetch_related() can't be iterated asynchronously on Django 4.2
+        profile = await sync_to_async(build_profile)(restaurant_id, phone)
+        await cache.aset(key, profile, timeout=_ttl())
+    return profile
+
+
+def invalidate(restaurant_id, phone_number):
+    """Drop the cached profile once the current transaction commits (its items are written by then)"""
+    phone = phone_key(phone_number)
+    if restaurant_id is None or phone is None:
+        return
+    key = PROFILE_KEY.format(restaurant_id=restaurant_id, phone=phone)
+    transaction.on_commit(lambda: cache.delete(key))
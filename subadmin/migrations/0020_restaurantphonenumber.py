@@ -0,0 +1,78 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:03
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copies of subadmin.phone_index as of this migration, so later edits there can't change its result.
+# The country code is PHONE_DEFAULT_COUNTRY_CODE's default when this was written, not the live setting.
+DEFAULT_COUNTRY_CODE = '91'
+
+
+def to_e164(phone_number):
+    if not phone_number:
+        return None
+
+    raw = str(phone_number).strip()
+    digits = re.sub(r'\D', '', raw)
+    if not digits:
+        return None
+
+    if raw.startswith('+') or raw.startswith('00'):
+        return f"+{digits[2:] if raw.startswith('00') else digits}"
+
+    if len(digits) == 10:
+        return f"+{DEFAULT_COUNTRY_CODE}{digits}"
+
+    return f"+{digits}"
+
+
+def national_number(phone_number):
+    digits = re.sub(r'\D', '', str(phone_number or ''))
+    return digits[-10:] if digits else ''
+
+
+def populate_routing_numbers(apps, schema_editor):
+    SubAdminProfile = apps.get_model('authentication', 'SubAdminProfile')
+    RestaurantPhoneNumber = apps.get_model('subadmin', 'RestaurantPhoneNumber')
+
+    seen = set()
+    for profile in SubAdminProfile.objects.order_by('id'):
+        e164 = to_e164(profile.phone_number)
+        if not e164 or e164 in seen:
+            continue
+        seen.add(e164)
+        RestaurantPhoneNumber.objects.create(
+            restaurant=profile,
+            phone_number=e164,
+            national_number=national_number(e164),
+            is_primary=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0009_subadminprofile_created_at'),
+        ('subadmin', '0019_alter_smsfallbacksettings_restaurant'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantPhoneNumber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(help_text='Normalized E.164 number, e.g. +15551234567', max_length=20, unique=True)),
+                ('national_number', models.CharField(db_index=True, help_text='Last 10 digits, used when the country code is ambiguous', max_length=15)),
+                ('is_primary', models.BooleanField(default=False, help_text='Kept in sync with SubAdminProfile.phone_number')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='routing_numbers', to='authentication.subadminprofile')),
+            ],
+            options={
+                'ordering': ['restaurant', '-is_primary', 'phone_number'],
+            },
+        ),
+        migrations.RunPython(populate_routing_numbers, migrations.RunPython.noop),
+    ]
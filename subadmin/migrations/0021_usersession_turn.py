@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subadmin', '0020_restaurantphonenumber'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='turn',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
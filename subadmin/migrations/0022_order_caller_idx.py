@@ -0,0 +1,17 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subadmin', '0021_usersession_turn'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'customer_phone', '-created_at'], name='order_caller_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('subadmin', '0022_order_caller_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usersession',
+            name='page',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0010_subadminprofile_timezone'),
+        ('subadmin', '0023_usersession_page'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantAssistant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assistant_id', models.CharField(blank=True, max_length=100)),
+                ('payload_hash', models.CharField(blank=True, db_index=True, help_text='SHA-256 of the assistant config last pushed to Vapi', max_length=64)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='vapi_assistant', to='authentication.subadminprofile')),
+            ],
+        ),
+    ]
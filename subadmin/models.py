@@ -1,3 +1,4 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 from authentication.models import SubAdminProfile, CustomUser
@@ -79,6 +80,50 @@ class RestaurantLink(models.Model):
     
 
 
+class RestaurantPhoneNumber(models.Model):
+    """Routing table mapping dialed numbers (E.164) to restaurants"""
+    restaurant = models.ForeignKey(SubAdminProfile, on_delete=models.CASCADE, related_name='routing_numbers')
+    phone_number = models.CharField(max_length=20, unique=True, help_text="Normalized E.164 number, e.g. +15551234567")
+    national_number = models.CharField(max_length=15, db_index=True, help_text="Last 10 digits, used when the country code is ambiguous")
+    is_primary = models.BooleanField(default=False, help_text="Kept in sync with SubAdminProfile.phone_number")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['restaurant', '-is_primary', 'phone_number']
+
+    def normalize(self):
+        from .phone_index import to_e164, national_number
+        e164 = to_e164(self.phone_number)
+        if not e164:
+            raise ValidationError({'phone_number': f"{self.phone_number!r} is not a valid phone number."})
+        self.phone_number = e164
+        self.national_number = national_number(e164)
+
+    def clean(self):
+        self.normalize()
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.phone_number} -> {self.restaurant.restaurant_name}"
+
+
+class RestaurantAssistant(models.Model):
+    """The persistent Vapi assistant registered for a restaurant (subadmin.vapi_assistants)"""
+    restaurant = models.OneToOneField(SubAdminProfile, on_delete=models.CASCADE, related_name='vapi_assistant')
+    assistant_id = models.CharField(max_length=100, blank=True)
+    payload_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the assistant config last pushed to Vapi")
+    synced_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.assistant_id or 'unregistered'} -> {self.restaurant.restaurant_name}"
+
+
+
 class SMSFallbackSettings(models.Model):
     restaurant = models.OneToOneField(
         CustomUser,
@@ -91,6 +136,19 @@ class SMSFallbackSettings(models.Model):
     is_active = models.BooleanField(default=True)
     last_updated = models.DateTimeField(auto_now=True)
 
+    def get_processed_message(self, profile=None):
+        """Fill the {restaurant_name}/{phone_number}/{website_url} placeholders"""
+        profile = profile or self.restaurant.sub_admin_profile
+        values = {
+            'restaurant_name': getattr(profile, 'restaurant_name', '') or 'our restaurant',
+            'phone_number': getattr(profile, 'phone_number', '') or '',
+            'website_url': getattr(profile, 'website_url', '') or '',
+        }
+        message = self.message
+        for placeholder, value in values.items():
+            message = message.replace('{' + placeholder + '}', value)
+        return message
+
     def __str__(self):
         return f"SMS Fallback for {self.message}"
 
@@ -104,6 +162,8 @@ class UserSession(models.Model):
     selected_menu = models.ForeignKey(Menu, null=True, blank=True, on_delete=models.SET_NULL)
     selected_items = models.JSONField(default=list)  
     customer_info = models.JSONField(default=dict)
+    turn = models.PositiveIntegerField(default=0)
+    page = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -136,5 +196,11 @@ class Order(models.Model):
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            # Repeat-caller lookup (subadmin.caller_profile)
+            models.Index(fields=['restaurant', 'customer_phone', '-created_at'], name='order_caller_idx'),
+        ]
+    
     def __str__(self):
         return f"Order #{self.id} - {self.customer_name}"
\ No newline at end of file
@@ -0,0 +1,216 @@
+# phone_index.py
+import logging
+import re
+import threading
+import time
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Bumped in the shared cache on any routing change, so every worker drops its local routes at once
+VERSION_KEY = "phone-index:version"
+
+# (routing version, dialed number) -> SubAdminProfile id (or None for unknown numbers)
+_route_cache = TTLCache(
+    maxsize=getattr(settings, 'PHONE_INDEX_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'PHONE_INDEX_CACHE_TTL', 300),
+)
+_route_lock = threading.Lock()
+_MISSING = object()
+
+
+def _first_value(values_queryset):
+    """First value of a values_list() without the implicit ORDER BY of .first()"""
+    for value in values_queryset.order_by()[:1]:
+        return value
+    return None
+
+
+def to_e164(phone_number):
+    """Normalize a phone number to E.164 (+<country><number>)"""
+    if not phone_number:
+        return None
+
+    raw = str(phone_number).strip()
+    digits = re.sub(r'\D', '', raw)
+    if not digits:
+        return None
+
+    if raw.startswith('+') or raw.startswith('00'):
+        return f"+{digits[2:] if raw.startswith('00') else digits}"
+
+    if len(digits) == 10:
+        # Same default as clean_phone_number() for bare national numbers
+        country_code = getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '91')
+        return f"+{country_code}{digits}"
+
+    return f"+{digits}"
+
+
+def national_number(phone_number):
+    """Last 10 digits of a number, used as a secondary routing key"""
+    digits = re.sub(r'\D', '', str(phone_number or ''))
+    return digits[-10:] if digits else ''
+
+
+def get_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Time-based seed so an evicted counter never resurrects old routes
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY) or time.time_ns()
+    return version
+
+
+async def aget_version():
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+        version = await cache.aget(VERSION_KEY) or time.time_ns()
+    return version
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(VERSION_KEY, version, timeout=None)
+        return version
+
+
+def resolve_restaurant_id(phone_number):
+    """Resolve a dialed number to a SubAdminProfile id without LIKE scans"""
+    e164 = to_e164(phone_number)
+    if not e164:
+        return None
+
+    key = (get_version(), e164)
+    with _route_lock:
+        cached = _route_cache.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    from .models import RestaurantPhoneNumber
+
+    restaurant_id = _first_value(
+        RestaurantPhoneNumber.objects
+        .filter(phone_number=e164)
+        .values_list('restaurant_id', flat=True)
+    )
+
+    if restaurant_id is None:
+        # The stored number may have been saved without (or with a different) country code
+        restaurant_id = _pick_candidate(e164, list(_national_candidates(e164)))
+
+    with _route_lock:
+        _route_cache[key] = restaurant_id
+    return restaurant_id
+
+
+async def aresolve_restaurant_id(phone_number):
+    """Async resolve_restaurant_id() for ASGI views"""
+    e164 = to_e164(phone_number)
+    if not e164:
+        return None
+
+    key = (await aget_version(), e164)
+    with _route_lock:
+        cached = _route_cache.get(key, _MISSING)
+    if cached is not _MISSING:
+        return cached
+
+    from .models import RestaurantPhoneNumber
+
+    restaurant_id = None
+    async for value in (
+        RestaurantPhoneNumber.objects
+        .filter(phone_number=e164)
+        .values_list('restaurant_id', flat=True)
+        .order_by()[:1]
+    ):
+        restaurant_id = value
+
+    if restaurant_id is None:
+        restaurant_id = _pick_candidate(e164, [value async for value in _national_candidates(e164)])
+
+    with _route_lock:
+        _route_cache[key] = restaurant_id
+    return restaurant_id
+
+
+def _national_candidates(e164):
+    from .models import RestaurantPhoneNumber
+
+    return (
+        RestaurantPhoneNumber.objects
+        .filter(national_number=national_number(e164))
+        .values_list('restaurant_id', flat=True)
+        .order_by()
+        .distinct()[:2]
+    )
+
+
+def _pick_candidate(e164, candidates):
+    if len(candidates) == 1:
+        return candidates[0]
+    if candidates:
+        logger.warning(f"Ambiguous routing for {e164}: matches restaurants {candidates}")
+    return None
+
+
+def resolve_restaurant(phone_number):
+    """Resolve a dialed number to its SubAdminProfile (or None)"""
+    from authentication.models import SubAdminProfile
+
+    restaurant_id = resolve_restaurant_id(phone_number)
+    if restaurant_id is None:
+        return None
+    return SubAdminProfile.objects.select_related('user').filter(pk=restaurant_id).first()
+
+
+def invalidate():
+    """Move every worker to a new routing version once the current transaction commits.
+
+    Any change can redirect any number (national-number fallbacks, negative entries for numbers that
+    were just added), so the whole route cache goes rather than individual keys.
+    """
+    transaction.on_commit(bump_version)
+
+
+def sync_primary_number(profile):
+    """Keep the primary routing entry in line with SubAdminProfile.phone_number"""
+    from .models import RestaurantPhoneNumber
+
+    e164 = to_e164(profile.phone_number)
+    stale = list(
+        RestaurantPhoneNumber.objects
+        .filter(restaurant=profile, is_primary=True)
+        .exclude(phone_number=e164 or '')
+        .values_list('phone_number', flat=True)
+    )
+    if stale:
+        RestaurantPhoneNumber.objects.filter(restaurant=profile, phone_number__in=stale).delete()
+
+    if e164:
+        owner_id = _first_value(
+            RestaurantPhoneNumber.objects
+            .filter(phone_number=e164)
+            .values_list('restaurant_id', flat=True)
+        )
+        if owner_id is not None and owner_id != profile.pk:
+            logger.warning(f"Phone number {e164} is already routed to restaurant {owner_id}; not re-assigning")
+        else:
+            RestaurantPhoneNumber.objects.update_or_create(
+                phone_number=e164,
+                defaults={
+                    'restaurant': profile,
+                    'national_number': national_number(e164),
+                    'is_primary': True,
+                },
+            )
+    # The routing rows' own post_save/post_delete signals invalidate the route cache
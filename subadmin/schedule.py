@@ -0,0 +1,146 @@
+# schedule.py
+import logging
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DAY_SECONDS = 24 * 60 * 60
+WEEK_SECONDS = 7 * DAY_SECONDS
+
+
+def get_zone(name):
+    """ZoneInfo for an IANA name, falling back to settings.TIME_ZONE for blank or unknown names"""
+    try:
+        return ZoneInfo(name or settings.TIME_ZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone {name!r}, using {settings.TIME_ZONE}")
+        return ZoneInfo(settings.TIME_ZONE)
+
+
+def _seconds(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+class WeeklySchedule:
+    """A restaurant's business hours compiled into sorted, non-overlapping week intervals.
+
+    Offsets are seconds since Monday 00:00 in the restaurant's own timezone. Hours that close at or
+    before they open run past midnight into the next day (Sunday night wraps into Monday), so
+    `is_open()` and `next_open()` are a bisect over the interval starts.
+    """
+
+    def __init__(self, hours, tz_name=''):
+        self.tz_name = tz_name or settings.TIME_ZONE
+        intervals = []
+        for hours_row in hours:
+            if hours_row.closed_all_day or hours_row.day not in DAYS:
+                continue
+            if hours_row.opening_time is None or hours_row.closing_time is None:
+                continue
+            day_start = DAYS.index(hours_row.day) * DAY_SECONDS
+            start = day_start + _seconds(hours_row.opening_time)
+            end = day_start + _seconds(hours_row.closing_time)
+            if end <= start:
+                end += DAY_SECONDS
+            if end > WEEK_SECONDS:
+                intervals.append((0, end - WEEK_SECONDS))
+                end = WEEK_SECONDS
+            intervals.append((start, end))
+
+        merged = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        self.starts = [start for start, _ in merged]
+        self.ends = [end for _, end in merged]
+
+    def __bool__(self):
+        return bool(self.starts)
+
+    @property
+    def zone(self):
+        return get_zone(self.tz_name)
+
+    def localtime(self, now=None):
+        return (now or timezone.now()).astimezone(self.zone)
+
+    def today(self, now=None):
+        """Weekday name in the restaurant's timezone"""
+        return DAYS[self.localtime(now).weekday()]
+
+    def _offset(self, local):
+        return local.weekday() * DAY_SECONDS + local.hour * 3600 + local.minute * 60 + local.second
+
+    def _at(self, local, offset):
+        """Aware datetime for a week offset, counted from the Monday of `local`'s week"""
+        monday = local.date() - timedelta(days=local.weekday())
+        day, seconds = divmod(offset, DAY_SECONDS)
+        naive = datetime.combine(monday + timedelta(days=day), datetime.min.time()) + timedelta(seconds=seconds)
+        return naive.replace(tzinfo=self.zone)
+
+    def _interval(self, offset):
+        index = bisect_right(self.starts, offset) - 1
+        if index >= 0 and offset < self.ends[index]:
+            return index
+        return None
+
+    def is_open(self, now=None):
+        if not self.starts:
+            return False
+        return self._interval(self._offset(self.localtime(now))) is not None
+
+    def closes_at(self, now=None):
+        """When the current opening ends (local time), or None while closed"""
+        local = self.localtime(now)
+        index = self._interval(self._offset(local)) if self.starts else None
+        if index is None:
+            return None
+        end = self.ends[index]
+        if end == WEEK_SECONDS and self.starts[0] == 0:
+            return self._at(local, WEEK_SECONDS + self.ends[0])
+        return self._at(local, end)
+
+    def next_open(self, now=None):
+        """When the restaurant next opens (local time): `now` itself while open, None if it never opens"""
+        if not self.starts:
+            return None
+        local = self.localtime(now)
+        offset = self._offset(local)
+        if self._interval(offset) is not None:
+            return local
+        index = bisect_right(self.starts, offset)
+        if index < len(self.starts):
+            return self._at(local, self.starts[index])
+        return self._at(local, WEEK_SECONDS + self.starts[0])
+
+    def openings(self):
+        """(day, time) of every opening in the week, e.g. for rendering 'we open again' prompts"""
+        return [
+            (DAYS[start // DAY_SECONDS], (datetime.min + timedelta(seconds=start % DAY_SECONDS)).time())
+            for start in self.starts
+            # Monday 00:00 continuing Sunday night's hours is not an opening
+            if not (start == 0 and self.ends[-1] == WEEK_SECONDS)
+        ]
+
+
+def get_schedule(restaurant_id):
+    """Compiled schedule from the cached restaurant snapshot (rebuilt on any hours/profile edit)"""
+    from .snapshot import get_snapshot
+
+    snapshot = get_snapshot(restaurant_id)
+    return snapshot.schedule if snapshot else None
+
+
+async def aget_schedule(restaurant_id):
+    from .snapshot import aget_snapshot
+
+    snapshot = await aget_snapshot(restaurant_id)
+    return snapshot.schedule if snapshot else None
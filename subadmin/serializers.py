@@ -1,6 +1,9 @@
+from collections import defaultdict
+
 from rest_framework import serializers
 from .models import BusinessHour, Menu, RestaurantLink, SMSFallbackSettings,MenuItem
 from authentication.models import SubAdminProfile
+from .schedule import WeeklySchedule
 
 class BusinessHourSerializer(serializers.ModelSerializer):
     menu_name = serializers.CharField(source='menu.name', read_only=True)
@@ -44,15 +47,38 @@ class MenuItemSerializer(serializers.ModelSerializer):
 class SubAdminProfileSerializer(serializers.ModelSerializer):
     menus = MenuSerializer(many=True, read_only=True)
     business_hours = BusinessHourSerializer(many=True, read_only=True)
+    open_now = serializers.SerializerMethodField()
+    next_open = serializers.SerializerMethodField()
 
     class Meta:
         model = SubAdminProfile
         fields = [
             'id', 'restaurant_name', 'profile_image', 'phone_number', 'email_address',
             'address', 'city', 'state', 'zip_code', 'country', 'website_url',
-            'restaurant_description', 'menus', 'business_hours'
+            'restaurant_description', 'timezone', 'menus', 'business_hours', 'open_now', 'next_open'
         ]
 
+    def schedule_for(self, obj):
+        """Schedules for every restaurant on the page, built from a single BusinessHour query"""
+        schedules = self.context.setdefault('schedules', {})
+        if obj.pk not in schedules:
+            profiles = [obj]
+            if isinstance(self.parent, serializers.ListSerializer) and self.parent.instance is not None:
+                profiles += [profile for profile in self.parent.instance if profile.pk not in schedules]
+            hours_by_user = defaultdict(list)
+            for hours in BusinessHour.objects.filter(subadmin_profile_id__in={profile.user_id for profile in profiles}):
+                hours_by_user[hours.subadmin_profile_id].append(hours)
+            for profile in profiles:
+                schedules[profile.pk] = WeeklySchedule(hours_by_user[profile.user_id], profile.timezone)
+        return schedules[obj.pk]
+
+    def get_open_now(self, obj):
+        return self.schedule_for(obj).is_open()
+
+    def get_next_open(self, obj):
+        next_open = self.schedule_for(obj).next_open()
+        return next_open.isoformat() if next_open else None
+
 
 
 class PhoneTriggerSerializer(serializers.Serializer):
@@ -0,0 +1,78 @@
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from authentication.models import SubAdminProfile
+from .models import RestaurantPhoneNumber, Menu, MenuItem, BusinessHour, SMSFallbackSettings, Order, RestaurantLink, RestaurantAssistant
+from . import caller_profile, phone_index, snapshot, vapi_assistants
+
+
+@receiver(post_save, sender=SubAdminProfile)
+def sync_restaurant_phone_number(sender, instance, **kwargs):
+    phone_index.sync_primary_number(instance)
+
+
+@receiver(post_save, sender=RestaurantPhoneNumber)
+@receiver(post_delete, sender=RestaurantPhoneNumber)
+def invalidate_phone_route(sender, instance, **kwargs):
+    phone_index.invalidate()
+
+
+@receiver(post_save, sender=SubAdminProfile)
+@receiver(post_delete, sender=SubAdminProfile)
+def invalidate_profile_snapshot(sender, instance, **kwargs):
+    snapshot.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Menu)
+@receiver(post_delete, sender=Menu)
+@receiver(post_save, sender=BusinessHour)
+@receiver(post_delete, sender=BusinessHour)
+def invalidate_menu_snapshot(sender, instance, **kwargs):
+    snapshot.invalidate_for_user(instance.subadmin_profile_id)
+
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+def invalidate_menu_item_snapshot(sender, instance, **kwargs):
+    user_id = Menu.objects.filter(pk=instance.menu_id).values_list('subadmin_profile_id', flat=True).first()
+    if user_id:
+        snapshot.invalidate_for_user(user_id)
+
+
+@receiver(post_save, sender=SMSFallbackSettings)
+@receiver(post_delete, sender=SMSFallbackSettings)
+def invalidate_fallback_snapshot(sender, instance, **kwargs):
+    snapshot.invalidate_for_user(instance.restaurant_id)
+
+
+@receiver(post_save, sender=RestaurantLink)
+@receiver(post_delete, sender=RestaurantLink)
+def invalidate_link_snapshot(sender, instance, **kwargs):
+    snapshot.invalidate(instance.restaurant_name_id)
+
+
+@receiver(post_save, sender=RestaurantAssistant)
+@receiver(post_delete, sender=RestaurantAssistant)
+def invalidate_assistant_registration(sender, instance, **kwargs):
+    vapi_assistants.forget_registration(instance.restaurant_id)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_caller_profile(sender, instance, **kwargs):
+    caller_profile.invalidate(instance.restaurant_id, instance.customer_phone)
+
+
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    # __dict__ so a deferred status field isn't loaded just for this
+    instance._saved_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Order)
+def publish_order_status_change(sender, instance, created, **kwargs):
+    previous_status = getattr(instance, '_saved_status', None)
+    instance._saved_status = instance.status
+    if created or previous_status is None or previous_status == instance.status:
+        return
+    from twilio_bot.order_webhooks import enqueue_order_event
+    enqueue_order_event(instance, 'order.status_changed', previous_status=previous_status)
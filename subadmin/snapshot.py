@@ -0,0 +1,280 @@
+# snapshot.py
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from cachetools import LRUCache
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .schedule import WeeklySchedule
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = "ivr:snapshot:{restaurant_id}:version"
+SNAPSHOT_KEY = "ivr:snapshot:{restaurant_id}:v{version}"
+
+RESTAURANT_LINK_FIELDS = (
+    'direct_ordering_link', 'doordash_link', 'ubereats_link', 'grubhub_link', 'direct_reservation_link',
+    'opentable_link', 'resy_link', 'catering_request_form', 'special_events_form',
+)
+
+# (restaurant_id, version) -> RestaurantSnapshot, so a warm worker skips unpickling
+_local_snapshots = LRUCache(maxsize=getattr(settings, 'RESTAURANT_SNAPSHOT_LOCAL_SIZE', 512))
+_local_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class MenuItemSnapshot:
+    id: int
+    name: str
+    description: str
+    price: Optional[Decimal]
+    display_order: int
+
+
+@dataclass(frozen=True)
+class MenuSnapshot:
+    id: int
+    name: str
+    description: str
+    items: Tuple[MenuItemSnapshot, ...] = ()
+
+    def item(self, item_id):
+        for item in self.items:
+            if item.id == item_id:
+                return item
+        return None
+
+
+@dataclass(frozen=True)
+class BusinessHourSnapshot:
+    day: str
+    opening_time: Optional[object]
+    closing_time: Optional[object]
+    closed_all_day: bool
+
+
+@dataclass(frozen=True)
+class RestaurantSnapshot:
+    """Immutable, cacheable view of everything an IVR call reads for one restaurant"""
+    restaurant_id: int
+    user_id: int
+    user_email: str
+    restaurant_name: str
+    phone_number: str
+    email_address: str
+    address: str
+    city: str
+    state: str
+    zip_code: str
+    website_url: Optional[str]
+    description: Optional[str]
+    version: int
+    timezone: str = 'UTC'
+    hours: Tuple[BusinessHourSnapshot, ...] = ()
+    schedule: Optional[WeeklySchedule] = None
+    menus: Tuple[MenuSnapshot, ...] = ()
+    fallback_message: Optional[str] = None
+    links: Tuple[Tuple[str, str], ...] = ()  # (RestaurantLink field, URL) for the links that are set
+    built_at: float = field(default_factory=time.time)
+
+    @property
+    def full_address(self):
+        return f"{self.address}, {self.city}, {self.state} {self.zip_code}"
+
+    def hours_for(self, day):
+        for hours in self.hours:
+            if hours.day == day:
+                return hours
+        return None
+
+    def today_hours(self, now=None):
+        """Hours row for the current weekday in the restaurant's timezone"""
+        if self.schedule is None:
+            from twilio_bot.utils import get_current_day
+            return self.hours_for(get_current_day())
+        return self.hours_for(self.schedule.today(now))
+
+    def menu(self, menu_id):
+        for menu in self.menus:
+            if menu.id == menu_id:
+                return menu
+        return None
+
+
+def get_version(restaurant_id):
+    key = VERSION_KEY.format(restaurant_id=restaurant_id)
+    version = cache.get(key)
+    if version is None:
+        # Time-based seed so an evicted counter never resurrects an old snapshot key
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key) or time.time_ns()
+    return version
+
+
+async def aget_version(restaurant_id):
+    key = VERSION_KEY.format(restaurant_id=restaurant_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key) or time.time_ns()
+    return version
+
+
+def bump_version(restaurant_id):
+    key = VERSION_KEY.format(restaurant_id=restaurant_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def build_snapshot(restaurant_id, version=None):
+    """Load a restaurant's profile, hours, menus and fallback settings in one pass"""
+    from authentication.models import SubAdminProfile
+    from .models import BusinessHour, Menu, MenuItem, RestaurantLink, SMSFallbackSettings
+
+    profile = SubAdminProfile.objects.select_related('user').filter(pk=restaurant_id).first()
+    if profile is None:
+        return None
+
+    hours = tuple(
+        BusinessHourSnapshot(
+            day=hour.day,
+            opening_time=hour.opening_time,
+            closing_time=hour.closing_time,
+            closed_all_day=hour.closed_all_day,
+        )
+        for hour in BusinessHour.objects.filter(subadmin_profile_id=profile.user_id)
+    )
+
+    available_items = Prefetch(
+        'items',
+        queryset=MenuItem.objects.filter(is_available=True).order_by('display_order', 'name'),
+    )
+    menus = tuple(
+        MenuSnapshot(
+            id=menu.id,
+            name=menu.name,
+            description=menu.description,
+            items=tuple(
+                MenuItemSnapshot(
+                    id=item.id,
+                    name=item.name,
+                    description=item.description,
+                    price=item.price,
+                    display_order=item.display_order,
+                )
+                for item in menu.items.all()
+            ),
+        )
+        for menu in Menu.objects.filter(
+            subadmin_profile_id=profile.user_id, is_active=True
+        ).order_by('name').prefetch_related(available_items)
+    )
+
+    fallback = SMSFallbackSettings.objects.filter(restaurant_id=profile.user_id, is_active=True).first()
+
+    link = RestaurantLink.objects.filter(restaurant_name_id=profile.pk).first()
+    links = tuple(
+        (name, getattr(link, name))
+        for name in RESTAURANT_LINK_FIELDS
+        if link is not None and getattr(link, name)
+    )
+
+    return RestaurantSnapshot(
+        restaurant_id=profile.pk,
+        user_id=profile.user_id,
+        user_email=profile.user.email,
+        restaurant_name=profile.restaurant_name,
+        phone_number=profile.phone_number,
+        email_address=profile.email_address,
+        address=profile.address,
+        city=profile.city,
+        state=profile.state,
+        zip_code=profile.zip_code,
+        website_url=profile.website_url,
+        description=profile.restaurant_description,
+        version=version if version is not None else get_version(profile.pk),
+        timezone=profile.timezone or settings.TIME_ZONE,
+        hours=hours,
+        schedule=WeeklySchedule(hours, profile.timezone),
+        menus=menus,
+        fallback_message=fallback.get_processed_message(profile) if fallback else None,
+        links=links,
+    )
+
+
+def get_snapshot(restaurant_id):
+    """Return the cached snapshot for a restaurant, building it on a miss"""
+    if restaurant_id is None:
+        return None
+
+    version = get_version(restaurant_id)
+    local_key = (restaurant_id, version)
+    with _local_lock:
+        snapshot = _local_snapshots.get(local_key)
+    if snapshot is not None:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(restaurant_id=restaurant_id, version=version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(restaurant_id, version=version)
+        if snapshot is None:
+            return None
+        cache.set(key, snapshot, timeout=getattr(settings, 'RESTAURANT_SNAPSHOT_TTL', 60 * 60 * 24))
+
+    with _local_lock:
+        _local_snapshots[local_key] = snapshot
+    return snapshot
+
+
+async def aget_snapshot(restaurant_id):
+    """Async get_snapshot() for ASGI views"""
+    if restaurant_id is None:
+        return None
+
+    version = await aget_version(restaurant_id)
+    local_key = (restaurant_id, version)
+    with _local_lock:
+        snapshot = _local_snapshots.get(local_key)
+    if snapshot is not None:
+        return snapshot
+
+    key = SNAPSHOT_KEY.format(restaurant_id=restaurant_id, version=version)
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        # prefetch_related() can't be iterated asynchronously on Django 4.2, so the (rare) build runs in a thread
+        snapshot = await sync_to_async(build_snapshot)(restaurant_id, version=version)
+        if snapshot is None:
+            return None
+        await cache.aset(key, snapshot, timeout=getattr(settings, 'RESTAURANT_SNAPSHOT_TTL', 60 * 60 * 24))
+
+    with _local_lock:
+        _local_snapshots[local_key] = snapshot
+    return snapshot
+
+
+def invalidate(restaurant_id):
+    """Move the restaurant to a new snapshot version once the current transaction commits"""
+    if restaurant_id is None:
+        return
+    transaction.on_commit(lambda: bump_version(restaurant_id))
+
+
+def invalidate_for_user(user_id):
+    """Invalidate by the CustomUser id that Menu/BusinessHour/SMSFallbackSettings point at"""
+    from authentication.models import SubAdminProfile
+
+    for restaurant_id in SubAdminProfile.objects.filter(user_id=user_id).values_list('pk', flat=True):
+        invalidate(restaurant_id)
@@ -1,3 +1,236 @@
-from django.test import TestCase
+import json
+from datetime import datetime, time
+from types import SimpleNamespace
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from authentication.models import CustomUser
+from .models import BusinessHour, Menu, MenuItem, RestaurantPhoneNumber
+from .schedule import WeeklySchedule
+from .snapshot import get_snapshot
+from . import phone_index, vapi_assistants
+
+UTC = ZoneInfo('UTC')
+
+
+# Redis stand-in, for tests that count queries (the fallback cache is a database table)
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_restaurant(email='owner@example.com', phone_number='+15551234567'):
+    user = CustomUser.objects.create_user(email, 'pw', role='subdir')
+    profile = user.subadmin_profile
+    profile.restaurant_name = 'Pizza Place'
+    profile.phone_number = phone_number
+    profile.save()
+    return user, profile
+
+
+class PhoneIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_numbers_are_normalised_to_e164(self):
+        self.assertEqual(phone_index.to_e164('98765 43210'), '+919876543210')
+        self.assertEqual(phone_index.to_e164('0015551234567'), '+15551234567')
+        self.assertEqual(phone_index.to_e164('+1 (555) 123-4567'), '+15551234567')
+        self.assertIsNone(phone_index.to_e164('n/a'))
+
+    def test_profile_number_is_routed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            _, profile = make_restaurant(phone_number='9876543210')
+
+        self.assertEqual(phone_index.resolve_restaurant_id('+919876543210'), profile.pk)
+        # Dialed with a different country code, found through the national number
+        self.assertEqual(phone_index.resolve_restaurant_id('+19876543210'), profile.pk)
+        self.assertIsNone(phone_index.resolve_restaurant_id('+15550000000'))
+
+    def test_routing_changes_reach_routes_cached_before_them(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            _, first = make_restaurant('first@example.com', '+15551234567')
+            _, second = make_restaurant('second@example.com', '')
+        self.assertEqual(phone_index.resolve_restaurant_id('+15551234567'), first.pk)
+        self.assertIsNone(phone_index.resolve_restaurant_id('+15557654321'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            number = RestaurantPhoneNumber.objects.get(phone_number='+15551234567')
+            number.restaurant = second
+            number.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantPhoneNumber.objects.create(restaurant=first, phone_number='+15557654321')
+
+        self.assertEqual(phone_index.resolve_restaurant_id('+15551234567'), second.pk)
+        # The earlier miss was cached too, and must not hide the new number
+        self.assertEqual(phone_index.resolve_restaurant_id('+15557654321'), first.pk)
+
+    def test_routing_version_is_shared_between_workers(self):
+        version = phone_index.get_version()
+
+        # What another worker's invalidate() does on commit
+        phone_index.bump_version()
+
+        self.assertNotEqual(phone_index.get_version(), version)
+
+    def test_unparseable_numbers_are_rejected(self):
+        _, profile = make_restaurant(phone_number='')
+        number = RestaurantPhoneNumber(restaurant=profile, phone_number='call us')
+
+        with self.assertRaises(ValidationError):
+            number.full_clean()
+        with self.assertRaises(ValidationError):
+            number.save()
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            user, self.profile = make_restaurant()
+            menu = Menu.objects.create(subadmin_profile=user, name='Pizza')
+            self.item = MenuItem.objects.create(menu=menu, name='Margherita', price=10, display_order=1)
+            MenuItem.objects.create(menu=menu, name='Calzone', price=9, display_order=2, is_available=False)
+            BusinessHour.objects.create(subadmin_profile=user, day='Monday', opening_time='11:00', closing_time='22:00')
+
+    def test_snapshot_holds_available_items_and_hours(self):
+        snapshot = get_snapshot(self.profile.pk)
+
+        self.assertEqual(snapshot.restaurant_name, 'Pizza Place')
+        self.assertEqual([item.name for menu in snapshot.menus for item in menu.items], ['Margherita'])
+        self.assertEqual(snapshot.hours_for('Monday').closing_time.hour, 22)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_cached_snapshot_is_served_without_queries(self):
+        get_snapshot(self.profile.pk)
+
+        with self.assertNumQueries(0):
+            get_snapshot(self.profile.pk)
+
+    def test_edits_are_picked_up_only_once_they_commit(self):
+        before = get_snapshot(self.profile.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.item.name = 'Marinara'
+            self.item.save()
+        # Still inside the (test) transaction: other requests must keep the committed menu
+        self.assertIs(get_snapshot(self.profile.pk), before)
+
+        for callback in callbacks:
+            callback()
+        after = get_snapshot(self.profile.pk)
+        self.assertGreater(after.version, before.version)
+        self.assertEqual(after.menus[0].items[0].name, 'Marinara')
+
+
+def hours(day, opening, closing, closed_all_day=False):
+    return SimpleNamespace(day=day, opening_time=opening, closing_time=closing, closed_all_day=closed_all_day)
+
+
+class WeeklyScheduleTests(SimpleTestCase):
+    # 2026-10-23 is a Friday, 2026-10-25 a Sunday and 2026-10-26 a Monday
+
+    def test_hours_past_midnight_stay_open_into_the_next_day(self):
+        schedule = WeeklySchedule([hours('Friday', time(18), time(2))], 'UTC')
+
+        self.assertTrue(schedule.is_open(datetime(2026, 10, 23, 23, 30, tzinfo=UTC)))
+        self.assertTrue(schedule.is_open(datetime(2026, 10, 24, 1, 59, tzinfo=UTC)))
+        self.assertFalse(schedule.is_open(datetime(2026, 10, 24, 2, 0, tzinfo=UTC)))
+        self.assertEqual(
+            schedule.closes_at(datetime(2026, 10, 23, 23, 30, tzinfo=UTC)),
+            datetime(2026, 10, 24, 2, 0, tzinfo=UTC),
+        )
+
+    def test_sunday_night_wraps_into_monday(self):
+        schedule = WeeklySchedule([hours('Sunday', time(22), time(3))], 'UTC')
+
+        self.assertTrue(schedule.is_open(datetime(2026, 10, 26, 1, 0, tzinfo=UTC)))
+        self.assertFalse(schedule.is_open(datetime(2026, 10, 26, 3, 0, tzinfo=UTC)))
+        self.assertEqual(
+            schedule.closes_at(datetime(2026, 10, 25, 23, 0, tzinfo=UTC)),
+            datetime(2026, 10, 26, 3, 0, tzinfo=UTC),
+        )
+        self.assertEqual(
+            schedule.next_open(datetime(2026, 10, 26, 12, 0, tzinfo=UTC)),
+            datetime(2026, 11, 1, 22, 0, tzinfo=UTC),
+        )
+        self.assertEqual(schedule.openings(), [('Sunday', time(22))])
+
+    def test_hours_are_read_in_the_restaurant_timezone(self):
+        rows = [hours('Monday', time(11), time(22))]
+        # 17:00 UTC is 22:30 in Kolkata (closed) and 13:00 in New York (open)
+        now = datetime(2026, 10, 26, 17, 0, tzinfo=UTC)
+
+        kolkata = WeeklySchedule(rows, 'Asia/Kolkata')
+        new_york = WeeklySchedule(rows, 'America/New_York')
+
+        self.assertFalse(kolkata.is_open(now))
+        self.assertTrue(new_york.is_open(now))
+        self.assertEqual(kolkata.today(datetime(2026, 10, 25, 20, 0, tzinfo=UTC)), 'Monday')
+        self.assertEqual(kolkata.next_open(now), datetime(2026, 11, 2, 11, 0, tzinfo=ZoneInfo('Asia/Kolkata')))
+
+    @override_settings(TIME_ZONE='UTC')
+    def test_unset_timezone_uses_the_server_clock(self):
+        schedule = WeeklySchedule([hours('Monday', time(11), time(22))], None)
+
+        self.assertEqual(schedule.tz_name, 'UTC')
+        self.assertTrue(schedule.is_open(datetime(2026, 10, 26, 21, 0, tzinfo=UTC)))
+
+    def test_closed_days_are_skipped(self):
+        schedule = WeeklySchedule([
+            hours('Monday', time(9), time(17), closed_all_day=True),
+            hours('Tuesday', time(9), time(17)),
+        ], 'UTC')
+
+        self.assertFalse(schedule.is_open(datetime(2026, 10, 26, 12, 0, tzinfo=UTC)))
+        self.assertEqual(
+            schedule.next_open(datetime(2026, 10, 26, 12, 0, tzinfo=UTC)),
+            datetime(2026, 10, 27, 9, 0, tzinfo=UTC),
+        )
+        self.assertIsNone(WeeklySchedule([], 'UTC').next_open())
+
+
+class AssistantRegistrationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user, self.profile = make_restaurant()
+        menu = Menu.objects.create(subadmin_profile=user, name='Pizza')
+        self.item = MenuItem.objects.create(menu=menu, name='Margherita', price=100, display_order=1)
+
+    def set_price(self, price):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.price = price
+            self.item.save()
+        return get_snapshot(self.profile.pk)
+
+    @mock.patch.object(vapi_assistants.vapi_client, 'get_pool')
+    @mock.patch.object(vapi_assistants.vapi_client, 'save_assistant', return_value='asst_1')
+    def test_assistant_id_is_only_used_for_the_config_it_was_pushed_with(self, save_assistant, get_pool):
+        snapshot = get_snapshot(self.profile.pk)
+        self.assertEqual(vapi_assistants.sync_assistant(snapshot), ('asst_1', True))
+        self.assertEqual(vapi_assistants.call_payload(snapshot, 'phone_1', '+15550001111')['assistantId'], 'asst_1')
+
+        # The price change hasn't been pushed: the stored id now holds a stale config
+        edited = self.set_price(200)
+        payload = vapi_assistants.call_payload(edited, 'phone_1', '+15550001111')
+        self.assertNotIn('assistantId', payload)
+        self.assertIn('200', json.dumps(payload['assistant']))
+        get_pool.return_value.submit.assert_called_once()
+
+        # Reverting the edit makes the pushed config current again
+        reverted = self.set_price(100)
+        payload = vapi_assistants.call_payload(reverted, 'phone_1', '+15550001111')
+        self.assertEqual(payload['assistantId'], 'asst_1')
+        self.assertNotIn('assistant', payload)
+        save_assistant.assert_called_once()
+
+    @mock.patch.object(vapi_assistants.vapi_client, 'save_assistant', side_effect=['asst_1', 'asst_1'])
+    def test_sync_pushes_only_changed_configs(self, save_assistant):
+        snapshot = get_snapshot(self.profile.pk)
+        self.assertEqual(vapi_assistants.sync_assistant(snapshot), ('asst_1', True))
+        self.assertEqual(vapi_assistants.sync_assistant(snapshot), ('asst_1', False))
+
+        self.assertEqual(vapi_assistants.sync_assistant(self.set_price(200)), ('asst_1', True))
+        self.assertEqual(save_assistant.call_args.args[1], 'asst_1')
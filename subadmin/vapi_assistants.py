@@ -0,0 +1,213 @@
+# vapi_assistants.py
+import hashlib
+import json
+import logging
+import threading
+from dataclasses import dataclass
+
+from cachetools import LRUCache
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import vapi_client
+
+logger = logging.getLogger(__name__)
+
+ASSISTANT_KEY = "vapi:assistant:{restaurant_id}"
+SYNC_LOCK_KEY = "vapi:assistant-sync:{restaurant_id}"
+
+LINK_LABELS = {
+    'direct_ordering_link': 'Order online directly',
+    'doordash_link': 'DoorDash',
+    'ubereats_link': 'Uber Eats',
+    'grubhub_link': 'Grubhub',
+    'direct_reservation_link': 'Reserve a table directly',
+    'opentable_link': 'OpenTable',
+    'resy_link': 'Resy',
+    'catering_request_form': 'Catering requests',
+    'special_events_form': 'Special events',
+}
+
+# (restaurant_id, snapshot version) -> CompiledAssistant; any menu/hours/profile/link edit bumps the version
+_compiled = LRUCache(maxsize=getattr(settings, 'VAPI_ASSISTANT_CACHE_SIZE', 512))
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class CompiledAssistant:
+    restaurant_id: int
+    version: int
+    config: dict
+    payload_hash: str
+
+
+def build_system_prompt(snapshot):
+    """Everything static about the restaurant; per-call facts are Vapi {{variables}}"""
+    restaurant_name = snapshot.restaurant_name or 'our restaurant'
+    lines = [f"You are a helpful restaurant assistant for {restaurant_name}."]
+
+    if snapshot.menus:
+        lines.append("Here are our available menus:")
+        for menu in snapshot.menus:
+            items = ', '.join(
+                f"{item.name} ({item.price})" if item.price else item.name for item in menu.items
+            )
+            description = f" - {menu.description}" if menu.description else ""
+            lines.append(f"- {menu.name}{description}. Items: {items or 'none available right now'}.")
+
+    if snapshot.hours:
+        lines.append(f"Business hours ({snapshot.timezone}):")
+        for hours in snapshot.hours:
+            if hours.closed_all_day or hours.opening_time is None or hours.closing_time is None:
+                lines.append(f"- {hours.day}: Closed")
+            else:
+                lines.append(
+                    f"- {hours.day}: {hours.opening_time.strftime('%I:%M %p')} - {hours.closing_time.strftime('%I:%M %p')}"
+                )
+
+    if snapshot.links:
+        lines.append("Share these links when the caller asks how else to order or book:")
+        lines.extend(f"- {LINK_LABELS.get(name, name)}: {url}" for name, url in snapshot.links)
+
+    lines.append(f"Restaurant address: {snapshot.full_address}. Restaurant phone: {snapshot.phone_number}.")
+    lines.append("Right now: {{open_status}}. The caller's number is {{customer_number}}.")
+    return '\n'.join(lines)
+
+
+def build_config(snapshot):
+    return {
+        # Vapi limits assistant names to 40 characters
+        "name": (snapshot.restaurant_name or f"Restaurant {snapshot.restaurant_id}")[:40],
+        "model": {
+            "provider": "openai",
+            "model": "gpt-3.5-turbo",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": build_system_prompt(snapshot)
+                }
+            ]
+        },
+        "voice": {
+            "provider": "11labs",
+            "voiceId": getattr(settings, 'VAPI_VOICE_ID', '21m00Tcm4TlvDq8ikWAM')
+        },
+        "metadata": {"restaurant_id": snapshot.restaurant_id},
+    }
+
+
+def compile_assistant(snapshot):
+    """Assistant config and its hash for this snapshot version, compiled once per version"""
+    key = (snapshot.restaurant_id, snapshot.version)
+    with _lock:
+        compiled = _compiled.get(key)
+    if compiled is None:
+        config = build_config(snapshot)
+        payload_hash = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+        compiled = CompiledAssistant(snapshot.restaurant_id, snapshot.version, config, payload_hash)
+        with _lock:
+            _compiled[key] = compiled
+    return compiled
+
+
+def variable_values(snapshot, caller):
+    schedule = snapshot.schedule
+    if schedule and schedule.is_open():
+        open_status = "the restaurant is open"
+    elif schedule:
+        next_open = schedule.next_open()
+        open_status = (
+            f"the restaurant is closed and opens again on {next_open.strftime('%A at %I:%M %p')}"
+            if next_open else "the restaurant is closed"
+        )
+    else:
+        open_status = "opening hours are not available"
+    return {"open_status": open_status, "customer_number": caller or "unknown"}
+
+
+def registered_assistant_id(compiled):
+    """Vapi id of the restaurant's assistant if it currently holds exactly this config, else None.
+
+    The assistant is updated in place, so an id is only good for the hash it was last pushed with;
+    the cache mirrors RestaurantAssistant's (payload_hash, assistant_id) pair.
+    """
+    from .models import RestaurantAssistant
+
+    key = ASSISTANT_KEY.format(restaurant_id=compiled.restaurant_id)
+    registered = cache.get(key)
+    if registered is None:
+        registered = RestaurantAssistant.objects.filter(
+            restaurant_id=compiled.restaurant_id
+        ).exclude(assistant_id='').values_list('payload_hash', 'assistant_id').first()
+        if registered is None:
+            return None
+        cache.set(key, tuple(registered), timeout=None)
+    payload_hash, assistant_id = registered
+    return assistant_id if payload_hash == compiled.payload_hash else None
+
+
+def forget_registration(restaurant_id):
+    cache.delete(ASSISTANT_KEY.format(restaurant_id=restaurant_id))
+
+
+def sync_assistant(snapshot, force=False):
+    """Push the restaurant's compiled config to Vapi if it changed; returns (assistant_id, pushed)"""
+    from .models import RestaurantAssistant
+
+    compiled = compile_assistant(snapshot)
+    record, _ = RestaurantAssistant.objects.get_or_create(restaurant_id=snapshot.restaurant_id)
+    if record.assistant_id and record.payload_hash == compiled.payload_hash and not force:
+        return record.assistant_id, False
+
+    try:
+        assistant_id = vapi_client.save_assistant(compiled.config, record.assistant_id or None)
+    except Exception as e:
+        RestaurantAssistant.objects.filter(pk=record.pk).update(last_error=str(e)[:1000])
+        raise
+
+    record.assistant_id = assistant_id
+    record.payload_hash = compiled.payload_hash
+    record.synced_at = timezone.now()
+    record.last_error = ''
+    record.save()
+    cache.set(
+        ASSISTANT_KEY.format(restaurant_id=compiled.restaurant_id), (compiled.payload_hash, assistant_id), timeout=None
+    )
+    return assistant_id, True
+
+
+def _sync_in_background(snapshot):
+    try:
+        sync_assistant(snapshot)
+    except Exception as e:
+        logger.error(f"Vapi assistant sync failed for restaurant {snapshot.restaurant_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def call_payload(snapshot, twilio_number, caller):
+    """Vapi /call body: the registered assistant by id when its config is current, else the config inline.
+
+    A stale or missing assistant is re-pushed off the request path (at most one push per restaurant
+    at a time), so only the first call after an edit pays for the full inline config.
+    """
+    compiled = compile_assistant(snapshot)
+    overrides = {"variableValues": variable_values(snapshot, caller)}
+    payload = {
+        "phoneNumberId": twilio_number,  # Your Vapi phone number ID
+        "customer": {
+            "number": caller
+        }
+    }
+
+    assistant_id = registered_assistant_id(compiled)
+    if assistant_id:
+        payload.update({"assistantId": assistant_id, "assistantOverrides": overrides})
+        return payload
+
+    if cache.add(SYNC_LOCK_KEY.format(restaurant_id=snapshot.restaurant_id), 1, timeout=60):
+        vapi_client.get_pool().submit(_sync_in_background, snapshot)
+    payload.update({"assistant": compiled.config, "assistantOverrides": overrides})
+    return payload
@@ -0,0 +1,140 @@
+# vapi_client.py
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Tried in order; the second is the legacy path some accounts still answer on
+CALL_PATHS = ('/call', '/v1/call')
+
+_session = None
+_pool = None
+_init_lock = threading.Lock()
+
+
+class VapiError(Exception):
+    """A Vapi request failed on every endpoint tried; `responses` holds what each returned (Response or exception)"""
+
+    def __init__(self, message, responses=()):
+        super().__init__(message)
+        self.responses = list(responses)
+
+
+def get_session():
+    """Process-wide keep-alive session for api.vapi.ai, retrying only connection setup"""
+    global _session
+    if _session is None:
+        with _init_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(
+                    pool_connections=2,
+                    pool_maxsize=getattr(settings, 'VAPI_HTTP_WORKERS', 8) * 2,
+                    max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+                ))
+                session.headers.update({'Content-Type': 'application/json'})
+                _session = session
+    return _session
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'VAPI_HTTP_WORKERS', 8),
+                    thread_name_prefix='vapi-client',
+                )
+    return _pool
+
+
+def _timeout():
+    return (getattr(settings, 'VAPI_CONNECT_TIMEOUT', 3.05), getattr(settings, 'VAPI_READ_TIMEOUT', 10))
+
+
+def _request(method, path, payload):
+    return get_session().request(
+        method,
+        f"{settings.VAPI_BASE_URL.rstrip('/')}{path}",
+        json=payload,
+        headers={'Authorization': f"Bearer {settings.VAPI_API_KEY}"},
+        timeout=_timeout(),
+    )
+
+
+def _post(path, payload):
+    return _request('POST', path, payload)
+
+
+def _ok(result):
+    return isinstance(result, requests.Response) and result.status_code in (200, 201)
+
+
+def create_call(payload):
+    """Start a Vapi call; returns the first successful Response.
+
+    The fallback endpoint is only tried once the primary has failed. Setting VAPI_HEDGE_AFTER to a
+    number of seconds also sends it alongside a primary that is merely slow, first success wins;
+    that can start two calls when both endpoints accept the POST, so it is off by default.
+    """
+    hedge_after = getattr(settings, 'VAPI_HEDGE_AFTER', None)
+    pool = get_pool()
+    pending = {pool.submit(_post, CALL_PATHS[0], payload): CALL_PATHS[0]}
+    fallbacks = list(CALL_PATHS[1:])
+    results = {}
+
+    while pending:
+        done, _ = wait(pending, timeout=hedge_after if fallbacks else None, return_when=FIRST_COMPLETED)
+        for future in done:
+            path = pending.pop(future)
+            try:
+                result = future.result()
+            except requests.RequestException as e:
+                result = e
+            results[path] = result
+            if _ok(result):
+                return result
+            logger.warning(f"Vapi {path} failed: {getattr(result, 'status_code', result)}")
+
+        # A failure, or a primary slower than the hedge delay, releases the next endpoint
+        if fallbacks and (done or hedge_after is not None):
+            path = fallbacks.pop(0)
+            pending[pool.submit(_post, path, payload)] = path
+
+    statuses = ', '.join(f"{path}: {getattr(result, 'status_code', result)}" for path, result in results.items())
+    raise VapiError(f"All Vapi endpoints failed ({statuses})", results.values())
+
+
+def save_assistant(config, assistant_id=None):
+    """Create a persistent assistant, or update an existing one in place; returns its id"""
+    if assistant_id:
+        response = _request('PATCH', f'/assistant/{assistant_id}', config)
+        if response.status_code == 404:
+            # Deleted on the Vapi side: register it again
+            response = _request('POST', '/assistant', config)
+    else:
+        response = _request('POST', '/assistant', config)
+    if not _ok(response):
+        raise VapiError(f"Vapi assistant save failed: {response.status_code} {response.text[:200]}", [response])
+    return response.json()['id']
+
+
+def menu_data(snapshot, phone_number):
+    """What the Vapi assistant is told about a restaurant, straight from its cached snapshot"""
+    schedule = snapshot.schedule
+    next_open = schedule.next_open() if schedule else None
+    return {
+        "restaurant_name": snapshot.restaurant_name,
+        "phone_number": phone_number,
+        "timezone": snapshot.timezone,
+        "open_now": schedule.is_open() if schedule else False,
+        "next_open": next_open.isoformat() if next_open else None,
+        "menus": [{"name": menu.name, "description": menu.description} for menu in snapshot.menus],
+    }
@@ -19,6 +19,12 @@ from datetime import timedelta
 from django.db.models import Avg
 from rest_framework.decorators import action
 from authentication.utils import success_response, error_response
+from .phone_index import resolve_restaurant_id, to_e164
+from .snapshot import get_snapshot
+from . import vapi_assistants, vapi_client
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 error_message = "Already exist ."
@@ -127,8 +133,8 @@ class AllRestaurantViewSet(viewsets.ReadOnlyModelViewSet):
 
 @api_view(['POST'])
 def get_menu_by_twilio_number(request):
-    print("Request data:", request.data)
-    print("Request headers:", dict(request.headers))
+    # Headers aren't logged: Vapi sends the tool's secret in them
+    logger.debug(f"Vapi menu lookup payload: {request.data}")
 
     # Step 1: Extract Twilio number (callee number)
     twilio_number = (
@@ -151,167 +157,58 @@ def get_menu_by_twilio_number(request):
             request.data.get('caller')
         )
 
-    print("Final phone number extracted:", twilio_number)
+    logger.info(f"Vapi menu lookup for {twilio_number}")
 
     if not twilio_number:
         return Response({'error': 'Missing phone number in payload.'}, status=400)
 
-    # Step 3: Normalize the phone number
-    normalized_number = ''.join(filter(str.isdigit, twilio_number))
-
-    phone_variations = [
-        f"+{normalized_number}",
-        normalized_number.lstrip('91'),  # Remove India code
-        f"+91{normalized_number}" if not normalized_number.startswith('91') else f"+{normalized_number}",
-        f"+1{normalized_number}" if not normalized_number.startswith('1') else f"+{normalized_number}"
-    ]
-
-    # Step 4: Match to SubAdmin by phone
-    subadmin = None
-    for phone in phone_variations:
-        try:
-            subadmin = SubAdminProfile.objects.get(phone_number=phone)
-            break
-        except SubAdminProfile.DoesNotExist:
-            continue
+    # Step 3: Match to SubAdmin through the phone routing index
+    snapshot = get_snapshot(resolve_restaurant_id(twilio_number))
 
-    if not subadmin:
+    if not snapshot:
         return Response({
             'error': f'No restaurant found for phone number: {twilio_number}',
-            'tried_variations': phone_variations
+            'normalized_number': to_e164(twilio_number)
         }, status=404)
 
-    # Step 5: Get active menu
-    active_menus = Menu.objects.filter(subadmin_profile=subadmin, is_active=True)
-    if not active_menus.exists():
+    # Step 4: Active menus come from the cached snapshot
+    if not snapshot.menus:
         return Response({'error': 'No active menu found for this restaurant.'}, status=404)
 
-    menu_list = [
-        {
-            "name": menu.name,
-            "description": menu.description
-        }
-        for menu in active_menus
-    ]
-
-    return Response({
-        "restaurant_name": subadmin.restaurant_name,
-        "phone_number": twilio_number,
-        "menus": menu_list
-    })
+    return Response(vapi_client.menu_data(snapshot, twilio_number))
 
 
 @api_view(['POST'])
 def handle_incoming_call(request):
     twilio_number = request.data.get('to') or request.data.get('callee', {}).get('phoneNumber')
     caller = request.data.get('from') or request.data.get('caller', {}).get('phoneNumber')
-    print(caller, "======here is caller ================")
+    logger.info(f"Vapi incoming call from {caller} to {twilio_number}")
 
     if not twilio_number or not caller:
         return Response({"error": "Missing 'to' or 'from' number"}, status=400)
 
-    # Step 1: Call local menu API
-    menu_response = requests.post(
-        "https://3e33db4654fa.ngrok-free.app/api/subadmin/get-menu-by-twilio/",
-        json={"to": twilio_number},
-        headers={"Content-Type": "application/json"}
-    )
+    # Step 1: Menu and prompt data from the cached restaurant snapshot (no HTTP round-trip)
+    snapshot = get_snapshot(resolve_restaurant_id(twilio_number))
 
-    if menu_response.status_code != 200:
-        print(f"Menu API Error: {menu_response.status_code} - {menu_response.text}")
+    if not snapshot or not snapshot.menus:
         return Response({
             "error": "Failed to get menu",
-            "details": menu_response.text
+            "details": f"No restaurant with an active menu for {twilio_number}"
         }, status=500)
 
-    menu_data = menu_response.json()
-    print(menu_data, "=====menu data ======")
-
-    # Step 2: Trigger Vapi Assistant - Fixed endpoint and payload
-    vapi_payload = {
-        "assistant": {
-            "model": {
-                "provider": "openai",
-                "model": "gpt-3.5-turbo",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": f"You are a helpful restaurant assistant for {menu_data.get('restaurant_name', 'our restaurant')}. Here are our available menus: {menu_data.get('menus', [])}"
-                    }
-                ]
-            },
-            "voice": {
-                "provider": "11labs",
-                "voiceId": "21m00Tcm4TlvDq8ikWAM"  # Replace with your preferred voice ID
-            }
-        },
-        "phoneNumberId": twilio_number,  # Your Vapi phone number ID
-        "customer": {
-            "number": caller
-        }
-    }
-
-    # Alternative payload structure if you're using a pre-configured assistant
-    # vapi_payload = {
-    #     "assistantId": "your-assistant-id-here",  # Replace with your assistant ID
-    #     "phoneNumberId": "your-phone-number-id",  # Replace with your Vapi phone number ID
-    #     "customer": {
-    #         "number": caller
-    #     },
-    #     "assistantOverrides": {
-    #         "variableValues": {
-    #             "all_restaurant": menu_data
-    #         }
-    #     }
-    # }
+    menu_data = vapi_client.menu_data(snapshot, twilio_number)
 
-    try:
-        vapi_response = requests.post(
-            "https://api.vapi.ai/call",  # Try this endpoint instead
-            headers={
-                "Authorization": f"Bearer {VAPI_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json=vapi_payload,
-            timeout=30  # Add timeout
-        )
-        
-        print(f"Vapi Response Status: {vapi_response.status_code}")
-        print(f"Vapi Response: {vapi_response.text}")
-        
-        if vapi_response.status_code not in [200, 201]:
-            # If first endpoint fails, try the alternative
-            vapi_response_alt = requests.post(
-                "https://api.vapi.ai/v1/call",  # Alternative endpoint
-                headers={
-                    "Authorization": f"Bearer {VAPI_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json=vapi_payload,
-                timeout=30
-            )
-            
-            print(f"Alternative Vapi Response Status: {vapi_response_alt.status_code}")
-            print(f"Alternative Vapi Response: {vapi_response_alt.text}")
-            
-            if vapi_response_alt.status_code in [200, 201]:
-                vapi_response = vapi_response_alt
-            else:
-                raise requests.RequestException(f"Both endpoints failed: {vapi_response.status_code}, {vapi_response_alt.status_code}")
-
-    except requests.RequestException as e:
-        print(f"Vapi API Request Error: {str(e)}")
-        return Response({
-            "error": "Vapi call failed",
-            "details": str(e)
-        }, status=500)
+    # Step 2: Trigger the restaurant's registered Vapi assistant, with per-call variable overrides
+    vapi_payload = vapi_assistants.call_payload(snapshot, twilio_number, caller)
 
-    if vapi_response.status_code not in [200, 201]:
-        print(f"Vapi API Error: {vapi_response.status_code} - {vapi_response.text}")
+    try:
+        vapi_response = vapi_client.create_call(vapi_payload)
+    except vapi_client.VapiError as e:
+        failed = [result for result in e.responses if isinstance(result, requests.Response)]
         return Response({
             "error": "Vapi call failed",
-            "details": vapi_response.text,
-            "status_code": vapi_response.status_code
+            "details": failed[-1].text if failed else str(e),
+            "status_code": failed[-1].status_code if failed else None
         }, status=500)
 
     return Response({
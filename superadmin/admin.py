@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MonthlyRestaurantCount, CallRecord, UserActivity, PlanPayment, SubscriptionPlan
+from .models import MonthlyRestaurantCount, CallRecord, UserActivity, PlanPayment, SubscriptionPlan, RestaurantEntitlement
 
 
 class MonthlyRestaurantCountAdmin(admin.ModelAdmin):
@@ -44,4 +44,13 @@ class SubscriptionPlanAdmin(admin.ModelAdmin):
     search_fields = ('plan_name',)
     list_filter = ('duration', 'created_at')    
 
-admin.site.register(SubscriptionPlan, SubscriptionPlanAdmin)
\ No newline at end of file
+admin.site.register(SubscriptionPlan, SubscriptionPlanAdmin)
+
+
+
+class RestaurantEntitlementAdmin(admin.ModelAdmin):
+    list_display = ('subadmin', 'plan', 'active_until', 'updated_at')
+    search_fields = ('subadmin__email',)
+    readonly_fields = ('subadmin', 'plan', 'last_payment', 'active_until', 'updated_at')
+
+admin.site.register(RestaurantEntitlement, RestaurantEntitlementAdmin)
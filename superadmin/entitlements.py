@@ -0,0 +1,129 @@
+# entitlements.py
+import logging
+import threading
+from datetime import timedelta
+
+from cachetools import TTLCache
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# CustomUser id -> active_until (None when the restaurant has no paid plan)
+_entitlement_cache = TTLCache(
+    maxsize=getattr(settings, 'ENTITLEMENT_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'ENTITLEMENT_CACHE_TTL', 60),
+)
+_entitlement_lock = threading.Lock()
+_MISSING = object()
+
+
+def plan_validity():
+    return timedelta(days=getattr(settings, 'PLAN_VALIDITY_DAYS', 90))
+
+
+def _is_current(active_until, now=None):
+    return active_until is not None and (now or timezone.now()) < active_until
+
+
+def _remember(subadmin_id, active_until):
+    with _entitlement_lock:
+        _entitlement_cache[subadmin_id] = active_until
+    return active_until
+
+
+def _cached(subadmin_id):
+    with _entitlement_lock:
+        return _entitlement_cache.get(subadmin_id, _MISSING)
+
+
+def get_active_until(subadmin_id):
+    """Return when the restaurant's plan runs out (None if it never had one)"""
+    from .models import RestaurantEntitlement
+
+    active_until = _cached(subadmin_id)
+    if active_until is not _MISSING:
+        return active_until
+
+    active_until = None
+    for value in (
+        RestaurantEntitlement.objects
+        .filter(subadmin_id=subadmin_id)
+        .values_list('active_until', flat=True)[:1]
+    ):
+        active_until = value
+    return _remember(subadmin_id, active_until)
+
+
+async def aget_active_until(subadmin_id):
+    from .models import RestaurantEntitlement
+
+    active_until = _cached(subadmin_id)
+    if active_until is not _MISSING:
+        return active_until
+
+    active_until = None
+    async for value in (
+        RestaurantEntitlement.objects
+        .filter(subadmin_id=subadmin_id)
+        .values_list('active_until', flat=True)[:1]
+    ):
+        active_until = value
+    return _remember(subadmin_id, active_until)
+
+
+def is_entitled(subadmin_id):
+    """Whether the restaurant owner (CustomUser id) has a paid, unexpired plan"""
+    if subadmin_id is None:
+        return False
+    return _is_current(get_active_until(subadmin_id))
+
+
+async def ais_entitled(subadmin_id):
+    if subadmin_id is None:
+        return False
+    return _is_current(await aget_active_until(subadmin_id))
+
+
+def refresh_entitlement(subadmin_id):
+    """Recompute a restaurant's entitlement from its latest PAID payment"""
+    from authentication.models import CustomUser
+    from .models import PlanPayment, RestaurantEntitlement
+
+    if not CustomUser.objects.filter(pk=subadmin_id).exists():
+        # Payment removed together with its user
+        invalidate(subadmin_id)
+        return None
+
+    latest_payment = (
+        PlanPayment.objects
+        .filter(subadmin_id=subadmin_id, payment_status='PAID')
+        .order_by('-created_at')
+        .first()
+    )
+    entitlement, _ = RestaurantEntitlement.objects.update_or_create(
+        subadmin_id=subadmin_id,
+        defaults={
+            'plan_id': latest_payment.plan_id if latest_payment else None,
+            'last_payment': latest_payment,
+            'active_until': latest_payment.created_at + plan_validity() if latest_payment else None,
+        },
+    )
+    _remember(subadmin_id, entitlement.active_until)
+    logger.info(f"Entitlement for subadmin {subadmin_id} refreshed: active until {entitlement.active_until}")
+    return entitlement
+
+
+def schedule_refresh(subadmin_id):
+    """Refresh once the payment change is committed"""
+    invalidate(subadmin_id)
+    transaction.on_commit(lambda: refresh_entitlement(subadmin_id))
+
+
+def invalidate(subadmin_id=None):
+    with _entitlement_lock:
+        if subadmin_id is None:
+            _entitlement_cache.clear()
+        else:
+            _entitlement_cache.pop(subadmin_id, None)
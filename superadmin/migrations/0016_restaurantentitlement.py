@@ -0,0 +1,50 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_entitlements(apps, schema_editor):
+    from datetime import timedelta
+
+    PlanPayment = apps.get_model('superadmin', 'PlanPayment')
+    RestaurantEntitlement = apps.get_model('superadmin', 'RestaurantEntitlement')
+    validity = timedelta(days=getattr(settings, 'PLAN_VALIDITY_DAYS', 90))
+
+    latest = {}
+    for payment in PlanPayment.objects.filter(payment_status='PAID').order_by('created_at'):
+        latest[payment.subadmin_id] = payment
+
+    RestaurantEntitlement.objects.bulk_create([
+        RestaurantEntitlement(
+            subadmin_id=subadmin_id,
+            plan_id=payment.plan_id,
+            last_payment=payment,
+            active_until=payment.created_at + validity,
+        )
+        for subadmin_id, payment in latest.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('superadmin', '0015_alter_planpayment_subadmin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RestaurantEntitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_until', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='superadmin.planpayment')),
+                ('plan', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='entitlements', to='superadmin.subscriptionplan')),
+                ('subadmin', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='entitlement', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(populate_entitlements, migrations.RunPython.noop),
+    ]
@@ -29,6 +29,19 @@ class PlanPayment(models.Model):
 
 
 
+class RestaurantEntitlement(models.Model):
+    """Denormalized plan status per restaurant owner, kept in sync with PlanPayment"""
+    subadmin = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='entitlement')
+    plan = models.ForeignKey(SubscriptionPlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='entitlements')
+    last_payment = models.ForeignKey(PlanPayment, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    active_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.subadmin} - active until {self.active_until}"
+
+
+
 class MonthlyRestaurantCount(models.Model):
     month = models.DateField()
     count = models.PositiveIntegerField()
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import PlanPayment
+from . import entitlements
+
+
+@receiver(post_save, sender=PlanPayment)
+@receiver(post_delete, sender=PlanPayment)
+def refresh_plan_entitlement(sender, instance, **kwargs):
+    entitlements.schedule_refresh(instance.subadmin_id)
@@ -1,3 +1,59 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import CustomUser
+from .models import PlanPayment, RestaurantEntitlement, SubscriptionPlan
+from . import entitlements
+
+
+class EntitlementTests(TestCase):
+    def setUp(self):
+        entitlements.invalidate()
+        self.user = CustomUser.objects.create_user('owner@example.com', 'pw', role='subdir')
+        self.plan = SubscriptionPlan.objects.create(plan_name='Pro', description='', price=10, duration='monthly')
+
+    def pay(self, status='PAID'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PlanPayment.objects.create(subadmin=self.user, plan=self.plan, payment_status=status)
+
+    def test_restaurant_without_a_paid_plan_is_not_entitled(self):
+        self.pay(status='PENDING')
+
+        self.assertFalse(entitlements.is_entitled(self.user.pk))
+        self.assertFalse(entitlements.is_entitled(None))
+
+    @override_settings(PLAN_VALIDITY_DAYS=30)
+    def test_paid_plan_is_valid_for_the_plan_period(self):
+        payment = self.pay()
+
+        entitlement = RestaurantEntitlement.objects.get(subadmin=self.user)
+        self.assertEqual(entitlement.active_until, payment.created_at + timedelta(days=30))
+        self.assertTrue(entitlements.is_entitled(self.user.pk))
+        self.assertTrue(async_to_sync(entitlements.ais_entitled)(self.user.pk))
+
+    def test_checks_are_served_from_the_cache(self):
+        self.pay()
+        entitlements.invalidate()
+        entitlements.is_entitled(self.user.pk)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(entitlements.is_entitled(self.user.pk))
+
+    def test_expired_plan_is_not_entitled(self):
+        self.pay()
+        RestaurantEntitlement.objects.update(active_until=timezone.now() - timedelta(seconds=1))
+        entitlements.invalidate(self.user.pk)
+
+        self.assertFalse(entitlements.is_entitled(self.user.pk))
+
+    def test_removing_the_payment_revokes_the_plan(self):
+        payment = self.pay()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payment.delete()
+
+        self.assertFalse(entitlements.is_entitled(self.user.pk))
+        self.assertIsNone(RestaurantEntitlement.objects.get(subadmin=self.user).active_until)
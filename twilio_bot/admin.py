@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Conversation, Message , KnowledgeCategory, KnowledgeItem, ServiceFeature, PricingPlan, RestaurantType, FAQ, SuccessStory, TechnicalSpec,DemoBooking, DemoAvailability
+from django.utils import timezone
+from .models import Conversation, Message , KnowledgeCategory, KnowledgeItem, ServiceFeature, PricingPlan, RestaurantType, FAQ, SuccessStory, TechnicalSpec,DemoBooking, DemoAvailability, NotificationJob, CallCampaign, CampaignRecipient, WebhookEndpoint, WebhookDelivery, WebhookDeadLetter
 
 
 @admin.register(KnowledgeCategory)
@@ -126,4 +127,71 @@ class DemoAvailabilityAdmin(admin.ModelAdmin):
     list_display = ['day_of_week', 'start_time']
     search_fields = ['day_of_week', 'start_time']
     ordering = ['day_of_week', 'start_time']
-    
\ No newline at end of file
+    
+
+
+
+@admin.register(NotificationJob)
+class NotificationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'channel', 'recipient', 'order', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['channel', 'status']
+    search_fields = ['recipient', 'order__id', 'last_error']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'updated_at', 'sent_at', 'locked_at']
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        updated = queryset.exclude(status='sent').update(status='pending', next_attempt_at=timezone.now(), locked_at=None)
+        self.message_user(request, f"{updated} job(s) queued for retry")
+    retry_now.short_description = 'Retry selected jobs now'
+
+
+
+
+class CampaignRecipientInline(admin.TabularInline):
+    model = CampaignRecipient
+    extra = 0
+    fields = ['phone_number', 'status', 'call_sid', 'attempts', 'last_error', 'dialed_at']
+    readonly_fields = ['call_sid', 'attempts', 'last_error', 'dialed_at']
+
+
+@admin.register(CallCampaign)
+class CallCampaignAdmin(admin.ModelAdmin):
+    list_display = ['name', 'restaurant', 'status', 'max_concurrent_calls', 'calls_per_minute', 'created_at']
+    list_filter = ['status']
+    search_fields = ['name', 'restaurant__restaurant_name']
+    ordering = ['-created_at']
+    inlines = [CampaignRecipientInline]
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ['id', 'restaurant', 'url', 'is_active', 'created_at']
+    list_filter = ['is_active']
+    search_fields = ['url', 'restaurant__restaurant_name']
+    ordering = ['-created_at']
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'endpoint', 'event', 'order', 'status', 'attempts', 'response_status', 'next_attempt_at', 'sent_at']
+    list_filter = ['event', 'status']
+    search_fields = ['endpoint__url', 'order__id', 'last_error']
+    ordering = ['-created_at']
+    readonly_fields = ['created_at', 'updated_at', 'sent_at', 'locked_at']
+
+
+@admin.register(WebhookDeadLetter)
+class WebhookDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ['id', 'endpoint', 'event', 'order', 'attempts', 'response_status', 'created_at', 'replayed_at']
+    list_filter = ['event']
+    search_fields = ['endpoint__url', 'order__id', 'last_error']
+    ordering = ['-created_at']
+    actions = ['replay']
+
+    def replay(self, request, queryset):
+        from .order_webhooks import replay_dead_letters
+
+        deliveries = replay_dead_letters(queryset)
+        self.message_user(request, f"{len(deliveries)} event(s) queued again")
+    replay.short_description = 'Queue selected events again'
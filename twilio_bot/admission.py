@@ -0,0 +1,98 @@
+# admission.py
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from twilio.twiml.voice_response import VoiceResponse
+
+logger = logging.getLogger(__name__)
+
+BUSY_SMS_KEY = "ivr:busy-sms:{caller}"
+
+
+class AdmissionController:
+    """Per-worker load gauge for the voice IVR.
+
+    Counts webhook requests in flight, open media streams and the turns queued on them. New calls
+    are refused above the configured limits so the calls already in progress keep their latency;
+    turns of admitted calls are never shed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.streams = set()
+
+    @contextmanager
+    def request(self):
+        with self.lock:
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def stream_opened(self, turn_queue):
+        with self.lock:
+            self.streams.add(turn_queue)
+
+    def stream_closed(self, turn_queue):
+        with self.lock:
+            self.streams.discard(turn_queue)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'in_flight': self.in_flight,
+                'streams': len(self.streams),
+                'queued_turns': sum(turn_queue.qsize() for turn_queue in self.streams),
+            }
+
+    def overloaded(self, include_self=True):
+        """Reason string when a new call should be turned away, else None"""
+        stats = self.stats()
+        # The greeting request asking for admission is itself in flight
+        in_flight = stats['in_flight'] - (1 if include_self else 0)
+        if in_flight >= getattr(settings, 'IVR_ADMISSION_MAX_IN_FLIGHT', 40):
+            return f"{in_flight} webhook requests in flight"
+        if stats['streams'] >= getattr(settings, 'IVR_ADMISSION_MAX_STREAMS', 25):
+            return f"{stats['streams']} media streams open"
+        if stats['queued_turns'] >= getattr(settings, 'IVR_ADMISSION_MAX_QUEUED_TURNS', 20):
+            return f"{stats['queued_turns']} media stream turns queued"
+        return None
+
+
+controller = AdmissionController()
+
+
+def busy_twiml(snapshot, texted):
+    restaurant_name = getattr(snapshot, 'restaurant_name', None) or 'our restaurant'
+    message = f"Thank you for calling {restaurant_name}. All of our lines are busy right now."
+    if texted:
+        message += " We'll text you shortly so you can still place your order. Goodbye."
+    else:
+        message += " Please call back in a few minutes. Goodbye."
+    response = VoiceResponse()
+    response.say(message)
+    response.hangup()
+    return str(response)
+
+
+def send_busy_fallback(caller_number, snapshot):
+    """Queue the restaurant's SMS fallback to a caller we turned away; at most once per cooldown"""
+    from .notifications import enqueue_sms
+
+    message = getattr(snapshot, 'fallback_message', None)
+    if not caller_number or not message:
+        return False
+    if not cache.add(BUSY_SMS_KEY.format(caller=caller_number), 1, timeout=getattr(settings, 'IVR_BUSY_SMS_COOLDOWN', 600)):
+        return True
+    try:
+        enqueue_sms(caller_number, message)
+    except Exception as e:
+        logger.error(f"Could not queue busy fallback SMS for {caller_number}: {e}")
+        return False
+    return True
@@ -0,0 +1,233 @@
+# call_events.py
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from subadmin.phone_index import resolve_restaurant_id
+from .campaigns import record_call_outcomes
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Twilio CallStatus -> CallRecord.status
+STATUS_MAP = {
+    'queued': 'in-progress',
+    'initiated': 'in-progress',
+    'ringing': 'in-progress',
+    'in-progress': 'in-progress',
+    'answered': 'in-progress',
+    'completed': 'completed',
+    'busy': 'failed',
+    'no-answer': 'failed',
+    'failed': 'failed',
+    'canceled': 'failed',
+}
+
+# A later event never moves a call back to an earlier state
+STATUS_RANK = {
+    'in-progress': 0,
+    'completed': 1,
+    'failed': 1,
+    'transferred': 2,
+}
+
+
+def _queue_key():
+    return getattr(settings, 'CALL_EVENTS_QUEUE_KEY', 'twilio:call-events')
+
+
+def event_from_request(data):
+    """Reduce a Twilio status callback POST to the fields CallRecord needs"""
+    duration = data.get('CallDuration')
+    sequence = data.get('SequenceNumber')
+    return {
+        'call_sid': data.get('CallSid'),
+        'status': data.get('CallStatus', ''),
+        'duration': int(duration) if duration and duration.isdigit() else None,
+        'from': data.get('From', ''),
+        'to': data.get('To', ''),
+        'direction': data.get('Direction', ''),
+        'sequence': int(sequence) if sequence and sequence.isdigit() else None,
+        'received_at': time.time(),
+    }
+
+
+def enqueue_event(event):
+    """Push one status event for the flusher (applied immediately when Redis isn't configured)"""
+    if not event.get('call_sid'):
+        return
+
+    client = get_redis()
+    if client is None:
+        apply_events([event])
+        return
+    client.rpush(_queue_key(), json.dumps(event))
+
+
+def _processing_key():
+    return f"{_queue_key()}:processing"
+
+
+# Moves a batch from the queue onto the processing list in one step: until it's applied and acked, a
+# claimed batch is always still in Redis, never only in the memory of a flusher that may die
+CLAIM_SCRIPT = """
+local events = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #events > 0 then
+    redis.call('RPUSH', KEYS[2], unpack(events))
+    redis.call('LTRIM', KEYS[1], #events, -1)
+end
+return events
+"""
+
+
+def pop_events(batch_size):
+    """Claim up to `batch_size` events; returns (raw events for ack_events/requeue_events, events)"""
+    client = get_redis()
+    if client is None:
+        return [], []
+
+    raw_events = client.register_script(CLAIM_SCRIPT)(keys=[_queue_key(), _processing_key()], args=[batch_size])
+    return raw_events, [json.loads(raw) for raw in raw_events]
+
+
+def ack_events(raw_events):
+    """Drop applied events from the processing list"""
+    client = get_redis()
+    if client is None or not raw_events:
+        return
+
+    pipe = client.pipeline(transaction=True)
+    for raw in raw_events:
+        pipe.lrem(_processing_key(), 1, raw)
+    pipe.execute()
+
+
+def requeue_events(raw_events):
+    """Put a claimed batch that failed back on the queue"""
+    client = get_redis()
+    if client is None or not raw_events:
+        return
+
+    pipe = client.pipeline(transaction=True)
+    pipe.rpush(_queue_key(), *raw_events)
+    for raw in raw_events:
+        pipe.lrem(_processing_key(), 1, raw)
+    pipe.execute()
+
+
+def recover_events():
+    """Move batches a dead flusher left claimed back to the head of the queue; returns how many.
+
+    Run when a flusher starts. Should another flusher still be applying one of them, the event is
+    applied twice, which is harmless: rows are upserted by status rank and maximum duration.
+    """
+    client = get_redis()
+    if client is None:
+        return 0
+
+    recovered = 0
+    # RPOPLPUSH from the tail to the head keeps the original order
+    while client.rpoplpush(_processing_key(), _queue_key()) is not None:
+        recovered += 1
+    return recovered
+
+
+def coalesce(events):
+    """Fold all events of a call into one row update"""
+    calls = {}
+    for event in sorted(events, key=lambda e: (e.get('sequence') is None, e.get('sequence') or 0, e['received_at'])):
+        status = STATUS_MAP.get(event['status'])
+        if status is None:
+            logger.warning(f"Ignoring unknown call status {event['status']} for {event['call_sid']}")
+            continue
+
+        call = calls.setdefault(event['call_sid'], {
+            'status': status,
+            'duration': None,
+            'from': event['from'],
+            'to': event['to'],
+            'direction': event['direction'],
+        })
+        if STATUS_RANK[status] >= STATUS_RANK[call['status']]:
+            call['status'] = status
+        if event['duration'] is not None:
+            call['duration'] = max(call['duration'] or 0, event['duration'])
+    return calls
+
+
+def _restaurant_number(call):
+    # Inbound calls dial the restaurant's number; outbound calls are placed from it
+    return call['from'] if call['direction'].startswith('outbound') else call['to']
+
+
+def _caller_number(call):
+    return call['to'] if call['direction'].startswith('outbound') else call['from']
+
+
+def apply_events(events):
+    """Upsert CallRecord rows for a batch of events: one SELECT and one INSERT ... ON CONFLICT"""
+    from superadmin.models import CallRecord
+
+    calls = coalesce(events)
+    if not calls:
+        return 0
+
+    existing = CallRecord.objects.in_bulk(list(calls), field_name='call_sid')
+    now = timezone.now()
+    records = []
+    for call_sid, call in calls.items():
+        record = existing.get(call_sid)
+        if record is not None:
+            if STATUS_RANK.get(call['status'], 0) >= STATUS_RANK.get(record.status, 0):
+                record.status = call['status']
+            if call['duration'] is not None:
+                record.duration = max(record.duration or 0, call['duration'])
+            record.caller_number = record.caller_number or _caller_number(call)
+            record.updated_at = now
+            records.append(record)
+            continue
+
+        restaurant_id = resolve_restaurant_id(_restaurant_number(call))
+        if restaurant_id is None:
+            logger.warning(f"No restaurant routed for call {call_sid} ({_restaurant_number(call)}); skipping")
+            continue
+        records.append(CallRecord(
+            restaurant_id=restaurant_id,
+            call_sid=call_sid,
+            status=call['status'],
+            duration=call['duration'],
+            caller_number=_caller_number(call),
+        ))
+
+    CallRecord.objects.bulk_create(
+        records,
+        update_conflicts=True,
+        unique_fields=['call_sid'],
+        update_fields=['status', 'duration', 'caller_number', 'updated_at'],
+    )
+
+    # Outbound campaign calls free their concurrency slot once they end
+    record_call_outcomes({
+        record.call_sid: record.status for record in records if record.status in ('completed', 'failed')
+    })
+    return len(records)
+
+
+def flush(batch_size=None):
+    """Apply one batch from the queue; returns the number of events consumed"""
+    batch_size = batch_size or getattr(settings, 'CALL_EVENTS_BATCH_SIZE', 500)
+    raw_events, events = pop_events(batch_size)
+    if not events:
+        return 0
+
+    try:
+        apply_events(events)
+    except Exception as e:
+        logger.error(f"Failed to apply {len(events)} call events, requeueing: {e}")
+        requeue_events(raw_events)
+        raise
+    ack_events(raw_events)
+    return len(events)
@@ -0,0 +1,222 @@
+# campaigns.py
+import csv
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from subadmin.phone_index import to_e164
+from .models import CallCampaign, CampaignRecipient
+from .twilio_client import TokenBucket, get_twilio_client
+
+logger = logging.getLogger(__name__)
+
+CSV_PHONE_COLUMNS = ('phone', 'phone_number', 'number', 'mobile')
+
+
+def parse_numbers(numbers=None, csv_file=None):
+    """Collect unique E.164 numbers from a list and/or an uploaded CSV; returns (valid, invalid)"""
+    raw_numbers = list(numbers or [])
+
+    if csv_file is not None:
+        content = csv_file.read()
+        if isinstance(content, bytes):
+            content = content.decode('utf-8-sig')
+        rows = list(csv.reader(io.StringIO(content)))
+        if rows:
+            header = [cell.strip().lower() for cell in rows[0]]
+            column = next((header.index(name) for name in CSV_PHONE_COLUMNS if name in header), None)
+            if column is None:
+                column = 0
+            else:
+                rows = rows[1:]
+            raw_numbers.extend(row[column] for row in rows if len(row) > column)
+
+    valid, invalid, seen = [], [], set()
+    for raw in raw_numbers:
+        e164 = to_e164(raw)
+        digits = (e164 or '')[1:]
+        if not e164 or not digits.isdigit() or not 8 <= len(digits) <= 15:
+            if str(raw).strip():
+                invalid.append(str(raw).strip())
+            continue
+        if e164 not in seen:
+            seen.add(e164)
+            valid.append(e164)
+    return valid, invalid
+
+
+def add_recipients(campaign, numbers):
+    CampaignRecipient.objects.bulk_create(
+        [CampaignRecipient(campaign=campaign, phone_number=number) for number in numbers],
+        ignore_conflicts=True,
+        batch_size=1000,
+    )
+
+
+def _public_url(path):
+    base_url = getattr(settings, 'TWILIO_STATUS_CALLBACK_BASE_URL', '')
+    return f"{base_url.rstrip('/')}{path}" if base_url else None
+
+
+def record_call_outcomes(outcomes):
+    """Mirror final CallRecord statuses onto campaign recipients: {call_sid: 'completed'|'failed'}"""
+    for status in ('completed', 'failed'):
+        call_sids = [call_sid for call_sid, outcome in outcomes.items() if outcome == status]
+        if call_sids:
+            CampaignRecipient.objects.filter(call_sid__in=call_sids, status='dialing').update(
+                status=status, updated_at=timezone.now()
+            )
+
+
+class CampaignDispatcher:
+    """Dials pending campaign recipients within each campaign's concurrency and per-minute limits"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or getattr(settings, 'CAMPAIGN_DIALER_WORKERS', 8)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='campaign-dialer')
+        # Account-wide outbound call rate (Twilio CPS), shared by every campaign
+        self.call_limiter = TokenBucket(
+            rate=getattr(settings, 'TWILIO_CALLS_PER_SECOND', 1),
+            capacity=getattr(settings, 'TWILIO_CALLS_BURST', 1),
+        )
+        self.campaign_limiters = {}
+        self.caller_ids = {}
+
+    def campaign_limiter(self, campaign):
+        limiter = self.campaign_limiters.get(campaign.pk)
+        rate = campaign.calls_per_minute / 60.0
+        if limiter is None or limiter.rate != rate:
+            limiter = TokenBucket(rate=rate, capacity=max(1, min(campaign.max_concurrent_calls, campaign.calls_per_minute)))
+            self.campaign_limiters[campaign.pk] = limiter
+        return limiter
+
+    def caller_id(self, campaign):
+        """Call from the restaurant's own number so the IVR knows which restaurant is calling"""
+        if campaign.restaurant_id not in self.caller_ids:
+            from subadmin.models import RestaurantPhoneNumber
+
+            numbers = list(
+                RestaurantPhoneNumber.objects
+                .filter(restaurant_id=campaign.restaurant_id)
+                .order_by('-is_primary', 'id')
+                .values_list('phone_number', flat=True)[:1]
+            )
+            self.caller_ids[campaign.restaurant_id] = numbers[0] if numbers else None
+        return self.caller_ids[campaign.restaurant_id]
+
+    def expire_stale_calls(self):
+        timeout = timedelta(seconds=getattr(settings, 'CAMPAIGN_CALL_TIMEOUT_SECONDS', 30 * 60))
+        return CampaignRecipient.objects.filter(
+            status='dialing', dialed_at__lt=timezone.now() - timeout
+        ).update(status='failed', last_error='No final call status received', updated_at=timezone.now())
+
+    def claim(self, campaign, limit):
+        """Move up to `limit` pending recipients to dialing; a recipient is only ever claimed by one dispatcher"""
+        candidate_ids = list(
+            CampaignRecipient.objects
+            .filter(campaign=campaign, status='pending')
+            .order_by('id')
+            .values_list('pk', flat=True)[:limit]
+        )
+        if not candidate_ids:
+            return []
+
+        # Compare-and-set on the status (row locks aren't available on every database): a row another
+        # dispatcher claimed first is no longer pending and is left out. The claim time tells ours apart.
+        claimed_at = timezone.now()
+        claimed = CampaignRecipient.objects.filter(pk__in=candidate_ids, status='pending').update(
+            status='dialing', dialed_at=claimed_at, attempts=F('attempts') + 1
+        )
+        if not claimed:
+            return []
+        return list(CampaignRecipient.objects.filter(pk__in=candidate_ids, status='dialing', dialed_at=claimed_at))
+
+    def place_call(self, campaign, recipient, from_number):
+        self.call_limiter.acquire()
+        call = get_twilio_client().calls.create(
+            to=recipient.phone_number,
+            from_=from_number,
+            url=_public_url('/api/twilio_bot/voice-assistant/'),
+            # GET runs the greeting (plan check and welcome gather) once the customer answers
+            method='GET',
+            status_callback=_public_url('/api/twilio_bot/call-status/'),
+            status_callback_event=['initiated', 'ringing', 'answered', 'completed'],
+            status_callback_method='POST',
+        )
+        return call.sid
+
+    def dispatch(self, campaign, recipients, from_number):
+        from superadmin.models import CallRecord
+
+        futures = {self.pool.submit(self.place_call, campaign, recipient, from_number): recipient for recipient in recipients}
+
+        placed, failed = [], []
+        for future in as_completed(futures):
+            recipient = futures[future]
+            try:
+                recipient.call_sid = future.result()
+                placed.append(recipient)
+            except Exception as e:
+                logger.error(f"Campaign {campaign.pk}: call to {recipient.phone_number} failed: {e}")
+                recipient.status = 'failed'
+                recipient.last_error = str(e)
+                failed.append(recipient)
+
+        CampaignRecipient.objects.bulk_update(placed, ['call_sid'])
+        CampaignRecipient.objects.bulk_update(failed, ['status', 'last_error'])
+        # The status callback pipeline updates these rows as the calls progress
+        CallRecord.objects.bulk_create(
+            [
+                CallRecord(restaurant_id=campaign.restaurant_id, call_sid=recipient.call_sid,
+                           status='in-progress', caller_number=recipient.phone_number)
+                for recipient in placed
+            ],
+            ignore_conflicts=True,
+        )
+        return len(placed)
+
+    def run_once(self):
+        """One scheduling pass over running campaigns; returns the number of calls placed"""
+        self.expire_stale_calls()
+
+        campaigns = CallCampaign.objects.filter(status='running').annotate(
+            pending_count=Count('recipients', filter=Q(recipients__status='pending')),
+            dialing_count=Count('recipients', filter=Q(recipients__status='dialing')),
+        )
+
+        placed = 0
+        for campaign in campaigns:
+            if not campaign.pending_count:
+                if not campaign.dialing_count:
+                    CallCampaign.objects.filter(pk=campaign.pk, status='running').update(
+                        status='completed', completed_at=timezone.now()
+                    )
+                    logger.info(f"Campaign {campaign.pk} completed")
+                continue
+
+            slots = min(campaign.max_concurrent_calls - campaign.dialing_count, campaign.pending_count, self.workers)
+            limiter = self.campaign_limiter(campaign)
+            allowed = 0
+            while allowed < slots and limiter.acquire(timeout=0):
+                allowed += 1
+            if not allowed:
+                continue
+
+            from_number = self.caller_id(campaign)
+            if not from_number:
+                logger.error(f"Campaign {campaign.pk}: restaurant {campaign.restaurant_id} has no routed number; pausing")
+                CallCampaign.objects.filter(pk=campaign.pk).update(status='paused')
+                limiter.release(allowed)
+                continue
+
+            recipients = self.claim(campaign, allowed)
+            # Another dispatcher may have claimed some of them; tokens not spent on a call go back
+            limiter.release(allowed - len(recipients))
+            if recipients:
+                placed += self.dispatch(campaign, recipients, from_number)
+        return placed
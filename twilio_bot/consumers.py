@@ -315,3 +315,305 @@ class AudioChatConsumer(AsyncWebsocketConsumer):
             text_input=content if is_user else "",
             text_response=content if not is_user else ""
         )
+
+
+# ---------------------------------------------------------------------------
+# Twilio Media Streams: the phone IVR over one bidirectional WebSocket
+# ---------------------------------------------------------------------------
+import base64
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from subadmin.phone_index import aresolve_restaurant_id
+from subadmin.snapshot import aget_snapshot
+from superadmin.entitlements import ais_entitled
+from . import mulaw
+from .admission import controller as admission, busy_twiml, send_busy_fallback
+from .session_registry import atrack as atrack_session
+from .session_store import get_session_store
+from .speculation import normalize_speech
+from .twilio_client import get_twilio_client
+
+MULAW_RATE = 8000
+FRAME_BYTES = 160  # 20 ms of 8 kHz mu-law, the frame size Twilio sends
+
+
+def mulaw_to_pcm(payload):
+    return mulaw.ulaw2lin(payload)
+
+
+def mp3_to_mulaw(mp3_bytes):
+    """Decode TTS output to the 8 kHz mono mu-law Twilio plays back"""
+    segment = AudioSegment.from_file(io.BytesIO(mp3_bytes), format='mp3')
+    segment = segment.set_channels(1).set_frame_rate(MULAW_RATE).set_sample_width(2)
+    return mulaw.lin2ulaw(segment.raw_data)
+
+
+def recognize_pcm(pcm):
+    """Transcribe 8 kHz 16-bit mono PCM with the same recognizer the browser chat uses"""
+    recognizer = sr.Recognizer()
+    audio = sr.AudioData(pcm, MULAW_RATE, 2)
+    try:
+        return recognizer.recognize_google(audio)
+    except sr.UnknownValueError:
+        return None
+
+
+def split_sentences(text):
+    return [sentence for sentence in re.split(r'(?<=[.!?])\s+', ' '.join(text.split())) if sentence]
+
+
+class VoiceActivityDetector:
+    """Energy-based endpointing over 20 ms PCM frames: returns an utterance once the caller pauses"""
+
+    def __init__(self):
+        self.threshold = getattr(settings, 'IVR_VAD_RMS_THRESHOLD', 500)
+        self.silence_frames = getattr(settings, 'IVR_VAD_SILENCE_MS', 600) // 20
+        self.min_speech_frames = getattr(settings, 'IVR_VAD_MIN_SPEECH_MS', 200) // 20
+        self.max_frames = getattr(settings, 'IVR_VAD_MAX_UTTERANCE_MS', 15000) // 20
+        self.reset()
+
+    def reset(self):
+        self.frames = []
+        self.speech_frames = 0
+        self.trailing_silence = 0
+
+    @property
+    def speaking(self):
+        return self.speech_frames >= self.min_speech_frames
+
+    def add(self, pcm):
+        """Feed one frame; returns the utterance PCM when it ends, else None"""
+        voiced = mulaw.rms(pcm) >= self.threshold
+        if not self.frames and not voiced:
+            return None
+
+        self.frames.append(pcm)
+        if voiced:
+            self.speech_frames += 1
+            self.trailing_silence = 0
+        else:
+            self.trailing_silence += 1
+
+        if self.trailing_silence >= self.silence_frames or len(self.frames) >= self.max_frames:
+            utterance = b''.join(self.frames) if self.speaking else None
+            self.reset()
+            return utterance
+        return None
+
+
+class TwilioMediaStreamConsumer(AudioChatConsumer):
+    """Runs the restaurant IVR flow on a Twilio <Connect><Stream> call.
+
+    Caller audio is endpointed locally and transcribed, the turn goes through the same handlers
+    as the webhook IVR (AsyncVoiceAssistantView), and the reply is synthesized sentence by sentence
+    with the chat consumer's TTS and streamed back as mu-law frames from a background task, so the
+    receive loop keeps reading caller audio. Speaking over the assistant cancels that task and
+    clears the audio Twilio still has queued.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stream_sid = None
+        self.call_sid = None
+        self.ivr = None
+        self.session = None
+        self.vad = VoiceActivityDetector()
+        self.turns = asyncio.Queue()
+        self.worker = None
+        self.speech = None
+        self.playing = False
+
+    async def connect(self):
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if self.worker:
+            self.worker.cancel()
+        if self.speech:
+            self.speech.cancel()
+        admission.stream_closed(self.turns)
+        logger.info(f"Media stream closed for {self.call_sid} with code {close_code}")
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if not text_data:
+            return
+        try:
+            message = json.loads(text_data)
+            event = message.get('event')
+
+            if event == 'start':
+                await self.handle_start(message['start'])
+            elif event == 'media' and self.session is not None:
+                if message['media'].get('track', 'inbound') == 'inbound':
+                    await self.handle_media(base64.b64decode(message['media']['payload']))
+            elif event == 'dtmf' and self.session is not None:
+                await self.interrupt()
+                self.turns.put_nowait(('dtmf', message['dtmf']['digit'], time.monotonic()))
+            elif event == 'mark':
+                await self.handle_mark(message['mark'].get('name'))
+            elif event == 'stop':
+                await self.close()
+        except Exception as e:
+            logger.error(f"Media stream error for {self.call_sid}: {e}")
+
+    async def handle_start(self, start):
+        from .views import AsyncVoiceAssistantView
+
+        self.stream_sid = start['streamSid']
+        self.call_sid = start['callSid']
+        parameters = start.get('customParameters', {})
+
+        self.ivr = AsyncVoiceAssistantView()
+        restaurant_id = await aresolve_restaurant_id(parameters.get('To'))
+        self.ivr.snapshot = await aget_snapshot(restaurant_id)
+
+        # A stream landing on a saturated worker gets the same busy message and SMS as a shed webhook
+        overload = admission.overloaded(include_self=False)
+        if overload:
+            logger.warning(f"Turning away media stream call {self.call_sid}: {overload}")
+            texted = await sync_to_async(send_busy_fallback)(parameters.get('From'), self.ivr.snapshot)
+            await self.redirect_call(busy_twiml(self.ivr.snapshot, texted))
+            return
+        admission.stream_opened(self.turns)
+
+        if not self.ivr.snapshot:
+            self.say("Sorry, restaurant information is not available. Please try again later.", hangup=True)
+            return
+        if not await ais_entitled(self.ivr.snapshot.user_id):
+            self.say(self.ivr.get_plan_expired_message(self.ivr.snapshot.restaurant_name), hangup=True)
+            return
+
+        self.session = self.ivr.new_call_state(self.call_sid, restaurant_id, parameters.get('From'))
+        self.ivr.fill_customer_info(self.session)
+        await get_session_store().asave(self.session)
+        await atrack_session(self.call_sid, restaurant_id, self.session.current_step)
+
+        self.worker = asyncio.create_task(self.run_turns())
+        self.ivr.caller_profile = await self.ivr.aload_caller_profile(self.session.customer_info.get('phone'))
+        self.say(self.ivr.get_greeting(self.ivr.snapshot))
+
+    async def handle_media(self, payload):
+        pcm = mulaw_to_pcm(payload)
+        utterance = self.vad.add(pcm)
+        if self.vad.speaking and (self.playing or (self.speech is not None and not self.speech.done())):
+            await self.interrupt()
+        if utterance:
+            self.turns.put_nowait(('speech', utterance, time.monotonic()))
+
+    async def handle_mark(self, name):
+        if name == 'hangup':
+            await self.end_call()
+        elif name == 'response-end':
+            self.playing = False
+
+    async def interrupt(self):
+        """Barge-in: stop streaming the rest of the reply and drop whatever audio Twilio still has queued"""
+        streaming = self.speech is not None and not self.speech.done()
+        if streaming:
+            self.speech.cancel()
+        if self.playing or streaming:
+            self.playing = False
+            await self.send(text_data=json.dumps({'event': 'clear', 'streamSid': self.stream_sid}))
+
+    async def run_turns(self):
+        while True:
+            kind, data, heard_at = await self.turns.get()
+            try:
+                if kind == 'speech':
+                    text = await sync_to_async(recognize_pcm, thread_sensitive=False)(data)
+                    if not text:
+                        continue
+                    user_input = normalize_speech(text)
+                else:
+                    user_input = data
+                await self.run_turn(user_input, heard_at)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Media stream turn error for {self.call_sid}: {e}")
+                self.say("Sorry, there was an error processing your request. Please try again.")
+
+    async def run_turn(self, user_input, heard_at):
+        """One IVR turn, identical to a webhook POST: same handlers, same session store"""
+        if self.ivr.needs_caller_profile(self.session):
+            self.ivr.caller_profile = await self.ivr.aload_caller_profile(self.session.customer_info.get('phone'))
+        # The handlers read prompts and the menu resolver from the cache and may write the order: off the loop
+        response_text = await sync_to_async(self.ivr.process_voice_input)(self.session, user_input)
+        self.session.turn += 1
+        await get_session_store().asave(self.session)
+
+        finished = self.ivr.is_call_finished(self.session)
+        if finished:
+            await get_session_store().apersist(self.session)
+            response_text = f"{response_text} Thank you for calling! Have a great day!"
+        await atrack_session(self.call_sid, self.session.restaurant_id, self.session.current_step, finished)
+        self.say(response_text, hangup=finished, heard_at=heard_at)
+
+    def say(self, text, hangup=False, heard_at=None):
+        """Speak `text` in the background, replacing any reply still being streamed"""
+        if self.speech is not None and not self.speech.done():
+            self.speech.cancel()
+        self.speech = asyncio.create_task(self.speak(text, hangup, heard_at))
+
+    async def speak(self, text, hangup=False, heard_at=None):
+        """Synthesize sentence by sentence (next one in parallel) and stream each as soon as it's ready"""
+        sentences = split_sentences(text)
+        pending = [asyncio.create_task(self.synthesize(sentence)) for sentence in sentences[:1]]
+        try:
+            for index in range(len(sentences)):
+                if index + 1 < len(sentences):
+                    pending.append(asyncio.create_task(self.synthesize(sentences[index + 1])))
+                audio = await pending[index]
+                if not audio:
+                    continue
+                if heard_at is not None:
+                    logger.info(f"Media stream {self.call_sid}: first audio {(time.monotonic() - heard_at) * 1000:.0f} ms after end of speech")
+                    heard_at = None
+                self.playing = True
+                for offset in range(0, len(audio), FRAME_BYTES):
+                    await self.send(text_data=json.dumps({
+                        'event': 'media',
+                        'streamSid': self.stream_sid,
+                        'media': {'payload': base64.b64encode(audio[offset:offset + FRAME_BYTES]).decode('ascii')},
+                    }))
+        except asyncio.CancelledError:
+            for task in pending:
+                task.cancel()
+            # Talking over the goodbye still ends the call
+            if hangup:
+                await self.send_mark('hangup')
+            raise
+
+        # Twilio echoes a mark once the audio before it has played
+        await self.send_mark('hangup' if hangup else 'response-end')
+
+    async def synthesize(self, sentence):
+        try:
+            mp3 = await self.text_to_speech(sentence)
+            if not mp3:
+                return None
+            return await sync_to_async(mp3_to_mulaw, thread_sensitive=False)(mp3)
+        except Exception as e:
+            logger.error(f"Media stream TTS error for {self.call_sid}: {e}")
+            return None
+
+    async def send_mark(self, name):
+        await self.send(text_data=json.dumps({'event': 'mark', 'streamSid': self.stream_sid, 'mark': {'name': name}}))
+
+    async def end_call(self):
+        await self.redirect_call('<Response><Hangup/></Response>')
+
+    async def redirect_call(self, twiml):
+        """Replace the call's TwiML (ending the stream) through the REST API"""
+        try:
+            await sync_to_async(self.update_call, thread_sensitive=False)(twiml)
+        except Exception as e:
+            logger.error(f"Error updating media stream call {self.call_sid}: {e}")
+        await self.close()
+
+    def update_call(self, twiml):
+        get_twilio_client().calls(self.call_sid).update(twiml=twiml)
@@ -0,0 +1,95 @@
+# idempotency.py
+import asyncio
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_KEY = "ivr:turn:{fingerprint}:twiml"
+LOCK_KEY = "ivr:turn:{fingerprint}:lock"
+POLL_INTERVAL = 0.05
+
+
+def _response_ttl():
+    return getattr(settings, 'IVR_TURN_DEDUP_TTL', 120)
+
+
+def _lock_timeout():
+    return getattr(settings, 'IVR_TURN_LOCK_TIMEOUT', 15)
+
+
+def _wait_timeout():
+    return getattr(settings, 'IVR_TURN_DEDUP_WAIT', 10)
+
+
+def turn_fingerprint(call_sid, step, turn, user_input):
+    """Identify one webhook delivery; a Twilio retry repeats the same action URL and input"""
+    raw = f"{call_sid}|{step or ''}|{turn or ''}|{(user_input or '').strip().lower()}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def begin(fingerprint):
+    """Return (cached_twiml, owned).
+
+    owned=True means this request must process the turn and call finish().
+    Otherwise cached_twiml is the original response (None if it never finished in time).
+    """
+    response_key = RESPONSE_KEY.format(fingerprint=fingerprint)
+    cached = cache.get(response_key)
+    if cached is not None:
+        return cached, False
+
+    if cache.add(LOCK_KEY.format(fingerprint=fingerprint), 1, timeout=_lock_timeout()):
+        return None, True
+
+    # A duplicate of a request that is still being processed: answer with its result
+    deadline = time.monotonic() + _wait_timeout()
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        cached = cache.get(response_key)
+        if cached is not None:
+            return cached, False
+    logger.warning(f"Turn {fingerprint} still in flight after {_wait_timeout()}s")
+    return None, False
+
+
+def finish(fingerprint, twiml):
+    cache.set(RESPONSE_KEY.format(fingerprint=fingerprint), twiml, timeout=_response_ttl())
+    cache.delete(LOCK_KEY.format(fingerprint=fingerprint))
+
+
+def release(fingerprint):
+    """Give up ownership without caching anything (the turn failed)"""
+    cache.delete(LOCK_KEY.format(fingerprint=fingerprint))
+
+
+async def abegin(fingerprint):
+    response_key = RESPONSE_KEY.format(fingerprint=fingerprint)
+    cached = await cache.aget(response_key)
+    if cached is not None:
+        return cached, False
+
+    if await cache.aadd(LOCK_KEY.format(fingerprint=fingerprint), 1, timeout=_lock_timeout()):
+        return None, True
+
+    deadline = time.monotonic() + _wait_timeout()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL)
+        cached = await cache.aget(response_key)
+        if cached is not None:
+            return cached, False
+    logger.warning(f"Turn {fingerprint} still in flight after {_wait_timeout()}s")
+    return None, False
+
+
+async def afinish(fingerprint, twiml):
+    await cache.aset(RESPONSE_KEY.format(fingerprint=fingerprint), twiml, timeout=_response_ttl())
+    await cache.adelete(LOCK_KEY.format(fingerprint=fingerprint))
+
+
+async def arelease(fingerprint):
+    await cache.adelete(LOCK_KEY.format(fingerprint=fingerprint))
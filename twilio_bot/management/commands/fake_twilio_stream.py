@@ -0,0 +1,173 @@
+# twilio_bot/management/commands/fake_twilio_stream.py
+import asyncio
+import base64
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from pydub import AudioSegment
+
+from subadmin.models import RestaurantPhoneNumber
+from twilio_bot import mulaw
+
+STREAM_PATH = '/ws/twilio_media/'
+FRAME_BYTES = 160
+SILENCE = b'\xff' * FRAME_BYTES  # mu-law silence
+
+
+def wav_to_mulaw(path):
+    """Read a WAV file as 8 kHz mono mu-law, the format Twilio streams"""
+    segment = AudioSegment.from_wav(path).set_channels(1).set_frame_rate(8000).set_sample_width(2)
+    return mulaw.lin2ulaw(segment.raw_data)
+
+
+class InProcessStream:
+    """Talk to the consumer through the ASGI app in this process; no server needed"""
+
+    async def open(self):
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+        from twilio_bot import routing
+
+        self.communicator = WebsocketCommunicator(URLRouter(routing.websocket_urlpatterns), STREAM_PATH)
+        connected, _ = await self.communicator.connect()
+        if not connected:
+            raise CommandError('Media stream consumer refused the connection')
+
+    async def send(self, message):
+        await self.communicator.send_to(text_data=json.dumps(message))
+
+    async def receive(self, timeout):
+        try:
+            return json.loads(await self.communicator.receive_from(timeout=timeout))
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        await self.communicator.disconnect()
+
+
+class RemoteStream:
+    """Talk to a running server (daphne/uvicorn) over a real WebSocket"""
+
+    def __init__(self, url):
+        self.url = url
+
+    async def open(self):
+        import aiohttp
+
+        self.http = aiohttp.ClientSession()
+        self.ws = await self.http.ws_connect(self.url)
+
+    async def send(self, message):
+        await self.ws.send_str(json.dumps(message))
+
+    async def receive(self, timeout):
+        try:
+            return json.loads(await self.ws.receive_str(timeout=timeout))
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        await self.ws.close()
+        await self.http.close()
+
+
+class Command(BaseCommand):
+    help = 'Play a caller against the Twilio Media Streams consumer like Twilio would, and report turn latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', help='Dialed restaurant number (defaults to the first routed number)')
+        parser.add_argument('--from', dest='from_number', default='+15550100100', help='Caller number')
+        parser.add_argument('--digits', default='', help='Comma separated keypresses, one per turn, e.g. "1,1,1,1"')
+        parser.add_argument('--wav', action='append', default=[], help='Spoken turn as a WAV file; repeat for several turns')
+        parser.add_argument('--url', help='ws:// URL of a running server instead of the in-process consumer')
+        parser.add_argument('--realtime', action='store_true', help='Pace audio at 20 ms per frame like a real call')
+        parser.add_argument('--timeout', type=float, default=15, help='Seconds to wait for each response')
+
+    def handle(self, *args, **options):
+        to_number = options['to'] or RestaurantPhoneNumber.objects.values_list('phone_number', flat=True).first()
+        if not to_number:
+            raise CommandError('No routed restaurant number found; pass --to')
+
+        turns = [('dtmf', digit.strip()) for digit in options['digits'].split(',') if digit.strip()]
+        turns += [('speech', wav_to_mulaw(path)) for path in options['wav']]
+
+        stream = RemoteStream(options['url']) if options['url'] else InProcessStream()
+        asyncio.run(self.run_call(stream, to_number, options['from_number'], turns, options))
+
+    async def run_call(self, stream, to_number, from_number, turns, options):
+        self.stream_sid = f'MZfake{uuid.uuid4().hex[:26]}'
+        call_sid = f'CAfake{uuid.uuid4().hex[:26]}'
+        await stream.open()
+        try:
+            await stream.send({'event': 'connected', 'protocol': 'Call', 'version': '1.0.0'})
+            await stream.send({
+                'event': 'start',
+                'streamSid': self.stream_sid,
+                'start': {
+                    'streamSid': self.stream_sid,
+                    'callSid': call_sid,
+                    'tracks': ['inbound'],
+                    'mediaFormat': {'encoding': 'audio/x-mulaw', 'sampleRate': 8000, 'channels': 1},
+                    'customParameters': {'To': to_number, 'From': from_number},
+                },
+            })
+            self.report('greeting', *await self.await_response(stream, time.monotonic(), options['timeout']))
+
+            for kind, data in turns:
+                if kind == 'dtmf':
+                    await stream.send({'event': 'dtmf', 'streamSid': self.stream_sid, 'dtmf': {'track': 'inbound_track', 'digit': data}})
+                    label = f'dtmf {data}'
+                else:
+                    # The caller's audio followed by enough silence for the consumer to end the utterance
+                    await self.send_audio(stream, data + SILENCE * 40, options['realtime'])
+                    label = 'speech'
+                first_audio, done, frames, mark = await self.await_response(stream, time.monotonic(), options['timeout'])
+                self.report(label, first_audio, done, frames, mark)
+                if mark in ('hangup', None):
+                    break
+
+            await stream.send({'event': 'stop', 'streamSid': self.stream_sid, 'stop': {'callSid': call_sid}})
+        finally:
+            await stream.close()
+
+    async def send_audio(self, stream, audio, realtime):
+        for offset in range(0, len(audio), FRAME_BYTES):
+            await stream.send({
+                'event': 'media',
+                'streamSid': self.stream_sid,
+                'media': {'track': 'inbound', 'payload': base64.b64encode(audio[offset:offset + FRAME_BYTES]).decode('ascii')},
+            })
+            if realtime:
+                await asyncio.sleep(0.02)
+
+    async def await_response(self, stream, started, timeout):
+        """Collect one reply; returns (ms to first audio, ms to end mark, audio frames, mark name)"""
+        first_audio, frames = None, 0
+        while True:
+            message = await stream.receive(timeout)
+            if message is None:
+                return first_audio, None, frames, None
+            if message.get('event') == 'media':
+                frames += 1
+                if first_audio is None:
+                    first_audio = (time.monotonic() - started) * 1000
+            elif message.get('event') == 'mark':
+                name = message['mark']['name']
+                # Twilio echoes marks once playback reaches them; the hangup mark would end a real call
+                if name != 'hangup':
+                    await stream.send({'event': 'mark', 'streamSid': self.stream_sid, 'mark': {'name': name}})
+                return first_audio, (time.monotonic() - started) * 1000, frames, name
+
+    def report(self, label, first_audio, done, frames, mark):
+        if done is None:
+            self.stdout.write(self.style.ERROR(f"{label:<12} no response within the timeout ({frames} audio frames)"))
+            return
+        first = f"{first_audio:.0f} ms" if first_audio is not None else 'no audio'
+        self.stdout.write(
+            f"{label:<12} first audio {first:>9}  complete {done:.0f} ms  "
+            f"{frames * 20 / 1000:.1f}s of audio  [{mark}]"
+        )
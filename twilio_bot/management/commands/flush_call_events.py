@@ -0,0 +1,40 @@
+# twilio_bot/management/commands/flush_call_events.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from twilio_bot.call_events import flush, recover_events
+from twilio_bot.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = 'Upsert queued Twilio call status events into CallRecord in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Events applied per batch')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        if get_redis() is None:
+            raise CommandError('REDIS_URL is not set; call events are applied inline without a queue')
+
+        batch_size = options['batch_size']
+        self.stdout.write(f'Call event flusher started (batch size {batch_size})')
+        recovered = recover_events()
+        if recovered:
+            self.stdout.write(f'Requeued {recovered} call event(s) left unapplied by a previous flusher')
+
+        while True:
+            close_old_connections()
+            flushed = flush(batch_size)
+            if flushed:
+                self.stdout.write(f'Applied {flushed} call event(s)')
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Call event queue drained'))
@@ -0,0 +1,71 @@
+# twilio_bot/management/commands/render_prompt_audio.py
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from authentication.models import SubAdminProfile
+from subadmin.snapshot import get_snapshot, get_version
+from twilio_bot import prompt_audio
+
+
+class Command(BaseCommand):
+    help = "Pre-render each restaurant's static IVR prompts to audio so calls <Play> them instead of <Say>"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, action='append', default=[], help='SubAdminProfile id (repeatable)')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and re-render a restaurant whenever its menu snapshot changes')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between snapshot checks with --watch')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete recordings no current prompt uses, once workers have stopped playing them '
+                                 '(a later run or --watch pass, IVR_PROMPT_AUDIO_MANIFEST_TTL seconds on)')
+
+    def handle(self, *args, **options):
+        rendered_versions = {}
+
+        while True:
+            close_old_connections()
+            restaurant_ids = options['restaurant'] or list(SubAdminProfile.objects.values_list('pk', flat=True))
+
+            in_use = set()
+            for restaurant_id in restaurant_ids:
+                version = get_version(restaurant_id)
+                snapshot = get_snapshot(restaurant_id)
+                if snapshot is None:
+                    continue
+                texts = prompt_audio.restaurant_prompts(snapshot)
+                in_use.update(prompt_audio.audio_name(text) for text in texts)
+
+                # The snapshot version moves on every menu/hours/profile change
+                if rendered_versions.get(restaurant_id) == version:
+                    continue
+                written, failed = asyncio.run(self.render_all(texts))
+                if not failed:
+                    rendered_versions[restaurant_id] = version
+                self.stdout.write(f'{snapshot.restaurant_name}: {len(texts)} prompts, {written} newly rendered, {failed} failed')
+
+            # Workers only <Play> what the manifest lists
+            if options['prune'] and not options['restaurant']:
+                retired, deleted = prompt_audio.prune(in_use)
+                if retired or deleted:
+                    self.stdout.write(f'Removed {deleted} unused recording(s), {retired} more awaiting removal')
+            else:
+                prompt_audio.publish_manifest()
+
+            if not options['watch']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Prompt audio up to date'))
+
+    async def render_all(self, texts):
+        written = failed = 0
+        for text in texts:
+            try:
+                written += await prompt_audio.render(text)
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'Could not render "{text[:40]}...": {e}')
+        return written, failed
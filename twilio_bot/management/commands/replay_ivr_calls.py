@@ -0,0 +1,245 @@
+# twilio_bot/management/commands/replay_ivr_calls.py
+import json
+import math
+import random
+import re
+import time
+import urllib.parse
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.models.signals import post_save
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from subadmin.models import Order, UserSession, RestaurantPhoneNumber
+from twilio_bot.models import WebhookDelivery, WebhookDeadLetter
+from twilio_bot.notifications import run_pending
+
+VOICE_PATH = '/api/twilio_bot/voice-assistant/'
+ERROR_MARKERS = ('Sorry, there was an error',)
+
+# Digits pressed after the greeting: continue, first menu, first item, confirm
+DEFAULT_SCRIPT = ['1', '1', '1', '1']
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = 'Replay scripted Twilio calls against the voice webhook and report latency, query counts and errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', help='Dialed restaurant number (defaults to the first routed number)')
+        parser.add_argument('--calls', type=int, default=20, help='Number of calls to replay')
+        parser.add_argument('--concurrency', type=int, default=5, help='Calls in flight at once')
+        parser.add_argument('--script', action='append', default=[],
+                            help='Comma separated inputs after the greeting, e.g. "1,2,1,1"; repeat to mix scripts')
+        parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                            help='Fraction of turns re-sent like a Twilio retry (checks webhook dedup)')
+        parser.add_argument('--base-url', help='Replay over HTTP against a running server instead of in-process')
+        parser.add_argument('--scratch-db', action='store_true',
+                            help='Confirm the database is a disposable copy: replayed calls place real orders')
+        parser.add_argument('--drain-notifications', action='store_true',
+                            help="Deliver the replay's own notifications afterwards with local SMS/email stand-ins")
+        parser.add_argument('--max-queries', type=int,
+                            help='Exit with an error if any step runs more queries than this')
+        parser.add_argument('--keep-data', action='store_true', help="Don't delete the orders and sessions created")
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        if not options['scratch_db']:
+            raise CommandError(
+                'Replayed calls create real orders, and their notifications and POS webhook events are queued for '
+                'the real workers. Run this against a scratch copy of the database and pass --scratch-db.'
+            )
+
+        to_number = options['to'] or RestaurantPhoneNumber.objects.values_list('phone_number', flat=True).first()
+        if not to_number:
+            raise CommandError('No routed restaurant number found; pass --to')
+
+        scripts = [script.split(',') for script in options['script']] or [DEFAULT_SCRIPT]
+        self.base_url = options['base_url']
+        self.duplicate_rate = options['duplicate_rate']
+        self.run_id = uuid.uuid4().hex[:8]
+
+        created_orders = []
+
+        def track_order(sender, instance, created, **kwargs):
+            if created:
+                created_orders.append(instance.pk)
+
+        post_save.connect(track_order, sender=Order, dispatch_uid=f'replay-{self.run_id}')
+        sent_sms = []
+        try:
+            with override_settings(
+                ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            ):
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                    results = list(pool.map(
+                        lambda index: self.replay_call(index, to_number, random.choice(scripts)),
+                        range(options['calls'])
+                    ))
+                elapsed = time.perf_counter() - started
+
+                if options['drain_notifications']:
+                    def fake_send_message(to, body, status_callback=None):
+                        sent_sms.append(to)
+                        return SimpleNamespace(sid=f'SMreplay{self.run_id}{len(sent_sms)}', status='queued')
+
+                    with mock.patch('twilio_bot.twilio_client.send_message', side_effect=fake_send_message):
+                        # Only the replay's jobs: anything else in the queue belongs to real customers
+                        while run_pending(100, order_ids=created_orders):
+                            pass
+        finally:
+            post_save.disconnect(sender=Order, dispatch_uid=f'replay-{self.run_id}')
+
+        report = self.build_report(results, elapsed, created_orders, sent_sms)
+
+        if not options['keep_data']:
+            # Webhook rows outlive their order (SET_NULL), so drop them before the dispatcher sends them on
+            WebhookDelivery.objects.filter(order_id__in=created_orders).delete()
+            WebhookDeadLetter.objects.filter(order_id__in=created_orders).delete()
+            Order.objects.filter(pk__in=created_orders).delete()
+            UserSession.objects.filter(session_id__startswith=f'CAreplay{self.run_id}').delete()
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_report(report)
+
+        if options['max_queries'] is not None:
+            over = {step: stats['max_queries'] for step, stats in report['steps'].items()
+                    if stats['max_queries'] is not None and stats['max_queries'] > options['max_queries']}
+            if over:
+                raise CommandError(f"Query budget of {options['max_queries']} exceeded: {over}")
+
+    def replay_call(self, index, to_number, script):
+        """Run one call; returns a list of (step, seconds, queries, ok)"""
+        close_old_connections()
+        client = Client() if not self.base_url else None
+        session = None
+        if self.base_url:
+            import requests
+            session = requests.Session()
+
+        call = {
+            'CallSid': f'CAreplay{self.run_id}{index:06d}',
+            'From': f'+1555{random.randint(0, 9999999):07d}',
+            'To': to_number,
+            'AccountSid': 'ACreplay',
+            'Direction': 'inbound',
+        }
+        timings = []
+
+        body, seconds, queries, ok = self.send(client, session, 'get', VOICE_PATH, {**call, 'CallStatus': 'in-progress'})
+        timings.append(('greeting', seconds, queries, ok))
+        action = self.next_action(body)
+
+        for digits in script:
+            if not ok or action is None:
+                break
+            step = urllib.parse.parse_qs(urllib.parse.urlparse(action).query).get('step', ['welcome'])[0]
+            data = {**call, 'CallStatus': 'in-progress', 'Digits': digits}
+            body, seconds, queries, ok = self.send(client, session, 'post', action, data)
+            timings.append((step, seconds, queries, ok))
+
+            if self.duplicate_rate and random.random() < self.duplicate_rate:
+                retry_body, seconds, queries, retry_ok = self.send(client, session, 'post', action, data)
+                timings.append((f'{step} (retry)', seconds, queries, retry_ok and retry_body == body))
+
+            action = self.next_action(body)
+
+        close_old_connections()
+        return timings
+
+    def send(self, client, session, method, path, data):
+        started = time.perf_counter()
+        try:
+            if session is not None:
+                response = getattr(session, method)(
+                    urllib.parse.urljoin(self.base_url, path),
+                    **({'params': data} if method == 'get' else {'data': data}),
+                    timeout=15
+                )
+                body, status_code, queries = response.text, response.status_code, None
+            else:
+                with CaptureQueriesContext(connection) as captured:
+                    response = getattr(client, method)(path, data)
+                body, status_code, queries = response.content.decode(), response.status_code, len(captured.captured_queries)
+        except Exception as e:
+            return str(e), time.perf_counter() - started, None, False
+
+        ok = status_code == 200 and not any(marker in body for marker in ERROR_MARKERS)
+        return body, time.perf_counter() - started, queries, ok
+
+    def next_action(self, body):
+        match = re.search(r'<Gather[^>]*action="([^"]+)"', body or '')
+        if not match:
+            return None
+        return match.group(1).replace('&amp;', '&')
+
+    def build_report(self, results, elapsed, created_orders, sent_sms):
+        per_step = defaultdict(list)
+        for timings in results:
+            for step, seconds, queries, ok in timings:
+                per_step[step].append((seconds, queries, ok))
+
+        steps = {}
+        for step, samples in per_step.items():
+            latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+            queries = [count for _, count, _ in samples if count is not None]
+            errors = sum(1 for _, _, ok in samples if not ok)
+            steps[step] = {
+                'requests': len(samples),
+                'errors': errors,
+                'error_rate': round(errors / len(samples), 4),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p90_ms': round(percentile(latencies, 90), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'max_ms': round(latencies[-1], 2),
+                'avg_queries': round(sum(queries) / len(queries), 2) if queries else None,
+                'max_queries': max(queries) if queries else None,
+            }
+
+        total_requests = sum(stats['requests'] for stats in steps.values())
+        total_errors = sum(stats['errors'] for stats in steps.values())
+        return {
+            'calls': len(results),
+            'requests': total_requests,
+            'errors': total_errors,
+            'error_rate': round(total_errors / total_requests, 4) if total_requests else 0,
+            'elapsed_s': round(elapsed, 3),
+            'requests_per_s': round(total_requests / elapsed, 1) if elapsed else 0,
+            'orders_created': len(created_orders),
+            'sms_sent': len(sent_sms),
+            'steps': steps,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"{report['calls']} calls, {report['requests']} requests in {report['elapsed_s']}s "
+            f"({report['requests_per_s']} req/s), {report['errors']} errors ({report['error_rate']:.2%}), "
+            f"{report['orders_created']} orders, {report['sms_sent']} SMS"
+        )
+        self.stdout.write(f"{'step':<28}{'reqs':>6}{'err%':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}{'avg q':>7}{'max q':>7}")
+        for step, stats in report['steps'].items():
+            self.stdout.write(
+                f"{step:<28}{stats['requests']:>6}{stats['error_rate']:>8.2%}"
+                f"{stats['p50_ms']:>9}{stats['p90_ms']:>9}{stats['p99_ms']:>9}{stats['max_ms']:>9}"
+                f"{stats['avg_queries'] if stats['avg_queries'] is not None else '-':>7}"
+                f"{stats['max_queries'] if stats['max_queries'] is not None else '-':>7}"
+            )
@@ -0,0 +1,34 @@
+# twilio_bot/management/commands/run_call_campaigns.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from twilio_bot.campaigns import CampaignDispatcher
+
+
+class Command(BaseCommand):
+    help = 'Dial pending call campaign recipients within each campaign\'s concurrency and rate limits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Calls placed in parallel (default CAMPAIGN_DIALER_WORKERS)')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between scheduling passes')
+        parser.add_argument('--once', action='store_true', help='Run a single scheduling pass and exit')
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'TWILIO_STATUS_CALLBACK_BASE_URL', ''):
+            raise CommandError('TWILIO_STATUS_CALLBACK_BASE_URL must be set so Twilio can reach the voice and status webhooks')
+
+        dispatcher = CampaignDispatcher(workers=options['workers'])
+        self.stdout.write(f'Campaign dispatcher started ({dispatcher.workers} workers)')
+
+        while True:
+            close_old_connections()
+            placed = dispatcher.run_once()
+            if placed:
+                self.stdout.write(f'Placed {placed} call(s)')
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
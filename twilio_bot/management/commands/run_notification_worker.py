@@ -0,0 +1,33 @@
+# twilio_bot/management/commands/run_notification_worker.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from twilio_bot.notifications import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued order email/SMS notifications (run several processes to scale out)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Jobs claimed per poll')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the due jobs once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write(f'Notification worker started (batch size {batch_size})')
+
+        while True:
+            close_old_connections()
+            processed = run_pending(batch_size)
+            if processed:
+                self.stdout.write(f'Processed {processed} notification job(s)')
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Notification queue drained'))
@@ -0,0 +1,33 @@
+# twilio_bot/management/commands/run_webhook_dispatcher.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from twilio_bot.order_webhooks import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued order events to restaurant POS webhooks in signed batches (run several processes to scale out)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Deliveries claimed per poll, across all endpoints')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Drain the due deliveries once and exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write(f'Webhook dispatcher started (batch size {batch_size})')
+
+        while True:
+            close_old_connections()
+            processed = run_pending(batch_size)
+            if processed:
+                self.stdout.write(f'Dispatched {processed} webhook event(s)')
+                continue
+
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS('Webhook queue drained'))
@@ -0,0 +1,50 @@
+# twilio_bot/management/commands/sync_vapi_assistants.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from authentication.models import SubAdminProfile
+from subadmin.snapshot import get_snapshot
+from subadmin.vapi_assistants import sync_assistant
+
+
+class Command(BaseCommand):
+    help = "Register or update each restaurant's persistent Vapi assistant when its compiled config changes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurant', type=int, action='append', default=[], help='SubAdminProfile id (repeatable)')
+        parser.add_argument('--force', action='store_true', help='Push every config even if Vapi already has it')
+        parser.add_argument('--watch', action='store_true',
+                            help='Keep running and re-sync a restaurant whenever its menu snapshot changes')
+        parser.add_argument('--interval', type=float, default=30.0, help='Seconds between snapshot checks with --watch')
+
+    def handle(self, *args, **options):
+        force = options['force']
+
+        while True:
+            close_old_connections()
+            restaurant_ids = options['restaurant'] or list(SubAdminProfile.objects.values_list('pk', flat=True))
+
+            pushed = failed = 0
+            for restaurant_id in restaurant_ids:
+                snapshot = get_snapshot(restaurant_id)
+                if snapshot is None:
+                    continue
+                try:
+                    assistant_id, changed = sync_assistant(snapshot, force=force)
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f'{snapshot.restaurant_name}: {e}')
+                    continue
+                if changed:
+                    pushed += 1
+                    self.stdout.write(f'{snapshot.restaurant_name}: assistant {assistant_id} updated')
+
+            self.stdout.write(f'{len(restaurant_ids)} restaurants, {pushed} assistants pushed, {failed} failed')
+            if not options['watch']:
+                break
+            force = False
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS('Vapi assistants up to date'))
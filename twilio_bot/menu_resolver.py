@@ -0,0 +1,153 @@
+# menu_resolver.py
+import re
+import threading
+from difflib import SequenceMatcher
+
+from cachetools import LRUCache
+from django.conf import settings
+
+# Filler in spoken orders that says nothing about which item is meant
+STOPWORDS = {
+    'a', 'an', 'the', 'i', 'id', 'im', 'would', 'like', 'want', 'please', 'some', 'me', 'get', 'give',
+    'can', 'could', 'have', 'order', 'of', 'and', 'to', 'for', 'with', 'um', 'uh', 'yes', 'yeah', 'okay', 'ok',
+}
+
+# (restaurant_id, snapshot version) -> MenuResolver; a menu edit bumps the version
+_resolvers = LRUCache(maxsize=getattr(settings, 'IVR_MENU_RESOLVER_CACHE_SIZE', 512))
+_lock = threading.Lock()
+
+_PHONETIC_RULES = [
+    (re.compile(r'^(kn|gn|pn|wr)'), lambda m: m.group(1)[1]),
+    (re.compile(r'^x'), lambda m: 's'),
+    (re.compile(r'gh(?=[aeiou])'), lambda m: 'k'),
+    (re.compile(r'gh'), lambda m: ''),
+    (re.compile(r'ph'), lambda m: 'f'),
+    (re.compile(r'(sch|sk)'), lambda m: 'sk'),
+    (re.compile(r'tch|ch|sh|sio|tia|tio'), lambda m: 'X'),
+    (re.compile(r'th'), lambda m: '0'),
+    (re.compile(r'dg(?=[eiy])'), lambda m: 'j'),
+    (re.compile(r'c(?=[eiy])'), lambda m: 's'),
+    (re.compile(r'g(?=[eiy])'), lambda m: 'j'),
+    (re.compile(r'g'), lambda m: 'k'),
+    (re.compile(r'ck|c|q'), lambda m: 'k'),
+    (re.compile(r'x'), lambda m: 'ks'),
+    (re.compile(r'z'), lambda m: 's'),
+    (re.compile(r'v'), lambda m: 'f'),
+]
+
+
+def normalize(text):
+    return re.sub(r'\s+', ' ', re.sub(r'[^a-z0-9\s]', ' ', (text or '').lower())).strip()
+
+
+def tokens(text):
+    return [token for token in normalize(text).split() if token not in STOPWORDS]
+
+
+def phonetic(word):
+    """Metaphone-style sound key: 'margherita' and 'margarita' both give 'mrkrt'.
+
+    A dependency-free subset of Double Metaphone's English rules, enough to absorb ASR spelling
+    variants of menu words.
+    """
+    if not word.isalpha():
+        return word
+    for pattern, replacement in _PHONETIC_RULES:
+        word = pattern.sub(replacement, word)
+    head, tail = word[0], re.sub(r'[aeiouyhw]', '', word[1:])
+    key = head + tail
+    return re.sub(r'(.)\1+', r'\1', key)
+
+
+def sound_index(words):
+    """{sound key: words with that key}"""
+    index = {}
+    for word in words:
+        index.setdefault(phonetic(word), []).append(word)
+    return index
+
+
+class _Entry:
+    __slots__ = ('target', 'name', 'tokens', 'sounds')
+
+    def __init__(self, target, name):
+        self.target = target
+        self.name = normalize(name)
+        self.tokens = frozenset(tokens(name))
+        self.sounds = [(token, phonetic(token)) for token in self.tokens]
+
+
+class MenuResolver:
+    """Precomputed names, token sets and sound keys for one restaurant snapshot"""
+
+    def __init__(self, snapshot):
+        self.threshold = getattr(settings, 'IVR_MENU_MATCH_THRESHOLD', 0.6)
+        # Naming an item from any menu skips the category step, so that match must be a near-certain one
+        self.direct_threshold = getattr(settings, 'IVR_MENU_DIRECT_MATCH_THRESHOLD', 0.8)
+        self.margin = getattr(settings, 'IVR_MENU_MATCH_MARGIN', 0.1)
+        # Short words share sound keys by accident ('call' and 'cola' are both 'kl'): a word heard
+        # for a name's word must also be spelled like it
+        self.sound_min_ratio = getattr(settings, 'IVR_MENU_SOUND_MIN_RATIO', 0.6)
+        self.menus = [_Entry(menu, menu.name) for menu in snapshot.menus]
+        self.items = {menu.id: [_Entry((menu, item), item.name) for item in menu.items] for menu in snapshot.menus}
+        self.all_items = [entry for entries in self.items.values() for entry in entries]
+
+    def sounds_like(self, word, heard_words):
+        return any(SequenceMatcher(None, word, heard, autojunk=False).ratio() >= self.sound_min_ratio
+                   for heard in heard_words)
+
+    def score(self, entry, query, query_tokens, query_sounds):
+        if not entry.tokens:
+            return 0.0
+        if entry.name and f' {entry.name} ' in f' {query} ':
+            return 1.0
+        # Share of the name's words the caller said, by spelling or by sound
+        word_score = len(entry.tokens & query_tokens) / len(entry.tokens)
+        heard = sum(1 for token, code in entry.sounds if code in query_sounds and self.sounds_like(token, query_sounds[code]))
+        sound_score = 0.9 * heard / len(entry.sounds)
+        score = max(word_score, sound_score)
+        if score < 1.0:
+            matcher = SequenceMatcher(None, entry.name, ' '.join(sorted(query_tokens)), autojunk=False)
+            if matcher.real_quick_ratio() > score and matcher.quick_ratio() > score:
+                score = max(score, matcher.ratio())
+        return score
+
+    def best(self, entries, text, threshold=None):
+        """Scores every candidate in one pass; returns the winner only if it's clear of the runner-up"""
+        query = normalize(text)
+        query_tokens = frozenset(tokens(text))
+        if not query_tokens:
+            return None
+        query_sounds = sound_index(query_tokens)
+
+        best_score, runner_up, best_entry = 0.0, 0.0, None
+        for entry in entries:
+            score = self.score(entry, query, query_tokens, query_sounds)
+            if score > best_score:
+                best_score, runner_up, best_entry = score, best_score, entry
+            elif score > runner_up:
+                runner_up = score
+        if best_entry is None or best_score < (threshold or self.threshold) or best_score - runner_up < self.margin:
+            return None
+        return best_entry.target
+
+    def match_menu(self, text):
+        """MenuSnapshot the caller named, or None"""
+        return self.best(self.menus, text)
+
+    def match_item(self, text, menu_id=None):
+        """(MenuSnapshot, MenuItemSnapshot) the caller named, within one menu or (held to a higher bar) across all of them"""
+        if menu_id is not None:
+            return self.best(self.items.get(menu_id, []), text)
+        return self.best(self.all_items, text, threshold=self.direct_threshold)
+
+
+def get_resolver(snapshot):
+    key = (snapshot.restaurant_id, snapshot.version)
+    with _lock:
+        resolver = _resolvers.get(key)
+    if resolver is None:
+        resolver = MenuResolver(snapshot)
+        with _lock:
+            _resolvers[key] = resolver
+    return resolver
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.23 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twilio_bot', '0007_notificationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationjob',
+            name='delivery_status',
+            field=models.CharField(blank=True, help_text='Latest Twilio message status', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notificationjob',
+            name='provider_sid',
+            field=models.CharField(blank=True, db_index=True, help_text='Twilio Message SID', max_length=64),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.23 on 2026-10-19 14:20
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The fallback cache (settings.CACHES without REDIS_URL) is a table; a no-op for other backends
+    call_command('createcachetable', database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('twilio_bot', '0010_order_webhooks'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 # models.py
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 import json
 
 class KnowledgeCategory(models.Model):
@@ -275,4 +276,179 @@ class DemoAvailability(models.Model):
     is_active = models.BooleanField(default=True)
     
     def __str__(self):
-        return f"{self.get_day_of_week_display()} {self.start_time}-{self.end_time}"
\ No newline at end of file
+        return f"{self.get_day_of_week_display()} {self.start_time}-{self.end_time}"
+
+
+class NotificationJob(models.Model):
+    """Outbound email/SMS queued by the voice assistant and delivered by a worker"""
+    CHANNEL_CHOICES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    order = models.ForeignKey('subadmin.Order', on_delete=models.CASCADE, null=True, blank=True, related_name='notification_jobs')
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255, help_text="Email address or phone number")
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    provider_sid = models.CharField(max_length=64, blank=True, db_index=True, help_text="Twilio Message SID")
+    delivery_status = models.CharField(max_length=20, blank=True, help_text="Latest Twilio message status")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_channel_display()} to {self.recipient} ({self.status})"
+
+
+class CallCampaign(models.Model):
+    """Outbound calling campaign (reminders, reorders) for one restaurant"""
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('paused', 'Paused'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    restaurant = models.ForeignKey('authentication.SubAdminProfile', on_delete=models.CASCADE, related_name='call_campaigns')
+    name = models.CharField(max_length=200)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+    max_concurrent_calls = models.PositiveIntegerField(default=5, validators=[MinValueValidator(1), MaxValueValidator(50)])
+    calls_per_minute = models.PositiveIntegerField(default=30, validators=[MinValueValidator(1), MaxValueValidator(600)])
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class CampaignRecipient(models.Model):
+    """One number to call in a campaign; call_sid links it to its CallRecord"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('dialing', 'Dialing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    campaign = models.ForeignKey(CallCampaign, on_delete=models.CASCADE, related_name='recipients')
+    phone_number = models.CharField(max_length=20)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    call_sid = models.CharField(max_length=34, blank=True, db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    dialed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        unique_together = ['campaign', 'phone_number']
+        indexes = [
+            models.Index(fields=['campaign', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.phone_number} ({self.status})"
+
+
+def generate_webhook_secret():
+    import secrets
+    return secrets.token_hex(32)
+
+
+class WebhookEndpoint(models.Model):
+    """A restaurant's POS/kitchen URL that receives signed order events (twilio_bot.order_webhooks)"""
+    EVENT_CHOICES = [
+        ('order.created', 'Order created'),
+        ('order.status_changed', 'Order status changed'),
+    ]
+
+    restaurant = models.ForeignKey('authentication.SubAdminProfile', on_delete=models.CASCADE, related_name='webhook_endpoints')
+    url = models.URLField(max_length=500)
+    secret = models.CharField(max_length=64, default=generate_webhook_secret, help_text="HMAC-SHA256 signing key")
+    events = models.JSONField(default=list, blank=True, help_text="Event types to send; empty sends all")
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def wants(self, event):
+        return not self.events or event in self.events
+
+    def __str__(self):
+        return f"{self.url} ({self.restaurant_id})"
+
+
+class WebhookDelivery(models.Model):
+    """One order event queued for one endpoint; the dispatcher sends them in batches per endpoint"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('sent', 'Sent'),
+    ]
+
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='deliveries')
+    order = models.ForeignKey('subadmin.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='webhook_deliveries')
+    event = models.CharField(max_length=50, choices=WebhookEndpoint.EVENT_CHOICES)
+    payload = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    response_status = models.PositiveIntegerField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.event} -> {self.endpoint_id} ({self.status})"
+
+
+class WebhookDeadLetter(models.Model):
+    """An order event that used up its retries; kept for inspection and replay"""
+    endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='dead_letters')
+    order = models.ForeignKey('subadmin.Order', on_delete=models.SET_NULL, null=True, blank=True, related_name='webhook_dead_letters')
+    event = models.CharField(max_length=50, choices=WebhookEndpoint.EVENT_CHOICES)
+    payload = models.JSONField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    response_status = models.PositiveIntegerField(null=True, blank=True)
+    replayed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.event} -> {self.endpoint_id} (dead)"
@@ -0,0 +1,55 @@
+# mulaw.py
+"""G.711 mu-law <-> 16-bit PCM for Twilio Media Streams.
+
+Same results as the stdlib audioop functions it replaces (audioop is deprecated and gone in
+Python 3.13). Both directions are table lookups; PCM is native-endian like audioop's.
+"""
+import math
+from array import array
+
+BIAS = 0x84
+CLIP = 8159
+SEGMENT_ENDS = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+
+
+def _decode(value):
+    value = ~value & 0xFF
+    sample = ((value & 0x0F) << 3) + BIAS
+    sample <<= (value & 0x70) >> 4
+    return BIAS - sample if value & 0x80 else sample - BIAS
+
+
+def _encode(sample):
+    """One 14-bit sample to mu-law"""
+    if sample < 0:
+        sample, mask = -sample, 0x7F
+    else:
+        mask = 0xFF
+    sample = min(sample, CLIP) + (BIAS >> 2)
+    for segment, end in enumerate(SEGMENT_ENDS):
+        if sample <= end:
+            return ((segment << 4) | ((sample >> (segment + 1)) & 0x0F)) ^ mask
+    return 0x7F ^ mask
+
+
+DECODE = array('h', (_decode(value) for value in range(256)))
+# Indexed by the 14-bit sample (16-bit >> 2) offset to be non-negative
+ENCODE = bytes(_encode(sample) for sample in range(-8192, 8192))
+
+
+def ulaw2lin(data):
+    """mu-law bytes to 16-bit PCM"""
+    return array('h', (DECODE[value] for value in data)).tobytes()
+
+
+def lin2ulaw(pcm):
+    """16-bit PCM to mu-law bytes"""
+    return bytes(ENCODE[(sample >> 2) + 8192] for sample in memoryview(pcm).cast('h'))
+
+
+def rms(pcm):
+    """Root mean square of 16-bit PCM, the loudness measure the VAD thresholds against"""
+    samples = memoryview(pcm).cast('h')
+    if not samples:
+        return 0
+    return int(math.sqrt(sum(sample * sample for sample in samples) / len(samples)))
@@ -0,0 +1,214 @@
+# notifications.py
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db.models import F, Q, Prefetch
+from django.utils import timezone
+
+from subadmin.models import Order, OrderItem
+from .models import NotificationJob
+from .twilio_client import get_sms_sender, sms_status_callback_url
+from .utils import clean_phone_number
+
+logger = logging.getLogger(__name__)
+
+
+# Twilio message statuses after which no further callbacks change the outcome
+FINAL_DELIVERY_STATUSES = ('delivered', 'undelivered', 'failed', 'read', 'canceled')
+
+
+class NotificationDeliveryError(Exception):
+    pass
+
+
+def render_order_notifications(order):
+    """Build the restaurant email and the two SMS bodies for an order"""
+    # Restaurant, menu and items (with their menu items) in a constant number of queries
+    order = (
+        Order.objects
+        .select_related('restaurant', 'menu')
+        .prefetch_related(Prefetch('items', queryset=OrderItem.objects.select_related('menu_item')))
+        .get(pk=order.pk)
+    )
+    order_items = order.items.all()
+    items_list = ', '.join([f"{item.menu_item.name} x{item.quantity}" for item in order_items])
+
+    # Email to restaurant
+    restaurant_subject = f"New Voice Order #{order.id}"
+    restaurant_message = f"""
+            New voice order request received!
+
+            Order #{order.id}
+            Customer Phone: {order.customer_phone}
+            Selected Category: {order.menu.name}
+            Items Ordered: {items_list}
+            Order Time: {order.created_at.strftime('%Y-%m-%d %H:%M:%S')}
+
+            Restaurant: {order.restaurant.restaurant_name}
+            Address: {order.restaurant.address}, {order.restaurant.city}, {order.restaurant.state}
+
+            Please call customer at {order.customer_phone} to confirm details and pricing.
+
+            Notes: {order.notes}
+            """
+
+    customer_sms = f"""🍽️ {order.restaurant.restaurant_name}
+
+Order #{order.id} confirmed!
+
+Items: {items_list}
+
+We'll call you shortly at {order.customer_phone} to confirm details.
+
+Restaurant: {order.restaurant.address}, {order.restaurant.city}
+Phone: {order.restaurant.phone_number}
+
+Thank you!"""
+
+    restaurant_sms = f"""📋 NEW ORDER ALERT
+
+Order #{order.id}
+Customer: {order.customer_phone}
+Items: {items_list}
+Time: {order.created_at.strftime('%H:%M')}
+
+Please call to confirm."""
+
+    return [
+        NotificationJob(order=order, channel='email', recipient=order.restaurant.email_address,
+                        subject=restaurant_subject, body=restaurant_message),
+        NotificationJob(order=order, channel='sms', recipient=order.customer_phone, body=customer_sms),
+        NotificationJob(order=order, channel='sms', recipient=order.restaurant.phone_number, body=restaurant_sms),
+    ]
+
+
+def enqueue_order_notifications(order):
+    """Queue order email/SMS for the worker instead of sending them inline"""
+    jobs = [job for job in render_order_notifications(order) if job.recipient]
+    return NotificationJob.objects.bulk_create(jobs)
+
+
+def enqueue_sms(phone_number, message, order=None):
+    return NotificationJob.objects.create(order=order, channel='sms', recipient=phone_number, body=message)
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter: 30s, 60s, 120s ... capped"""
+    base = getattr(settings, 'NOTIFICATION_RETRY_BASE_SECONDS', 30)
+    cap = getattr(settings, 'NOTIFICATION_RETRY_MAX_SECONDS', 60 * 60)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_jobs(batch_size=20, order_ids=None):
+    """Atomically mark due jobs as running so several workers can share the queue; `order_ids` limits it to those orders"""
+    now = timezone.now()
+    lock_timeout = timedelta(seconds=getattr(settings, 'NOTIFICATION_LOCK_TIMEOUT_SECONDS', 300))
+
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='running', locked_at__lt=now - lock_timeout)
+    queryset = NotificationJob.objects.filter(due)
+    if order_ids is not None:
+        queryset = queryset.filter(order_id__in=order_ids)
+    candidates = list(
+        queryset
+        .order_by('next_attempt_at')
+        .values_list('id', 'status', 'locked_at')[:batch_size]
+    )
+
+    claimed_ids = []
+    for job_id, job_status, locked_at in candidates:
+        updated = NotificationJob.objects.filter(
+            pk=job_id, status=job_status, locked_at=locked_at
+        ).update(status='running', locked_at=now, attempts=F('attempts') + 1)
+        if updated:
+            claimed_ids.append(job_id)
+
+    return list(NotificationJob.objects.filter(pk__in=claimed_ids))
+
+
+def submit_sms(job):
+    """Hand an SMS job to the shared rate-limited sender; returns a Future"""
+    formatted_phone = clean_phone_number(job.recipient)
+    if not formatted_phone:
+        raise NotificationDeliveryError(f"Invalid phone number {job.recipient}")
+    return get_sms_sender().submit(formatted_phone, job.body, sms_status_callback_url())
+
+
+def deliver(job, pending_sms=None):
+    if job.channel == 'email':
+        send_mail(
+            job.subject,
+            job.body,
+            settings.DEFAULT_FROM_EMAIL,
+            [job.recipient],
+            fail_silently=False
+        )
+    elif job.channel == 'sms':
+        message = (pending_sms or submit_sms(job)).result()
+        job.provider_sid = message.sid or ''
+        job.delivery_status = message.status or ''
+    else:
+        raise NotificationDeliveryError(f"Unknown channel {job.channel}")
+
+
+def process_job(job, pending_sms=None):
+    """Deliver one claimed job and record the outcome"""
+    try:
+        deliver(job, pending_sms)
+    except Exception as e:
+        job.last_error = str(e)
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            logger.error(f"Notification job {job.id} failed permanently after {job.attempts} attempts: {e}")
+        else:
+            job.status = 'pending'
+            job.next_attempt_at = timezone.now() + backoff_delay(job.attempts)
+            logger.warning(f"Notification job {job.id} attempt {job.attempts} failed, retrying at {job.next_attempt_at}: {e}")
+        job.save(update_fields=['status', 'last_error', 'locked_at', 'next_attempt_at', 'updated_at'])
+        return False
+
+    job.status = 'sent'
+    job.sent_at = timezone.now()
+    job.locked_at = None
+    job.last_error = ''
+    job.save(update_fields=['status', 'sent_at', 'locked_at', 'last_error', 'provider_sid', 'delivery_status', 'updated_at'])
+    logger.info(f"Notification job {job.id} ({job.channel}) sent for order #{job.order_id}")
+    return True
+
+
+def run_pending(batch_size=20, order_ids=None):
+    """Claim and deliver one batch; returns the number of jobs processed"""
+    jobs = claim_jobs(batch_size, order_ids)
+
+    # Submit every SMS first so the batch goes out concurrently (within the rate limit)
+    pending = {}
+    for job in jobs:
+        if job.channel == 'sms':
+            try:
+                pending[job.pk] = submit_sms(job)
+            except NotificationDeliveryError:
+                pass  # recorded as a failed attempt by process_job below
+
+    for job in jobs:
+        process_job(job, pending.get(job.pk))
+    return len(jobs)
+
+
+def record_delivery_status(message_sid, message_status, error_code=None):
+    """Apply a Twilio message status callback to the job that sent the message"""
+    if not message_sid or not message_status:
+        return 0
+
+    jobs = NotificationJob.objects.filter(provider_sid=message_sid)
+    if message_status not in FINAL_DELIVERY_STATUSES:
+        # Callbacks can arrive out of order; never move a final status back to 'sent'
+        jobs = jobs.exclude(delivery_status__in=FINAL_DELIVERY_STATUSES)
+
+    updated = jobs.update(delivery_status=message_status, updated_at=timezone.now())
+    if message_status in ('undelivered', 'failed'):
+        logger.warning(f"SMS {message_sid} was {message_status} by the carrier (error {error_code})")
+    return updated
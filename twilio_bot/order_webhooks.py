@@ -0,0 +1,318 @@
+# order_webhooks.py
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import socket
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import WebhookEndpoint, WebhookDelivery, WebhookDeadLetter
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-SmoothieQ-Signature'
+
+_session = None
+_pool = None
+_init_lock = threading.Lock()
+
+
+class UnsafeWebhookURL(ValueError):
+    """The URL is not https or its host resolves to a loopback/private/link-local/reserved address"""
+
+
+def _is_public(address):
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def check_url(url):
+    """Raise UnsafeWebhookURL unless `url` is https and every address its host resolves to is public.
+
+    Checked when an endpoint is saved and again before every send, since DNS can change in between.
+    Returns the checked addresses, in resolver order, for the send to connect to.
+    """
+    parts = urlsplit(url)
+    if parts.scheme != 'https' or not parts.hostname:
+        raise UnsafeWebhookURL("Webhook URLs must use https.")
+    try:
+        port = parts.port or 443
+        infos = socket.getaddrinfo(parts.hostname, port, proto=socket.IPPROTO_TCP)
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise UnsafeWebhookURL(f"Could not resolve {parts.hostname}.")
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses or not all(_is_public(address) for address in addresses):
+        raise UnsafeWebhookURL(f"{parts.hostname} does not resolve to a public address.")
+    return addresses
+
+
+def pinned_url(url, address):
+    """(`url` with its host replaced by `address`, the Host header naming the original host)"""
+    parts = urlsplit(url)
+    ip = ipaddress.ip_address(address.split('%', 1)[0])
+    host = f"[{ip}]" if ip.version == 6 else str(ip)
+    port = f":{parts.port}" if parts.port else ''
+    userinfo = parts.netloc.rpartition('@')[0]
+    netloc = f"{userinfo}@{host}{port}" if userinfo else f"{host}{port}"
+    return parts._replace(netloc=netloc).geturl(), f"{parts.hostname}{port}"
+
+
+class PinnedAddressAdapter(HTTPAdapter):
+    """Connects to the address in the URL but does TLS (SNI, certificate check) for the Host header's name.
+
+    post_batch sends to the address check_url() just approved, so a DNS answer that changes between
+    the check and the connect (DNS rebinding) can't steer the request to an internal address.
+    """
+
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, verify, cert)
+        host = request.headers.get('Host')
+        if host and host_params['scheme'] == 'https':
+            hostname = urlsplit(f"//{host}").hostname
+            # Part of the pool key too, so each name gets its own connections to a shared address
+            pool_kwargs['server_hostname'] = hostname
+            pool_kwargs['assert_hostname'] = hostname
+        return host_params, pool_kwargs
+
+
+def get_session():
+    """Process-wide session: one keep-alive connection pool per POS host across batches"""
+    global _session
+    if _session is None:
+        with _init_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = PinnedAddressAdapter(pool_connections=32, pool_maxsize=getattr(settings, 'WEBHOOK_WORKERS', 8))
+                session.mount('https://', adapter)
+                # https only (check_url() refuses anything else): without an adapter, plain http raises InvalidSchema
+                session.adapters.pop('http://', None)
+                session.headers.update({'Content-Type': 'application/json', 'User-Agent': 'SmoothieQ-Webhooks/1.0'})
+                _session = session
+    return _session
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _init_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'WEBHOOK_WORKERS', 8),
+                    thread_name_prefix='order-webhooks',
+                )
+    return _pool
+
+
+def order_data(order, items, previous_status=None):
+    """The order as POS systems receive it; `items` are OrderItems with their menu_item loaded"""
+    data = {
+        'id': order.pk,
+        'restaurant_id': order.restaurant_id,
+        'menu_id': order.menu_id,
+        'status': order.status,
+        'customer_name': order.customer_name,
+        'customer_phone': order.customer_phone,
+        'notes': order.notes,
+        'created_at': order.created_at,
+        'items': [
+            {
+                'menu_item_id': item.menu_item_id,
+                'name': item.menu_item.name,
+                'price': item.menu_item.price,
+                'quantity': item.quantity,
+            }
+            for item in items
+        ],
+    }
+    if previous_status is not None:
+        data['previous_status'] = previous_status
+    return data
+
+
+def enqueue_order_event(order, event, items=None, previous_status=None):
+    """Queue `event` for every active endpoint of the order's restaurant that subscribes to it.
+
+    Call inside the transaction that changes the order, so events exist exactly when the change
+    commits (a transactional outbox). Returns the queued deliveries.
+    """
+    endpoints = [
+        endpoint for endpoint in WebhookEndpoint.objects.filter(restaurant_id=order.restaurant_id, is_active=True)
+        if endpoint.wants(event)
+    ]
+    if not endpoints:
+        return []
+
+    if items is None:
+        items = order.items.select_related('menu_item')
+    # Round-trip through the encoder so Decimals and datetimes are stored as JSON strings
+    payload = json.loads(json.dumps({
+        # Stable across retries and replays, so receivers can drop duplicates
+        'id': f"evt_{uuid.uuid4().hex}",
+        'type': event,
+        'occurred_at': timezone.now(),
+        'data': {'order': order_data(order, items, previous_status)},
+    }, cls=DjangoJSONEncoder))
+    return WebhookDelivery.objects.bulk_create([
+        WebhookDelivery(endpoint=endpoint, order=order, event=event, payload=payload) for endpoint in endpoints
+    ])
+
+
+def sign(secret, timestamp, body):
+    """Stripe-style signature over "<timestamp>.<body>", so receivers can also reject replays"""
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter: 10s, 20s, 40s ... capped"""
+    base = getattr(settings, 'WEBHOOK_RETRY_BASE_SECONDS', 10)
+    cap = getattr(settings, 'WEBHOOK_RETRY_MAX_SECONDS', 60 * 60)
+    delay = min(cap, base * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_deliveries(limit=200):
+    """Mark due deliveries as running in one UPDATE; the claim timestamp tells this worker's rows apart"""
+    now = timezone.now()
+    lock_timeout = timedelta(seconds=getattr(settings, 'WEBHOOK_LOCK_TIMEOUT_SECONDS', 300))
+
+    due = Q(status='pending', next_attempt_at__lte=now) | Q(status='running', locked_at__lt=now - lock_timeout)
+    candidate_ids = list(
+        WebhookDelivery.objects.filter(due, endpoint__is_active=True)
+        .order_by('next_attempt_at', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not candidate_ids:
+        return []
+
+    WebhookDelivery.objects.filter(due, pk__in=candidate_ids).update(
+        status='running', locked_at=now, attempts=F('attempts') + 1
+    )
+    return list(
+        WebhookDelivery.objects.filter(pk__in=candidate_ids, status='running', locked_at=now)
+        .select_related('endpoint')
+        .order_by('id')
+    )
+
+
+def post_batch(endpoint, deliveries):
+    """POST one signed batch of events; returns (ok, response status or None, error text)"""
+    body = json.dumps({
+        'events': [delivery.payload for delivery in deliveries],
+    }, separators=(',', ':')).encode()
+    headers = {SIGNATURE_HEADER: sign(endpoint.secret, int(time.time()), body)}
+    timeout = (getattr(settings, 'WEBHOOK_CONNECT_TIMEOUT', 3.05), getattr(settings, 'WEBHOOK_READ_TIMEOUT', 10))
+    try:
+        addresses = check_url(endpoint.url)
+    except UnsafeWebhookURL as e:
+        return False, None, str(e)
+    url, headers['Host'] = pinned_url(endpoint.url, addresses[0])
+    try:
+        # Redirects are not followed: they could point anywhere, including back inside our network
+        response = get_session().post(url, data=body, headers=headers, timeout=timeout, allow_redirects=False)
+    except requests.RequestException as e:
+        return False, None, type(e).__name__
+    # Only the status is kept: the response body is the receiver's, and is shown back to the restaurant
+    response.close()
+    if 200 <= response.status_code < 300:
+        return True, response.status_code, ''
+    return False, response.status_code, f"HTTP {response.status_code}"
+
+
+def record_batch(deliveries, ok, response_status, error):
+    now = timezone.now()
+    ids = [delivery.pk for delivery in deliveries]
+    if ok:
+        WebhookDelivery.objects.filter(pk__in=ids).update(
+            status='sent', sent_at=now, locked_at=None, last_error='', response_status=response_status, updated_at=now
+        )
+        return
+
+    max_attempts = getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8)
+    dead = [delivery for delivery in deliveries if delivery.attempts >= max_attempts]
+    retry = [delivery for delivery in deliveries if delivery.attempts < max_attempts]
+
+    for delivery in retry:
+        delivery.status = 'pending'
+        delivery.locked_at = None
+        delivery.last_error = error
+        delivery.response_status = response_status
+        delivery.next_attempt_at = now + backoff_delay(delivery.attempts)
+        delivery.updated_at = now
+    WebhookDelivery.objects.bulk_update(
+        retry, ['status', 'locked_at', 'last_error', 'response_status', 'next_attempt_at', 'updated_at']
+    )
+
+    if dead:
+        with transaction.atomic():
+            WebhookDeadLetter.objects.bulk_create([
+                WebhookDeadLetter(
+                    endpoint_id=delivery.endpoint_id, order_id=delivery.order_id, event=delivery.event,
+                    payload=delivery.payload, attempts=delivery.attempts, last_error=error,
+                    response_status=response_status,
+                )
+                for delivery in dead
+            ])
+            WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in dead]).delete()
+        logger.error(f"{len(dead)} webhook event(s) for endpoint {dead[0].endpoint_id} dead-lettered: {error}")
+
+
+def run_pending(limit=200):
+    """Claim due deliveries and send them, one concurrent batch POST per endpoint; returns how many were claimed"""
+    deliveries = claim_deliveries(limit)
+    if not deliveries:
+        return 0
+
+    batch_size = getattr(settings, 'WEBHOOK_BATCH_SIZE', 50)
+    by_endpoint = defaultdict(list)
+    for delivery in deliveries:
+        by_endpoint[delivery.endpoint_id].append(delivery)
+
+    batches = []
+    for endpoint_deliveries in by_endpoint.values():
+        endpoint = endpoint_deliveries[0].endpoint
+        for start in range(0, len(endpoint_deliveries), batch_size):
+            batch = endpoint_deliveries[start:start + batch_size]
+            batches.append((batch, get_pool().submit(post_batch, endpoint, batch)))
+
+    for batch, future in batches:
+        ok, response_status, error = future.result()
+        if not ok:
+            logger.warning(f"Webhook batch of {len(batch)} to endpoint {batch[0].endpoint_id} failed: {error}")
+        record_batch(batch, ok, response_status, error)
+    return len(deliveries)
+
+
+def replay_dead_letters(dead_letters):
+    """Queue dead-lettered events again, as fresh deliveries"""
+    dead_letters = [dead_letter for dead_letter in dead_letters if dead_letter.replayed_at is None]
+    with transaction.atomic():
+        deliveries = WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(
+                endpoint_id=dead_letter.endpoint_id, order_id=dead_letter.order_id,
+                event=dead_letter.event, payload=dead_letter.payload,
+            )
+            for dead_letter in dead_letters
+        ])
+        WebhookDeadLetter.objects.filter(pk__in=[dead_letter.pk for dead_letter in dead_letters]).update(
+            replayed_at=timezone.now()
+        )
+    return deliveries
@@ -0,0 +1,159 @@
+# prompt_audio.py
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from cachetools import LRUCache
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+AUDIO_DIR = 'prompt_audio'
+MANIFEST_KEY = 'ivr:prompt-audio:manifest'
+# {name: time it left the manifest} for recordings awaiting deletion by prune()
+RETIRED_KEY = 'ivr:prompt-audio:retired'
+
+# Rendered files never change (the name is the hash of voice + text), so their URLs are remembered for good
+_urls = LRUCache(maxsize=getattr(settings, 'IVR_PROMPT_AUDIO_INDEX_SIZE', 8192))
+# Names of every stored recording, published to the cache by render_prompt_audio and re-read from it
+# every IVR_PROMPT_AUDIO_MANIFEST_TTL seconds, so the webhook path never touches storage
+_manifest = None
+_manifest_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def _voice():
+    return getattr(settings, 'IVR_PROMPT_VOICE', 'en-US-JennyNeural')
+
+
+def normalize_prompt(text):
+    return ' '.join((text or '').split())
+
+
+def audio_name(text):
+    digest = hashlib.sha1(f"{_voice()}|{normalize_prompt(text)}".encode('utf-8')).hexdigest()
+    return f"{AUDIO_DIR}/{digest}.mp3"
+
+
+def _manifest_ttl():
+    return getattr(settings, 'IVR_PROMPT_AUDIO_MANIFEST_TTL', 60)
+
+
+def publish_manifest(names=None):
+    """Share the set of playable recordings (stored and not retired) with every worker; returns it"""
+    if names is None:
+        names = stored_names() - (cache.get(RETIRED_KEY) or {}).keys()
+    names = frozenset(names)
+    cache.set(MANIFEST_KEY, names, timeout=None)
+    return names
+
+
+def prune(in_use):
+    """Delete recordings no current prompt uses, without pulling them from under a worker; returns (retired, deleted).
+
+    Unused recordings are first dropped from the published manifest, and only deleted once they've been
+    out of it for longer than workers keep their copy, so no call is sent a <Play> URL that's gone.
+    """
+    now = time.time()
+    stored = stored_names()
+    # A recording that is back in use (the menu change was undone) simply returns to the manifest
+    retired = {name: since for name, since in (cache.get(RETIRED_KEY) or {}).items() if name in stored and name not in in_use}
+    for name in stored - in_use:
+        retired.setdefault(name, now)
+    cache.set(RETIRED_KEY, retired, timeout=None)
+    publish_manifest(stored - retired.keys())
+
+    expired = [name for name, since in retired.items() if now - since > _manifest_ttl()]
+    for name in expired:
+        default_storage.delete(name)
+        del retired[name]
+    cache.set(RETIRED_KEY, retired, timeout=None)
+    return len(retired), len(expired)
+
+
+def rendered_names():
+    global _manifest, _manifest_loaded_at
+
+    if _manifest is not None and time.monotonic() - _manifest_loaded_at < _manifest_ttl():
+        return _manifest
+
+    names = cache.get(MANIFEST_KEY)
+    if names is None:
+        # Nothing published yet (fresh cache): list the directory once and publish it for the others
+        names = publish_manifest()
+    with _lock:
+        _manifest, _manifest_loaded_at = names, time.monotonic()
+    return names
+
+
+def audio_url(text):
+    """URL of the pre-rendered recording of this exact prompt, or None to fall back to <Say>"""
+    if not getattr(settings, 'IVR_PROMPT_AUDIO', True) or not text:
+        return None
+
+    name = audio_name(text)
+    if name not in rendered_names():
+        return None
+    with _lock:
+        url = _urls.get(name)
+    if url is None:
+        url = default_storage.url(name)
+        with _lock:
+            _urls[name] = url
+    return url
+
+
+async def render(text):
+    """Synthesize a prompt into storage unless it is already there; returns True if a file was written"""
+    import edge_tts
+
+    name = audio_name(text)
+    if default_storage.exists(name):
+        return False
+
+    with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        await edge_tts.Communicate(normalize_prompt(text), _voice()).save(temp_path)
+        with open(temp_path, 'rb') as audio_file:
+            default_storage.save(name, File(audio_file))
+    finally:
+        os.unlink(temp_path)
+    return True
+
+
+def stored_names():
+    try:
+        _, files = default_storage.listdir(AUDIO_DIR)
+    except FileNotFoundError:
+        return set()
+    return {f"{AUDIO_DIR}/{filename}" for filename in files}
+
+
+def pages(entries, page_size):
+    return max(1, -(-len(entries) // page_size))
+
+
+def restaurant_prompts(snapshot):
+    """Every static prompt a caller can hear for this snapshot (the welcome once per weekday and per reopening)"""
+    from .views import VoiceAssistantView, NO_INPUT_PROMPT
+
+    view = VoiceAssistantView()
+    view.snapshot = snapshot
+    texts = [view.get_welcome_message(snapshot, day=hours.day) for hours in snapshot.hours]
+    texts.append(view.get_welcome_message(snapshot, day=''))
+    if snapshot.schedule:
+        texts.extend(view.get_welcome_message(snapshot, reopens=opening) for opening in snapshot.schedule.openings())
+    page_size = view.get_page_size()
+    texts.extend(view.render_menu_options(snapshot, page) for page in range(pages(snapshot.menus, page_size)))
+    texts.extend(
+        view.render_menu_items(menu, page) for menu in snapshot.menus for page in range(pages(menu.items, page_size))
+    )
+    texts.append(NO_INPUT_PROMPT)
+    return list(dict.fromkeys(texts))
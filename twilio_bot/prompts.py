@@ -0,0 +1,40 @@
+# prompts.py
+import threading
+
+from cachetools import LRUCache
+from django.conf import settings
+
+# (restaurant_id, snapshot version, prompt name, menu id) -> prompt text; a menu edit bumps the version
+_prompts = LRUCache(maxsize=getattr(settings, 'IVR_PROMPT_CACHE_SIZE', 4096))
+_lock = threading.Lock()
+
+
+def _key(snapshot, name, menu_id=None):
+    return (snapshot.restaurant_id, snapshot.version, name, menu_id)
+
+
+def get_prompt(snapshot, name, render, menu_id=None):
+    """Cached prompt text for this snapshot version, rendered on first use"""
+    key = _key(snapshot, name, menu_id)
+    with _lock:
+        text = _prompts.get(key)
+    if text is None:
+        text = render()
+        with _lock:
+            _prompts[key] = text
+    return text
+
+
+def prefetch(snapshot, name, render, menus):
+    """Render the prompt for every menu the caller can pick next; returns how many were missing"""
+    missing = []
+    with _lock:
+        for menu in menus:
+            if _key(snapshot, name, menu.id) not in _prompts:
+                missing.append(menu)
+
+    rendered = [(menu.id, render(menu)) for menu in missing]
+    with _lock:
+        for menu_id, text in rendered:
+            _prompts[_key(snapshot, name, menu_id)] = text
+    return len(rendered)
@@ -0,0 +1,25 @@
+# redis_client.py
+import logging
+import threading
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_redis():
+    """Shared redis-py client for settings.REDIS_URL, or None when Redis isn't configured"""
+    global _client
+    url = getattr(settings, 'REDIS_URL', '')
+    if not url:
+        return None
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import redis
+                _client = redis.Redis.from_url(url, socket_timeout=5, health_check_interval=30)
+    return _client
@@ -4,6 +4,7 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/audio_chat/(?P<session_id>[^/]+)/$', consumers.AudioChatConsumer.as_asgi()),
+    re_path(r'ws/twilio_media/$', consumers.TwilioMediaStreamConsumer.as_asgi()),
 
 
 
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Conversation, Message
+from .models import Conversation, Message, CallCampaign, CampaignRecipient, WebhookEndpoint, WebhookDelivery, WebhookDeadLetter
 
 class MessageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -11,4 +11,92 @@ class ConversationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Conversation
-        fields = ['id', 'session_id', 'created_at', 'updated_at', 'messages']
\ No newline at end of file
+        fields = ['id', 'session_id', 'created_at', 'updated_at', 'messages']
+
+
+class CampaignRecipientSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CampaignRecipient
+        fields = ['id', 'phone_number', 'status', 'call_sid', 'attempts', 'last_error', 'dialed_at', 'updated_at']
+
+
+class CallCampaignSerializer(serializers.ModelSerializer):
+    numbers = serializers.ListField(child=serializers.CharField(max_length=32), write_only=True, required=False)
+    csv_file = serializers.FileField(write_only=True, required=False)
+    counts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CallCampaign
+        fields = ['id', 'name', 'status', 'max_concurrent_calls', 'calls_per_minute', 'numbers', 'csv_file',
+                  'counts', 'created_at', 'updated_at', 'completed_at']
+        read_only_fields = ['status', 'created_at', 'updated_at', 'completed_at']
+
+    def get_counts(self, obj):
+        return {
+            'total': getattr(obj, 'total_count', None),
+            'pending': getattr(obj, 'pending_count', None),
+            'dialing': getattr(obj, 'dialing_count', None),
+            'completed': getattr(obj, 'completed_count', None),
+            'failed': getattr(obj, 'failed_count', None),
+        }
+
+    def validate(self, attrs):
+        from django.conf import settings
+        from .campaigns import parse_numbers
+
+        if self.instance is None:
+            valid, invalid = parse_numbers(attrs.pop('numbers', None), attrs.pop('csv_file', None))
+            if not valid:
+                raise serializers.ValidationError({'numbers': 'Provide at least one valid phone number (list or CSV).'})
+            limit = getattr(settings, 'CAMPAIGN_MAX_RECIPIENTS', 10000)
+            if len(valid) > limit:
+                raise serializers.ValidationError({'numbers': f'A campaign can have at most {limit} numbers.'})
+            attrs['recipient_numbers'] = valid
+            self.context['invalid_numbers'] = invalid
+        else:
+            attrs.pop('numbers', None)
+            attrs.pop('csv_file', None)
+        return attrs
+
+    def create(self, validated_data):
+        from .campaigns import add_recipients
+
+        numbers = validated_data.pop('recipient_numbers')
+        campaign = super().create(validated_data)
+        add_recipients(campaign, numbers)
+        return campaign
+
+
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    events = serializers.ListField(
+        child=serializers.ChoiceField(choices=WebhookEndpoint.EVENT_CHOICES), required=False,
+        help_text="Event types to send; empty sends all",
+    )
+
+    class Meta:
+        model = WebhookEndpoint
+        fields = ['id', 'url', 'secret', 'events', 'is_active', 'created_at', 'updated_at']
+        read_only_fields = ['secret', 'created_at', 'updated_at']
+
+    def validate_url(self, value):
+        from .order_webhooks import UnsafeWebhookURL, check_url
+
+        try:
+            check_url(value)
+        except UnsafeWebhookURL as e:
+            raise serializers.ValidationError(str(e))
+        return value
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookDelivery
+        fields = ['id', 'event', 'order', 'status', 'attempts', 'response_status', 'last_error',
+                  'next_attempt_at', 'sent_at', 'created_at']
+
+
+class WebhookDeadLetterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WebhookDeadLetter
+        fields = ['id', 'event', 'order', 'payload', 'attempts', 'response_status', 'last_error',
+                  'replayed_at', 'created_at']
@@ -0,0 +1,226 @@
+# session_registry.py
+import json
+import logging
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from cachetools import TTLCache
+from django.conf import settings
+
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+def _ttl():
+    return getattr(settings, 'IVR_LIVE_SESSION_TTL', 15 * 60)
+
+
+def _max_size():
+    return getattr(settings, 'IVR_LIVE_SESSION_MAX', 10000)
+
+
+class LocalSessionRegistry:
+    """Per-process registry for development (no REDIS_URL); bounded and TTL-evicted"""
+
+    def __init__(self):
+        self.sessions = TTLCache(maxsize=_max_size(), ttl=_ttl())
+        self.lock = threading.Lock()
+
+    def touch(self, call_sid, restaurant_id=None, step=None):
+        with self.lock:
+            meta = self.sessions.get(call_sid) or {'restaurant_id': restaurant_id, 'started_at': time.time()}
+            meta = {**meta, 'step': step or meta.get('step'), 'last_seen': time.time()}
+            if restaurant_id is not None:
+                meta['restaurant_id'] = restaurant_id
+            self.sessions[call_sid] = meta
+
+    def remove(self, call_sid):
+        with self.lock:
+            self.sessions.pop(call_sid, None)
+
+    def counts(self):
+        with self.lock:
+            sessions = list(self.sessions.values())
+        return {
+            'active_calls': len(sessions),
+            'by_restaurant': dict(Counter(str(meta.get('restaurant_id')) for meta in sessions)),
+            'by_step': dict(Counter(meta.get('step') for meta in sessions)),
+        }
+
+    def recent(self, limit=20):
+        with self.lock:
+            items = sorted(self.sessions.items(), key=lambda item: item[1]['last_seen'], reverse=True)[:limit]
+        return [{'call_sid': call_sid, **meta} for call_sid, meta in items]
+
+
+# Compare-and-set of one call's meta: the write (and its counter adjustments) only lands if the meta is
+# still what the caller read, so two workers touching the same call can't both move its counters.
+# KEYS: calls zset, meta hash, by_restaurant, by_step
+# ARGV: call_sid, expected meta ('' = absent), new meta ('' = remove), score, then (counter, field, delta)...
+UPDATE_SCRIPT = """
+local current = redis.call('HGET', KEYS[2], ARGV[1])
+if (current or '') ~= ARGV[2] then
+    return 0
+end
+if ARGV[3] == '' then
+    redis.call('ZREM', KEYS[1], ARGV[1])
+    redis.call('HDEL', KEYS[2], ARGV[1])
+else
+    redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+    redis.call('HSET', KEYS[2], ARGV[1], ARGV[3])
+end
+for i = 5, #ARGV, 3 do
+    local key = ARGV[i] == 'restaurant' and KEYS[3] or KEYS[4]
+    redis.call('HINCRBY', key, ARGV[i + 1], ARGV[i + 2])
+end
+return 1
+"""
+
+
+class RedisSessionRegistry:
+    """Live calls shared by every worker.
+
+    A sorted set orders calls by last activity (for TTL and size eviction), a hash keeps each call's
+    restaurant/step, and two counter hashes are adjusted on every change so aggregates are O(1) reads.
+    Each change is a compare-and-set in a Lua script, retried if another worker got there first.
+    """
+    prefix = 'ivr:live:'
+    prune_interval = 5
+    max_retries = 5
+
+    def __init__(self, client):
+        self.client = client
+        self.calls_key = f'{self.prefix}calls'
+        self.meta_key = f'{self.prefix}meta'
+        self.restaurant_key = f'{self.prefix}by_restaurant'
+        self.step_key = f'{self.prefix}by_step'
+        self.last_prune = 0
+        self.update_script = client.register_script(UPDATE_SCRIPT)
+
+    def _update(self, call_sid, change):
+        """Apply `change(old_meta) -> (new_meta or None, counter deltas)` atomically; False if it kept losing races"""
+        keys = [self.calls_key, self.meta_key, self.restaurant_key, self.step_key]
+        for _ in range(self.max_retries):
+            raw = self.client.hget(self.meta_key, call_sid)
+            if isinstance(raw, bytes):
+                raw = raw.decode()
+            meta, deltas = change(json.loads(raw) if raw else None)
+            args = [call_sid, raw or '', json.dumps(meta) if meta else '', meta['last_seen'] if meta else 0]
+            for counter, field, delta in deltas:
+                args += [counter, field, delta]
+            if self.update_script(keys=keys, args=args):
+                return True
+        logger.warning(f"Live session registry update for {call_sid} gave up after {self.max_retries} attempts")
+        return False
+
+    def touch(self, call_sid, restaurant_id=None, step=None):
+        now = time.time()
+
+        def change(old):
+            meta = dict(old or {'restaurant_id': restaurant_id, 'started_at': now})
+            if restaurant_id is not None:
+                meta['restaurant_id'] = restaurant_id
+            meta['step'] = step or meta.get('step')
+            meta['last_seen'] = now
+
+            if old is None:
+                return meta, [('restaurant', str(meta['restaurant_id']), 1), ('step', str(meta['step']), 1)]
+            deltas = []
+            if str(old.get('restaurant_id')) != str(meta['restaurant_id']):
+                deltas += [('restaurant', str(old.get('restaurant_id')), -1), ('restaurant', str(meta['restaurant_id']), 1)]
+            if old.get('step') != meta['step']:
+                deltas += [('step', str(old.get('step')), -1), ('step', str(meta['step']), 1)]
+            return meta, deltas
+
+        self._update(call_sid, change)
+
+        if now - self.last_prune > self.prune_interval:
+            self.last_prune = now
+            self.prune()
+
+    def remove(self, call_sid):
+        def change(old):
+            # Only the removal that finds the meta adjusts the counters, so concurrent removals can't double count
+            if old is None:
+                return None, []
+            return None, [('restaurant', str(old.get('restaurant_id')), -1), ('step', str(old.get('step')), -1)]
+
+        self._update(call_sid, change)
+
+    def prune(self):
+        """Evict calls idle longer than the TTL, then the oldest ones beyond the size bound"""
+        expired = self.client.zrangebyscore(self.calls_key, '-inf', time.time() - _ttl())
+        excess = self.client.zcard(self.calls_key) - len(expired) - _max_size()
+        if excess > 0:
+            expired += self.client.zrange(self.calls_key, len(expired), len(expired) + excess - 1)
+        for call_sid in expired:
+            self.remove(call_sid.decode() if isinstance(call_sid, bytes) else call_sid)
+
+        # Drop counters that fell back to zero so the hashes stay small
+        for key in (self.restaurant_key, self.step_key):
+            stale = [field for field, value in self.client.hgetall(key).items() if int(value) <= 0]
+            if stale:
+                self.client.hdel(key, *stale)
+        return len(expired)
+
+    def counts(self):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zcard(self.calls_key)
+        pipe.hgetall(self.restaurant_key)
+        pipe.hgetall(self.step_key)
+        active, by_restaurant, by_step = pipe.execute()
+
+        def decode(mapping):
+            return {
+                (key.decode() if isinstance(key, bytes) else key): int(value)
+                for key, value in mapping.items() if int(value) > 0
+            }
+
+        return {'active_calls': active, 'by_restaurant': decode(by_restaurant), 'by_step': decode(by_step)}
+
+    def recent(self, limit=20):
+        call_sids = self.client.zrevrange(self.calls_key, 0, limit - 1)
+        if not call_sids:
+            return []
+        metas = self.client.hmget(self.meta_key, call_sids)
+        return [
+            {'call_sid': call_sid.decode() if isinstance(call_sid, bytes) else call_sid, **json.loads(raw)}
+            for call_sid, raw in zip(call_sids, metas) if raw
+        ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_session_registry():
+    """Redis-backed registry when REDIS_URL is set, otherwise a per-process one"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                client = get_redis()
+                _registry = RedisSessionRegistry(client) if client is not None else LocalSessionRegistry()
+    return _registry
+
+
+def track(call_sid, restaurant_id=None, step=None, finished=False):
+    """Record a webhook turn; registry failures never break the call"""
+    if not call_sid:
+        return
+    try:
+        registry = get_session_registry()
+        if finished:
+            registry.remove(call_sid)
+        else:
+            registry.touch(call_sid, restaurant_id, step)
+    except Exception as e:
+        logger.error(f"Live session registry error for {call_sid}: {e}")
+
+
+async def atrack(call_sid, restaurant_id=None, step=None, finished=False):
+    # Registry I/O doesn't touch the ORM, so it needn't queue behind the shared sync thread
+    await sync_to_async(track, thread_sensitive=False)(call_sid, restaurant_id, step, finished)
@@ -0,0 +1,167 @@
+# session_store.py
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field, asdict, fields
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CallState:
+    """Live IVR state for one Twilio call (one CallSid)"""
+    call_sid: str
+    restaurant_id: Optional[int] = None
+    current_step: str = 'welcome'
+    selected_menu_id: Optional[int] = None
+    selected_items: list = field(default_factory=list)
+    customer_info: dict = field(default_factory=dict)
+    turn: int = 0
+    page: int = 0  # Page of the menu/item list being read out
+    started_at: float = field(default_factory=time.time)
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+
+class BaseSessionStore(ABC):
+    """Where live call state lives between Twilio webhooks"""
+
+    @abstractmethod
+    def load(self, call_sid):
+        """CallState for the call, or None"""
+
+    @abstractmethod
+    def save(self, state):
+        """Keep the state for the call's next turn"""
+
+    @abstractmethod
+    def delete(self, call_sid):
+        """Forget the call"""
+
+    def persist(self, state):
+        """Write the call to its UserSession row (call end / order submission)"""
+        from subadmin.models import UserSession
+
+        try:
+            UserSession.objects.update_or_create(
+                session_id=state.call_sid,
+                defaults={
+                    'current_step': state.current_step,
+                    'restaurant_id': state.restaurant_id,
+                    'selected_menu_id': state.selected_menu_id,
+                    'selected_items': state.selected_items,
+                    'customer_info': state.customer_info,
+                    'turn': state.turn,
+                    'page': state.page,
+                }
+            )
+        except Exception as e:
+            logger.error(f"Error persisting session {state.call_sid}: {e}")
+
+    def persist_ended(self, call_sid):
+        """The call is over, possibly mid-flow: write whatever state the store still holds"""
+        state = self.load(call_sid)
+        if state is not None:
+            self.persist(state)
+
+    # Async API used by the ASGI webhook view; stores without a native version run the sync one in a thread
+    async def aload(self, call_sid):
+        return await sync_to_async(self.load)(call_sid)
+
+    async def asave(self, state):
+        await sync_to_async(self.save)(state)
+
+    async def adelete(self, call_sid):
+        await sync_to_async(self.delete)(call_sid)
+
+    async def apersist(self, state):
+        await sync_to_async(self.persist)(state)
+
+
+class CacheSessionStore(BaseSessionStore):
+    """Keeps call state in the Django cache (Redis in production)"""
+    key_prefix = 'ivr:call:'
+
+    def __init__(self, alias=None, timeout=None):
+        self.cache = caches[alias or getattr(settings, 'IVR_SESSION_CACHE', 'default')]
+        self.timeout = timeout or getattr(settings, 'IVR_SESSION_TTL', 60 * 60)
+
+    def _key(self, call_sid):
+        return f"{self.key_prefix}{call_sid}"
+
+    def load(self, call_sid):
+        data = self.cache.get(self._key(call_sid))
+        return CallState.from_dict(data) if data else None
+
+    def save(self, state):
+        self.cache.set(self._key(state.call_sid), state.to_dict(), timeout=self.timeout)
+
+    def delete(self, call_sid):
+        self.cache.delete(self._key(call_sid))
+
+    async def aload(self, call_sid):
+        data = await self.cache.aget(self._key(call_sid))
+        return CallState.from_dict(data) if data else None
+
+    async def asave(self, state):
+        await self.cache.aset(self._key(state.call_sid), state.to_dict(), timeout=self.timeout)
+
+    async def adelete(self, call_sid):
+        await self.cache.adelete(self._key(call_sid))
+
+
+class DatabaseSessionStore(BaseSessionStore):
+    """Legacy behaviour: every turn reads and writes the UserSession row"""
+
+    def load(self, call_sid):
+        from subadmin.models import UserSession
+
+        session = UserSession.objects.filter(session_id=call_sid).first()
+        if session is None:
+            return None
+        return CallState(
+            call_sid=session.session_id,
+            restaurant_id=session.restaurant_id,
+            current_step=session.current_step,
+            selected_menu_id=session.selected_menu_id,
+            selected_items=session.selected_items or [],
+            customer_info=session.customer_info or {},
+            turn=session.turn,
+            page=session.page,
+            started_at=session.created_at.timestamp(),
+        )
+
+    def save(self, state):
+        self.persist(state)
+
+    def persist_ended(self, call_sid):
+        pass  # every turn is already in the row
+
+    def delete(self, call_sid):
+        from subadmin.models import UserSession
+
+        UserSession.objects.filter(session_id=call_sid).delete()
+
+
+_store = None
+
+
+def get_session_store():
+    """Return the process-wide store configured by settings.IVR_SESSION_STORE"""
+    global _store
+    if _store is None:
+        path = getattr(settings, 'IVR_SESSION_STORE', 'twilio_bot.session_store.CacheSessionStore')
+        _store = import_string(path)()
+    return _store
@@ -0,0 +1,82 @@
+# speculation.py
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from subadmin.snapshot import get_version, aget_version
+from .session_store import CallState
+
+SPECULATION_KEY = "ivr:turn:{call_sid}:{turn}:speculative"
+
+# Steps whose handlers only change call state; order confirmation writes the order, so it's never run early
+SPECULATIVE_STEPS = ('menu_selection', 'item_selection')
+
+
+def _ttl():
+    return getattr(settings, 'IVR_SPECULATION_TTL', 60)
+
+
+def normalize_speech(text):
+    """Lowercase and drop punctuation so interim and final transcripts of the same words compare equal"""
+    return re.sub(r'\s+', ' ', re.sub(r'[^\w\s]', ' ', text or '')).strip().lower()
+
+
+def partial_transcript(data):
+    """Latest hypothesis from a Twilio partialResultCallback request"""
+    return normalize_speech(data.get('UnstableSpeechResult') or data.get('StableSpeechResult'))
+
+
+def _key(call_sid, turn):
+    return SPECULATION_KEY.format(call_sid=call_sid, turn=turn)
+
+
+def _entry(user_input, snapshot_version, state, twiml):
+    return {'input': user_input, 'version': snapshot_version, 'state': state.to_dict(), 'twiml': twiml}
+
+
+def _matches(entry, user_input):
+    return entry is not None and entry['input'] == user_input
+
+
+def peek(call_sid, turn):
+    """Transcript already speculated for this turn, if any"""
+    entry = cache.get(_key(call_sid, turn))
+    return entry['input'] if entry else None
+
+
+def store(call_sid, turn, user_input, snapshot_version, state, twiml):
+    """Keep the state and TwiML the turn would produce for `user_input` (latest partial wins)"""
+    cache.set(_key(call_sid, turn), _entry(user_input, snapshot_version, state, twiml), timeout=_ttl())
+
+
+def take(call_sid, turn, user_input):
+    """(state, twiml) precomputed for exactly this input against the current menu, else None"""
+    entry = cache.get(_key(call_sid, turn))
+    if not _matches(entry, user_input):
+        return None
+    cache.delete(_key(call_sid, turn))
+    state = CallState.from_dict(entry['state'])
+    if entry['version'] != get_version(state.restaurant_id):
+        return None
+    return state, entry['twiml']
+
+
+async def apeek(call_sid, turn):
+    entry = await cache.aget(_key(call_sid, turn))
+    return entry['input'] if entry else None
+
+
+async def astore(call_sid, turn, user_input, snapshot_version, state, twiml):
+    await cache.aset(_key(call_sid, turn), _entry(user_input, snapshot_version, state, twiml), timeout=_ttl())
+
+
+async def atake(call_sid, turn, user_input):
+    entry = await cache.aget(_key(call_sid, turn))
+    if not _matches(entry, user_input):
+        return None
+    await cache.adelete(_key(call_sid, turn))
+    state = CallState.from_dict(entry['state'])
+    if entry['version'] != await aget_version(state.restaurant_id):
+        return None
+    return state, entry['twiml']
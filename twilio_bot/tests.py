@@ -1,3 +1,1013 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import hmac
+import io
+import socket
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from functools import wraps
+from types import SimpleNamespace
+from unittest import mock, skipIf
 
-# Create your tests here.
+import requests
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from twilio.request_validator import RequestValidator
+
+from authentication.models import CustomUser
+from subadmin.models import Menu, MenuItem, Order, OrderItem, SMSFallbackSettings, UserSession
+from subadmin.snapshot import MenuItemSnapshot, MenuSnapshot
+from subadmin.tests import LOCMEM_CACHES
+from superadmin import entitlements
+from superadmin.models import CallRecord, PlanPayment, RestaurantEntitlement, SubscriptionPlan
+from . import (admission, call_events, campaigns, consumers, idempotency, notifications, order_webhooks, prompt_audio,
+               session_registry)
+from .menu_resolver import MenuResolver, phonetic
+from .models import CallCampaign, CampaignRecipient, NotificationJob, WebhookDeadLetter, WebhookDelivery, WebhookEndpoint
+from .session_store import BaseSessionStore, CacheSessionStore, CallState, DatabaseSessionStore, get_session_store
+
+try:
+    import fakeredis
+except ImportError:  # Redis-backed tests need fakeredis with Lua support (fakeredis[lua])
+    fakeredis = None
+
+
+def make_restaurant(email='owner@example.com', phone_number='+15551234567'):
+    user = CustomUser.objects.create_user(email, 'pw', role='subdir')
+    profile = user.subadmin_profile
+    profile.restaurant_name = 'Pizza Place'
+    profile.phone_number = phone_number
+    profile.email_address = email
+    profile.save()
+    return user, profile
+
+
+def make_order(user, profile, items=(('Margherita', 2),)):
+    menu = Menu.objects.create(subadmin_profile=user, name='Pizza')
+    order = Order.objects.create(
+        customer_name='Asha', customer_email='asha@example.com', customer_phone='+919876543210',
+        restaurant=profile, menu=menu,
+    )
+    for display_order, (name, quantity) in enumerate(items, start=1):
+        menu_item = MenuItem.objects.create(menu=menu, name=name, price=10, display_order=display_order)
+        OrderItem.objects.create(order=order, menu_item=menu_item, quantity=quantity)
+    return order
+
+
+def make_entitled(test, user):
+    plan = SubscriptionPlan.objects.create(plan_name='Pro', description='', price=10, duration='monthly')
+    with test.captureOnCommitCallbacks(execute=True):
+        PlanPayment.objects.create(subadmin=user, plan=plan, payment_status='PAID')
+
+
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.profile = make_restaurant()
+
+    def state(self, **fields):
+        return CallState(call_sid='CA1', restaurant_id=self.profile.pk, **fields)
+
+    def test_base_store_requires_the_storage_methods(self):
+        with self.assertRaises(TypeError):
+            BaseSessionStore()
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_cache_store_round_trip_without_touching_the_database(self):
+        store = CacheSessionStore()
+
+        with self.assertNumQueries(0):
+            store.save(self.state(current_step='menu_selection', selected_items=[{'id': 1, 'quantity': 2}]))
+            state = store.load('CA1')
+        self.assertEqual((state.current_step, state.selected_items), ('menu_selection', [{'id': 1, 'quantity': 2}]))
+
+        store.delete('CA1')
+        self.assertIsNone(store.load('CA1'))
+
+    def test_cache_store_persists_calls_that_end_mid_flow(self):
+        store = CacheSessionStore()
+        store.save(self.state(current_step='get_name', turn=4))
+
+        store.persist_ended('CA1')
+
+        session = UserSession.objects.get(session_id='CA1')
+        self.assertEqual((session.current_step, session.turn, session.restaurant_id), ('get_name', 4, self.profile.pk))
+        store.persist_ended('CA-unknown')
+        self.assertEqual(UserSession.objects.count(), 1)
+
+    def test_database_store_writes_every_turn(self):
+        store = DatabaseSessionStore()
+
+        store.save(self.state(current_step='item_selection', page=1))
+
+        self.assertEqual(UserSession.objects.get(session_id='CA1').page, 1)
+        state = store.load('CA1')
+        self.assertEqual((state.current_step, state.page), ('item_selection', 1))
+        store.delete('CA1')
+        self.assertIsNone(store.load('CA1'))
+
+
+class NotificationQueueTests(TestCase):
+    def setUp(self):
+        user, profile = make_restaurant()
+        self.order = make_order(user, profile)
+
+    def test_order_queues_restaurant_email_and_both_sms(self):
+        jobs = notifications.enqueue_order_notifications(self.order)
+
+        self.assertEqual(
+            sorted((job.channel, job.recipient) for job in jobs),
+            [('email', 'owner@example.com'), ('sms', '+15551234567'), ('sms', '+919876543210')],
+        )
+        self.assertTrue(all('Margherita x2' in job.body for job in jobs))
+
+    def test_claimed_jobs_are_not_claimed_twice(self):
+        job = notifications.enqueue_sms('+919876543210', 'Hi', order=self.order)
+        NotificationJob.objects.create(channel='sms', recipient='+919876543210', body='Later',
+                                       next_attempt_at=timezone.now() + timedelta(minutes=5))
+
+        self.assertEqual([claimed.pk for claimed in notifications.claim_jobs()], [job.pk])
+        self.assertEqual(notifications.claim_jobs(), [])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('running', 1))
+
+    @override_settings(NOTIFICATION_LOCK_TIMEOUT_SECONDS=60)
+    def test_jobs_of_a_dead_worker_are_reclaimed(self):
+        job = notifications.enqueue_sms('+919876543210', 'Hi')
+        notifications.claim_jobs()
+        NotificationJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(minutes=2))
+
+        self.assertEqual([claimed.pk for claimed in notifications.claim_jobs()], [job.pk])
+
+    def test_claim_can_be_limited_to_orders(self):
+        notifications.enqueue_sms('+919876543210', 'Hi')
+
+        self.assertEqual(notifications.claim_jobs(order_ids=[self.order.pk]), [])
+
+    def test_delivered_email_is_marked_sent(self):
+        notifications.enqueue_order_notifications(self.order)
+        NotificationJob.objects.filter(channel='sms').delete()
+
+        self.assertEqual(notifications.run_pending(), 1)
+
+        self.assertEqual(NotificationJob.objects.get().status, 'sent')
+        self.assertEqual(mail.outbox[0].to, ['owner@example.com'])
+
+    @override_settings(NOTIFICATION_RETRY_BASE_SECONDS=30)
+    @mock.patch.object(notifications, 'send_mail', side_effect=OSError('SMTP down'))
+    def test_failed_delivery_backs_off_then_gives_up(self, send_mail):
+        job = NotificationJob.objects.create(channel='email', recipient='owner@example.com', body='Hi', max_attempts=2)
+
+        notifications.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error), ('pending', 'SMTP down'))
+        self.assertGreater(job.next_attempt_at, timezone.now() + timedelta(seconds=20))
+
+        NotificationJob.objects.filter(pk=job.pk).update(next_attempt_at=timezone.now())
+        notifications.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+
+def off_event_loop(method):
+    """Fail a sync cache call made from a coroutine: it would block every call on the worker"""
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return method(*args, **kwargs)
+        raise AssertionError(f"Sync cache.{method.__name__}() called on the event loop")
+    return wrapper
+
+
+class IVRFlowTests(TestCase):
+    """Gather turns POSTed through voice-assistant/, as Twilio sends them"""
+    url = '/api/twilio_bot/voice-assistant/'
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            user, self.profile = make_restaurant()
+            self.menu = Menu.objects.create(subadmin_profile=user, name='Pizza')
+            self.item = MenuItem.objects.create(menu=self.menu, name='Margherita', price=10, display_order=1)
+            MenuItem.objects.create(menu=self.menu, name='Pepperoni', price=12, display_order=2)
+            Menu.objects.create(subadmin_profile=user, name='Drinks')
+            WebhookEndpoint.objects.create(restaurant=self.profile, url='https://8.8.8.8/hook')
+        make_entitled(self, user)
+
+        backend = type(caches['default'])
+        for name in ('get', 'set', 'add', 'delete', 'get_many', 'incr'):
+            patcher = mock.patch.object(backend, name, off_event_loop(getattr(backend, name)))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def turn(self, step, turn, **data):
+        params = {'CallSid': 'CA1', 'From': '+919876543210', 'To': '+15551234567', **data}
+        response = self.client.post(f"{self.url}?step={step}&turn={turn}", params)
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_call_start_greets_and_gathers(self):
+        response = self.client.get(self.url, {
+            'CallSid': 'CA1', 'From': '+919876543210', 'To': '+15551234567', 'CallStatus': 'in-progress',
+        })
+
+        twiml = response.content.decode()
+        self.assertIn('<Gather', twiml)
+        self.assertIn('Welcome to Pizza Place', twiml)
+        self.assertIn('2 menu categories', twiml)
+
+    def test_unpaid_restaurant_is_told_the_service_is_unavailable(self):
+        RestaurantEntitlement.objects.update(active_until=timezone.now() - timedelta(days=1))
+        entitlements.invalidate()
+
+        response = self.client.get(self.url, {
+            'CallSid': 'CA1', 'From': '+919876543210', 'To': '+15551234567', 'CallStatus': 'in-progress',
+        })
+
+        self.assertIn('subscription plan has expired', response.content.decode())
+        self.assertIn('<Hangup', response.content.decode())
+
+    def test_keypad_order_is_placed_and_persisted(self):
+        twiml = self.turn('welcome', 0, Digits='1')
+        self.assertIn('Press 1 for Drinks', twiml)
+        self.assertIn('step=menu_selection&amp;turn=1', twiml)
+
+        twiml = self.turn('menu_selection', 1, Digits='2')
+        self.assertIn('Press 1 for Margherita at 10', twiml)
+
+        twiml = self.turn('item_selection', 2, Digits='1')
+        self.assertIn("You've selected Margherita", twiml)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            twiml = self.turn('order_confirmation', 3, Digits='1')
+        self.assertIn('ORDER SUCCESSFUL', twiml)
+        self.assertIn('<Hangup', twiml)
+
+        order = Order.objects.get()
+        self.assertEqual((order.restaurant_id, order.menu_id, order.customer_phone), (self.profile.pk, self.menu.pk, '9876543210'))
+        self.assertEqual(list(order.items.values_list('menu_item_id', 'quantity')), [(self.item.pk, 1)])
+        self.assertEqual(NotificationJob.objects.filter(order=order).count(), 3)
+        self.assertEqual(WebhookDelivery.objects.get().event, 'order.created')
+        session = UserSession.objects.get(session_id='CA1')
+        self.assertEqual((session.current_step, session.turn), ('complete', 4))
+        self.assertEqual(session.selected_items[0]['name'], 'Margherita')
+
+    def test_spoken_item_name_skips_the_category_step(self):
+        self.turn('welcome', 0, Digits='1')
+
+        twiml = self.turn('menu_selection', 1, SpeechResult='Margarita please')
+
+        self.assertIn("You've selected Margherita", twiml)
+
+    def test_cancelled_order_starts_over(self):
+        self.turn('welcome', 0, Digits='1')
+        self.turn('menu_selection', 1, Digits='2')
+        self.turn('item_selection', 2, Digits='1')
+
+        twiml = self.turn('order_confirmation', 3, Digits='2')
+
+        self.assertIn('Order cancelled', twiml)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(UserSession.objects.get(session_id='CA1').selected_items, [])
+
+    def test_retried_webhook_gets_the_original_answer_once(self):
+        self.turn('welcome', 0, Digits='1')
+        self.turn('menu_selection', 1, Digits='2')
+        self.turn('item_selection', 2, Digits='1')
+
+        first = self.turn('order_confirmation', 3, Digits='1')
+        retry = self.turn('order_confirmation', 3, Digits='1')
+
+        self.assertEqual(retry, first)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(UserSession.objects.get(session_id='CA1').turn, 4)
+
+    def test_invalid_choice_repeats_the_step(self):
+        self.turn('welcome', 0, Digits='1')
+
+        twiml = self.turn('menu_selection', 1, Digits='7')
+
+        self.assertIn('Please choose a valid option between 1 and 2', twiml)
+        self.assertIn('step=menu_selection&amp;turn=2', twiml)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fingerprint = idempotency.turn_fingerprint('CA1', 'menu_selection', '2', ' Pizza ')
+
+    def test_fingerprint_ignores_case_and_whitespace(self):
+        self.assertEqual(self.fingerprint, idempotency.turn_fingerprint('CA1', 'menu_selection', '2', 'pizza'))
+        self.assertNotEqual(self.fingerprint, idempotency.turn_fingerprint('CA1', 'menu_selection', '3', 'pizza'))
+
+    def test_retry_gets_the_finished_response(self):
+        self.assertEqual(idempotency.begin(self.fingerprint), (None, True))
+        idempotency.finish(self.fingerprint, '<Response/>')
+
+        self.assertEqual(idempotency.begin(self.fingerprint), ('<Response/>', False))
+
+    @override_settings(IVR_TURN_DEDUP_WAIT=0.1)
+    def test_duplicate_of_an_unfinished_turn_does_not_take_ownership(self):
+        self.assertEqual(idempotency.begin(self.fingerprint), (None, True))
+
+        self.assertEqual(idempotency.begin(self.fingerprint), (None, False))
+
+    def test_released_turn_can_be_processed_again(self):
+        idempotency.begin(self.fingerprint)
+        idempotency.release(self.fingerprint)
+
+        self.assertEqual(idempotency.begin(self.fingerprint), (None, True))
+
+
+def call_event(status, sequence, call_sid='CA1', duration=None):
+    return {
+        'call_sid': call_sid, 'status': status, 'duration': duration, 'from': '+919876543210',
+        'to': '+15551234567', 'direction': 'inbound', 'sequence': sequence, 'received_at': float(sequence),
+    }
+
+
+class CallEventTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        _, self.profile = make_restaurant()
+
+    def test_events_upsert_one_record_per_call(self):
+        self.assertEqual(call_events.apply_events([call_event('ringing', 0), call_event('in-progress', 1)]), 1)
+
+        record = CallRecord.objects.get(call_sid='CA1')
+        self.assertEqual((record.restaurant_id, record.status), (self.profile.pk, 'in-progress'))
+        self.assertEqual(record.caller_number, '+919876543210')
+
+    def test_status_never_moves_back(self):
+        # Delivered out of order within one batch
+        call_events.apply_events([call_event('completed', 3, duration=42), call_event('ringing', 1)])
+        self.assertEqual(CallRecord.objects.get(call_sid='CA1').status, 'completed')
+
+        # A late event in a later batch
+        call_events.apply_events([call_event('in-progress', 2)])
+        record = CallRecord.objects.get(call_sid='CA1')
+        self.assertEqual((record.status, record.duration), ('completed', 42))
+
+    def test_unrouted_and_unknown_events_are_skipped(self):
+        unrouted = dict(call_event('ringing', 0, call_sid='CA2'), to='+15559999999')
+
+        self.assertEqual(call_events.apply_events([unrouted, call_event('bogus', 0, call_sid='CA3')]), 0)
+        self.assertFalse(CallRecord.objects.exists())
+
+
+@skipIf(fakeredis is None, 'fakeredis is not installed')
+class CallEventQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_restaurant()
+        redis = fakeredis.FakeRedis()
+        patcher = mock.patch.object(call_events, 'get_redis', return_value=redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_applies_and_acknowledges_a_batch(self):
+        call_events.enqueue_event(call_event('ringing', 0))
+        call_events.enqueue_event(call_event('completed', 1, duration=30))
+
+        self.assertEqual(call_events.flush(), 2)
+
+        self.assertEqual(CallRecord.objects.get(call_sid='CA1').status, 'completed')
+        self.assertEqual(call_events.recover_events(), 0)
+
+    def test_batch_of_a_dead_flusher_is_recovered(self):
+        call_events.enqueue_event(call_event('completed', 1))
+        call_events.enqueue_event(call_event('ringing', 0, call_sid='CA2'))
+        call_events.pop_events(1)  # Claimed, then the flusher died
+
+        self.assertEqual(call_events.recover_events(), 1)
+
+        self.assertEqual(call_events.flush(), 2)
+        self.assertEqual(CallRecord.objects.get(call_sid='CA1').status, 'completed')
+
+    def test_failed_batch_is_requeued(self):
+        call_events.enqueue_event(call_event('completed', 1))
+
+        with mock.patch.object(call_events, 'apply_events', side_effect=RuntimeError('database down')):
+            with self.assertRaises(RuntimeError):
+                call_events.flush()
+
+        self.assertEqual(call_events.recover_events(), 0)
+        self.assertEqual(call_events.flush(), 1)
+        self.assertTrue(CallRecord.objects.filter(call_sid='CA1').exists())
+
+
+class StatusCallbackTests(TestCase):
+    url = '/api/twilio_bot/call-status/'
+
+    def setUp(self):
+        cache.clear()
+        make_restaurant()
+
+    def post(self, data, signature=None):
+        if signature is None:
+            signature = RequestValidator(settings.TWILIO_AUTH_TOKEN).compute_signature(f"http://testserver{self.url}", data)
+        return self.client.post(self.url, data, HTTP_X_TWILIO_SIGNATURE=signature)
+
+    def status(self, call_status, **extra):
+        return {'CallSid': 'CA1', 'CallStatus': call_status, 'From': '+919876543210', 'To': '+15551234567',
+                'Direction': 'inbound', **extra}
+
+    def test_unsigned_or_forged_callbacks_are_rejected(self):
+        self.assertEqual(self.client.post(self.url, self.status('failed')).status_code, 403)
+        self.assertEqual(self.post(self.status('failed'), signature='forged').status_code, 403)
+        self.assertFalse(CallRecord.objects.exists())
+
+    def test_signed_callback_is_recorded(self):
+        self.assertEqual(self.post(self.status('completed', CallDuration='42')).status_code, 204)
+
+        record = CallRecord.objects.get(call_sid='CA1')
+        self.assertEqual((record.status, record.duration), ('completed', 42))
+
+    @override_settings(TWILIO_STATUS_CALLBACK_BASE_URL='https://ivr.example.com')
+    def test_signature_is_checked_against_the_public_url(self):
+        data = self.status('ringing')
+        signature = RequestValidator(settings.TWILIO_AUTH_TOKEN).compute_signature(f"https://ivr.example.com{self.url}", data)
+
+        self.assertEqual(self.post(data, signature).status_code, 204)
+
+    def test_call_that_hangs_up_mid_flow_keeps_its_state(self):
+        store = CacheSessionStore()
+        store.save(CallState(call_sid='CA1', current_step='item_selection', turn=2))
+
+        with mock.patch('twilio_bot.views.get_session_store', return_value=store):
+            self.post(self.status('completed'))
+
+        self.assertEqual(UserSession.objects.get(session_id='CA1').current_step, 'item_selection')
+
+
+class SmsStatusCallbackTests(TestCase):
+    url = '/api/twilio_bot/sms-status/'
+
+    def setUp(self):
+        user, profile = make_restaurant()
+        self.job = NotificationJob.objects.create(order=make_order(user, profile), channel='sms', recipient='+919876543210',
+                                                  body='Order confirmed', status='sent', provider_sid='SM1',
+                                                  delivery_status='sent')
+
+    def post(self, message_status, signed=True):
+        data = {'MessageSid': 'SM1', 'MessageStatus': message_status}
+        signature = RequestValidator(settings.TWILIO_AUTH_TOKEN).compute_signature(f"http://testserver{self.url}", data)
+        return self.client.post(self.url, data, HTTP_X_TWILIO_SIGNATURE=signature if signed else 'forged')
+
+    def test_forged_callback_is_rejected(self):
+        self.assertEqual(self.post('failed', signed=False).status_code, 403)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.delivery_status, 'sent')
+
+    def test_final_status_is_never_moved_back(self):
+        self.assertEqual(self.post('delivered').status_code, 204)
+        self.post('sent')  # Arrives late
+
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.delivery_status, 'delivered')
+
+
+class ParseNumbersTests(SimpleTestCase):
+    def test_numbers_are_normalised_and_deduplicated(self):
+        valid, invalid = campaigns.parse_numbers(['9876543210', '+91 98765 43210', '+1 (555) 123-4567', 'abc', ''])
+
+        self.assertEqual(valid, ['+919876543210', '+15551234567'])
+        self.assertEqual(invalid, ['abc'])
+
+    def test_csv_phone_column_is_found_by_header(self):
+        csv_file = io.BytesIO('\ufeffname,Mobile\nAsha,9876543210\nRavi,12\n'.encode('utf-8'))
+
+        self.assertEqual(campaigns.parse_numbers(csv_file=csv_file), (['+919876543210'], ['12']))
+
+    def test_csv_without_header_uses_the_first_column(self):
+        csv_file = io.StringIO('9876543210,Asha\n9876543211,Ravi\n')
+
+        valid, invalid = campaigns.parse_numbers(['9876543210'], csv_file=csv_file)
+        self.assertEqual(valid, ['+919876543210', '+919876543211'])
+        self.assertEqual(invalid, [])
+
+
+@override_settings(TWILIO_CALLS_PER_SECOND=100, TWILIO_CALLS_BURST=10)
+class CampaignDispatcherTests(TestCase):
+    def setUp(self):
+        _, self.profile = make_restaurant()
+        self.campaign = CallCampaign.objects.create(restaurant=self.profile, name='Reorder', max_concurrent_calls=2)
+        for number in ('+919876543210', '+919876543211', '+919876543212'):
+            CampaignRecipient.objects.create(campaign=self.campaign, phone_number=number)
+        self.dispatcher = campaigns.CampaignDispatcher(workers=4)
+        self.addCleanup(self.dispatcher.pool.shutdown)
+
+    def test_a_recipient_is_claimed_once(self):
+        first = self.dispatcher.claim(self.campaign, 2)
+        second = self.dispatcher.claim(self.campaign, 5)
+
+        self.assertEqual([r.phone_number for r in first], ['+919876543210', '+919876543211'])
+        self.assertEqual([r.phone_number for r in second], ['+919876543212'])
+        self.assertEqual(self.dispatcher.claim(self.campaign, 5), [])
+        self.assertEqual(set(CampaignRecipient.objects.values_list('status', 'attempts')), {('dialing', 1)})
+
+    def test_rows_claimed_by_another_dispatcher_are_left_out(self):
+        candidates = CampaignRecipient.objects.filter(campaign=self.campaign, status='pending')
+        original_filter = CampaignRecipient.objects.filter
+
+        def claimed_in_between(*args, **kwargs):
+            # Another dispatcher wins the first row between our candidate select and our update
+            if 'pk__in' in kwargs and kwargs.get('status') == 'pending':
+                original_filter(pk=candidates.first().pk).update(status='dialing')
+            return original_filter(*args, **kwargs)
+
+        with mock.patch.object(CampaignRecipient.objects, 'filter', side_effect=claimed_in_between):
+            claimed = self.dispatcher.claim(self.campaign, 3)
+
+        self.assertEqual([r.phone_number for r in claimed], ['+919876543211', '+919876543212'])
+
+    def test_run_once_dials_within_the_concurrency_limit(self):
+        def create(to, **kwargs):
+            if to.endswith('11'):
+                raise RuntimeError('invalid number')
+            return SimpleNamespace(sid=f"CA{to[-2:]}")
+
+        with mock.patch.object(campaigns, 'get_twilio_client') as client:
+            client.return_value.calls.create.side_effect = create
+            self.assertEqual(self.dispatcher.run_once(), 1)
+
+        self.assertEqual(client.return_value.calls.create.call_args.kwargs['from_'], '+15551234567')
+        recipients = {r.phone_number: r for r in CampaignRecipient.objects.all()}
+        self.assertEqual((recipients['+919876543210'].status, recipients['+919876543210'].call_sid), ('dialing', 'CA10'))
+        self.assertEqual((recipients['+919876543211'].status, recipients['+919876543211'].last_error),
+                         ('failed', 'invalid number'))
+        self.assertEqual(recipients['+919876543212'].status, 'pending')
+        self.assertTrue(CallRecord.objects.filter(call_sid='CA10', restaurant=self.profile).exists())
+
+
+class CallCampaignViewSetTests(TestCase):
+    url = '/api/twilio_bot/campaigns/'
+
+    def setUp(self):
+        self.user, self.profile = make_restaurant()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_campaign_is_created_from_numbers_and_csv(self):
+        csv_file = io.BytesIO(b'phone\n9876543211\nnope\n')
+        csv_file.name = 'numbers.csv'
+
+        response = self.client.post(self.url, {'name': 'Reorder', 'numbers': ['9876543210'], 'csv_file': csv_file},
+                                    format='multipart')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['counts']['pending'], 2)
+        self.assertEqual(response.data['invalid_numbers'], ['nope'])
+
+    def test_campaign_without_valid_numbers_is_rejected(self):
+        response = self.client.post(self.url, {'name': 'Reorder', 'numbers': ['abc']}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(CallCampaign.objects.exists())
+
+    def test_pause_resume_and_cancel(self):
+        campaign = CallCampaign.objects.create(restaurant=self.profile, name='Reorder')
+
+        self.assertEqual(self.client.post(f"{self.url}{campaign.pk}/pause/").data['status'], 'paused')
+        self.assertEqual(self.client.post(f"{self.url}{campaign.pk}/pause/").status_code, 400)
+        self.assertEqual(self.client.post(f"{self.url}{campaign.pk}/resume/").data['status'], 'running')
+        self.assertEqual(self.client.post(f"{self.url}{campaign.pk}/cancel/").data['status'], 'cancelled')
+
+    def test_other_restaurants_campaigns_are_hidden(self):
+        other, other_profile = make_restaurant('other@example.com', '+15557654321')
+        campaign = CallCampaign.objects.create(restaurant=other_profile, name='Theirs')
+
+        self.assertEqual(self.client.post(f"{self.url}{campaign.pk}/cancel/").status_code, 404)
+
+
+class SessionRegistryTestsMixin:
+    def make_registry(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.registry = self.make_registry()
+
+    def test_calls_are_counted_by_restaurant_and_step(self):
+        self.registry.touch('CA1', 1, 'welcome')
+        self.registry.touch('CA2', 1, 'welcome')
+        self.registry.touch('CA3', 2, 'welcome')
+        self.registry.touch('CA1', step='item_selection')  # Later turns don't repeat the restaurant
+
+        self.assertEqual(self.registry.counts(), {
+            'active_calls': 3,
+            'by_restaurant': {'1': 2, '2': 1},
+            'by_step': {'welcome': 2, 'item_selection': 1},
+        })
+        self.assertEqual(self.registry.recent(1)[0]['call_sid'], 'CA1')
+        self.assertEqual(self.registry.recent(1)[0]['restaurant_id'], 1)
+
+    def test_finished_calls_are_removed_once(self):
+        self.registry.touch('CA1', 1, 'welcome')
+
+        self.registry.remove('CA1')
+        self.registry.remove('CA1')  # The status callback after the final IVR step
+
+        self.assertEqual(self.registry.counts(), {'active_calls': 0, 'by_restaurant': {}, 'by_step': {}})
+
+
+class LocalSessionRegistryTests(SessionRegistryTestsMixin, SimpleTestCase):
+    def make_registry(self):
+        return session_registry.LocalSessionRegistry()
+
+    @override_settings(IVR_LIVE_SESSION_MAX=2)
+    def test_registry_is_bounded(self):
+        self.registry = self.make_registry()
+        for call_sid in ('CA1', 'CA2', 'CA3'):
+            self.registry.touch(call_sid, 1, 'welcome')
+
+        self.assertEqual(self.registry.counts()['active_calls'], 2)
+
+
+@skipIf(fakeredis is None, 'fakeredis is not installed')
+class RedisSessionRegistryTests(SessionRegistryTestsMixin, SimpleTestCase):
+    def make_registry(self):
+        return session_registry.RedisSessionRegistry(fakeredis.FakeRedis())
+
+    @override_settings(IVR_LIVE_SESSION_TTL=60, IVR_LIVE_SESSION_MAX=2)
+    def test_idle_and_excess_calls_are_pruned(self):
+        self.registry.touch('CA1', 1, 'welcome')
+        self.registry.touch('CA2', 1, 'welcome')
+        self.registry.touch('CA3', 2, 'welcome')
+        self.assertEqual(self.registry.prune(), 1)  # Over the size bound: the oldest goes
+        self.assertNotIn('CA1', [call['call_sid'] for call in self.registry.recent()])
+
+        with mock.patch.object(session_registry.time, 'time', return_value=time.time() + 120):
+            self.assertEqual(self.registry.prune(), 2)
+        self.assertEqual(self.registry.counts(), {'active_calls': 0, 'by_restaurant': {}, 'by_step': {}})
+
+    def test_a_lost_race_is_retried_against_the_new_meta(self):
+        self.registry.touch('CA1', 1, 'welcome')
+        original_hget = self.registry.client.hget
+        raced = []
+
+        def hget(*args):
+            raw = original_hget(*args)
+            if not raced:
+                raced.append(True)
+                # Another worker moves the call on between our read and our write
+                other = session_registry.RedisSessionRegistry(self.registry.client)
+                other.touch('CA1', step='item_selection')
+            return raw
+
+        with mock.patch.object(self.registry.client, 'hget', side_effect=hget):
+            self.registry.touch('CA1', step='confirmation')
+
+        self.assertEqual(self.registry.counts()['by_step'], {'confirmation': 1})
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class MediaStreamConsumerTests(TestCase):
+    """A <Connect><Stream> call driven over the websocket, as Twilio sends it"""
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            user, self.profile = make_restaurant()
+            menu = Menu.objects.create(subadmin_profile=user, name='Pizza')
+            MenuItem.objects.create(menu=menu, name='Margherita', price=10, display_order=1)
+            Menu.objects.create(subadmin_profile=user, name='Drinks')
+        make_entitled(self, user)
+
+        self.spoken = []
+
+        async def text_to_speech(consumer, text):
+            self.spoken.append(text)
+            return b'mp3'
+
+        for patcher in (
+            mock.patch.object(consumers.TwilioMediaStreamConsumer, 'text_to_speech', text_to_speech),
+            mock.patch.object(consumers, 'mp3_to_mulaw', return_value=b'\xff' * 2 * consumers.FRAME_BYTES),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def start_call(self):
+        communicator = WebsocketCommunicator(consumers.TwilioMediaStreamConsumer.as_asgi(), '/ws/twilio_media/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.send_json_to({'event': 'start', 'start': {
+            'streamSid': 'MZ1', 'callSid': 'CA1',
+            'customParameters': {'From': '+919876543210', 'To': '+15551234567'},
+        }})
+        return communicator
+
+    async def receive_until_mark(self, communicator):
+        """Messages sent up to and including the next mark"""
+        messages = []
+        while not messages or messages[-1]['event'] != 'mark':
+            messages.append(await communicator.receive_json_from(timeout=5))
+        return messages
+
+    async def test_greeting_and_keypad_turn_are_streamed(self):
+        communicator = await self.start_call()
+
+        greeting = await self.receive_until_mark(communicator)
+        # Two frames per synthesized sentence, then the mark Twilio echoes once they've played
+        self.assertEqual([m['event'] for m in greeting], ['media'] * 2 * len(self.spoken) + ['mark'])
+        self.assertEqual(greeting[-1]['mark']['name'], 'response-end')
+        self.assertIn('Welcome to Pizza Place', self.spoken[0])
+
+        await communicator.send_json_to({'event': 'mark', 'streamSid': 'MZ1', 'mark': {'name': 'response-end'}})
+        await communicator.send_json_to({'event': 'dtmf', 'streamSid': 'MZ1', 'dtmf': {'digit': '1'}})
+        reply = await self.receive_until_mark(communicator)
+        self.assertEqual(reply[0]['event'], 'media')  # Nothing was playing, so nothing to clear
+        self.assertTrue(any('Press 1 for Drinks' in text for text in self.spoken))
+
+        state = await get_session_store().aload('CA1')
+        self.assertEqual((state.current_step, state.turn), ('menu_selection', 1))
+        await communicator.disconnect()
+
+    async def test_pressing_a_key_over_the_greeting_clears_it(self):
+        communicator = await self.start_call()
+        await self.receive_until_mark(communicator)  # Sent, but Twilio hasn't played it through yet
+
+        await communicator.send_json_to({'event': 'dtmf', 'streamSid': 'MZ1', 'dtmf': {'digit': '1'}})
+
+        self.assertEqual(await communicator.receive_json_from(timeout=5), {'event': 'clear', 'streamSid': 'MZ1'})
+        await communicator.disconnect()
+
+    async def test_overloaded_worker_turns_the_call_away(self):
+        with mock.patch.object(consumers.admission, 'overloaded', return_value='too many calls'), \
+                mock.patch.object(consumers, 'send_busy_fallback', return_value=True), \
+                mock.patch.object(consumers.TwilioMediaStreamConsumer, 'update_call') as update_call:
+            communicator = await self.start_call()
+            self.assertEqual((await communicator.receive_output(timeout=5))['type'], 'websocket.close')
+
+        self.assertIn('Pizza Place', update_call.call_args.args[0])
+        self.assertIsNone(await get_session_store().aload('CA1'))
+
+
+class PromptAudioPruneTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        patcher = override_settings(MEDIA_ROOT=media_root.name, IVR_PROMPT_AUDIO_MANIFEST_TTL=60)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+        self.used, self.unused = prompt_audio.audio_name('Welcome'), prompt_audio.audio_name('Old special')
+        for name in (self.used, self.unused):
+            default_storage.save(name, ContentFile(b'mp3'))
+        prompt_audio.publish_manifest()
+
+    def prune(self, in_use, after=0):
+        with mock.patch.object(prompt_audio.time, 'time', return_value=time.time() + after):
+            return prompt_audio.prune(in_use)
+
+    def test_unused_recording_leaves_the_manifest_before_it_is_deleted(self):
+        self.assertEqual(self.prune({self.used}), (1, 0))
+
+        self.assertEqual(cache.get(prompt_audio.MANIFEST_KEY), {self.used})
+        # Workers may still hold the old manifest
+        self.assertTrue(default_storage.exists(self.unused))
+        # A run without --prune must not publish it again
+        self.assertEqual(prompt_audio.publish_manifest(), {self.used})
+
+        self.assertEqual(self.prune({self.used}, after=30), (1, 0))
+        self.assertEqual(self.prune({self.used}, after=61), (0, 1))
+        self.assertFalse(default_storage.exists(self.unused))
+        self.assertTrue(default_storage.exists(self.used))
+
+    def test_recording_back_in_use_is_kept(self):
+        self.prune({self.used})
+
+        self.assertEqual(self.prune({self.used, self.unused}, after=61), (0, 0))
+
+        self.assertEqual(cache.get(prompt_audio.MANIFEST_KEY), {self.used, self.unused})
+        self.assertTrue(default_storage.exists(self.unused))
+
+
+def menu_snapshot():
+    return SimpleNamespace(menus=[
+        MenuSnapshot(id=1, name='Pizza', description='', items=(
+            MenuItemSnapshot(id=11, name='Margherita', description='', price=Decimal('10'), display_order=1),
+            MenuItemSnapshot(id=12, name='Pepperoni', description='', price=Decimal('12'), display_order=2),
+            MenuItemSnapshot(id=13, name='Chicken Tikka Pizza', description='', price=Decimal('14'), display_order=3),
+        )),
+        MenuSnapshot(id=2, name='Drinks', description='', items=(
+            MenuItemSnapshot(id=21, name='Cola', description='', price=Decimal('2'), display_order=1),
+        )),
+    ])
+
+
+class MenuResolverTests(SimpleTestCase):
+    def setUp(self):
+        self.resolver = MenuResolver(menu_snapshot())
+
+    def test_phonetic_codes_ignore_spelling_variants(self):
+        self.assertEqual(phonetic('margherita'), phonetic('margarita'))
+        self.assertNotEqual(phonetic('margherita'), phonetic('pepperoni'))
+
+    def test_items_match_by_sound(self):
+        menu, item = self.resolver.match_item("I'd like a margarita please")
+        self.assertEqual((menu.id, item.id), (1, 11))
+        self.assertEqual(self.resolver.match_item('peperoni', menu_id=1)[1].id, 12)
+
+    def test_menus_match_by_name(self):
+        self.assertEqual(self.resolver.match_menu('the drinks menu').id, 2)
+
+    def test_unrelated_speech_matches_nothing(self):
+        self.assertIsNone(self.resolver.match_item('what time do you close'))
+        self.assertIsNone(self.resolver.match_item('cola', menu_id=1))
+
+    def test_a_shared_sound_key_alone_is_not_a_match(self):
+        # 'call' and 'cola' are both 'kl'
+        self.assertEqual(phonetic('call'), phonetic('cola'))
+
+        self.assertIsNone(self.resolver.match_item('call me back'))
+        self.assertIsNone(self.resolver.match_item('call me back', menu_id=2))
+
+    def test_items_from_any_menu_need_most_of_their_name(self):
+        self.assertIsNone(self.resolver.match_item('tikka pizza'))
+        self.assertEqual(self.resolver.match_item('tikka pizza', menu_id=1)[1].id, 13)
+        self.assertEqual(self.resolver.match_item('chicken tika pizza')[1].id, 13)
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.controller = admission.AdmissionController()
+
+    @override_settings(IVR_ADMISSION_MAX_IN_FLIGHT=2)
+    def test_requests_in_flight_are_limited(self):
+        with self.controller.request(), self.controller.request():
+            self.assertIsNone(self.controller.overloaded())  # The asking request itself doesn't count
+            self.assertEqual(self.controller.overloaded(include_self=False), '2 webhook requests in flight')
+        self.assertEqual(self.controller.stats()['in_flight'], 0)
+
+    @override_settings(IVR_ADMISSION_MAX_STREAMS=5, IVR_ADMISSION_MAX_QUEUED_TURNS=2)
+    def test_queued_media_stream_turns_are_limited(self):
+        turns = asyncio.Queue()
+        self.controller.stream_opened(turns)
+        turns.put_nowait('1')
+        self.assertIsNone(self.controller.overloaded(include_self=False))
+
+        turns.put_nowait('2')
+        self.assertEqual(self.controller.overloaded(include_self=False), '2 media stream turns queued')
+
+        self.controller.stream_closed(turns)
+        self.assertEqual(self.controller.stats(), {'in_flight': 0, 'streams': 0, 'queued_turns': 0})
+
+
+@override_settings(IVR_ADMISSION_MAX_IN_FLIGHT=1)
+class LoadSheddingTests(TestCase):
+    url = '/api/twilio_bot/voice-assistant/'
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            user, self.profile = make_restaurant()
+            Menu.objects.create(subadmin_profile=user, name='Pizza')
+            SMSFallbackSettings.objects.create(restaurant=user, message='Order online at {restaurant_name}.')
+        make_entitled(self, user)
+        # Another call's webhook is being served by this worker
+        busy = admission.controller.request()
+        busy.__enter__()
+        self.addCleanup(busy.__exit__, None, None, None)
+
+    def call(self, call_sid='CA1', caller='+919876543210'):
+        return self.client.get(self.url, {
+            'CallSid': call_sid, 'From': caller, 'To': '+15551234567', 'CallStatus': 'in-progress',
+        }).content.decode()
+
+    def test_new_call_is_turned_away_with_an_sms_once(self):
+        twiml = self.call()
+        self.assertIn('All of our lines are busy', twiml)
+        self.assertIn("We'll text you shortly", twiml)
+        self.assertIn('<Hangup', twiml)
+
+        self.call('CA2')  # Redials within the cooldown
+
+        job = NotificationJob.objects.get()
+        self.assertEqual((job.channel, job.recipient, job.body), ('sms', '+919876543210', 'Order online at Pizza Place.'))
+        self.assertIsNone(get_session_store().load('CA1'))
+
+    def test_turns_of_admitted_calls_are_still_served(self):
+        store = get_session_store()
+        store.save(CallState(call_sid='CA1', restaurant_id=self.profile.pk, customer_info={'phone': '9876543210'}))
+
+        response = self.client.post(f"{self.url}?step=welcome&turn=0", {
+            'CallSid': 'CA1', 'From': '+919876543210', 'To': '+15551234567', 'Digits': '1',
+        })
+
+        self.assertIn('Press 1 for Pizza', response.content.decode())
+        self.assertEqual(store.load('CA1').current_step, 'menu_selection')
+
+
+def resolves_to(*addresses):
+    return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP, '', (address, 443)) for address in addresses]
+
+
+class OrderWebhookTests(TestCase):
+    def setUp(self):
+        user, self.profile = make_restaurant()
+        self.order = make_order(user, self.profile, items=())
+        self.endpoint = WebhookEndpoint.objects.create(
+            restaurant=self.profile, url='https://8.8.8.8/hook', events=['order.created'],
+        )
+
+    def test_sign_is_hmac_over_timestamp_and_body(self):
+        body = b'{"events":[]}'
+        digest = hmac.new(b'secret', b'1700000000.' + body, hashlib.sha256).hexdigest()
+
+        self.assertEqual(order_webhooks.sign('secret', 1700000000, body), f"t=1700000000,v1={digest}")
+
+    @override_settings(WEBHOOK_RETRY_BASE_SECONDS=10, WEBHOOK_RETRY_MAX_SECONDS=60)
+    def test_backoff_doubles_up_to_the_cap_with_jitter(self):
+        for attempts, expected in [(1, 10), (2, 20), (3, 40), (4, 60), (10, 60)]:
+            delay = order_webhooks.backoff_delay(attempts).total_seconds()
+            self.assertGreaterEqual(delay, expected * 0.8)
+            self.assertLessEqual(delay, expected * 1.2)
+
+    def test_enqueue_only_queues_subscribed_events(self):
+        self.assertEqual(len(order_webhooks.enqueue_order_event(self.order, 'order.created', items=[])), 1)
+        self.assertEqual(order_webhooks.enqueue_order_event(self.order, 'order.status_changed', items=[]), [])
+
+    @override_settings(WEBHOOK_MAX_ATTEMPTS=3)
+    def test_failed_batch_is_retried_then_dead_lettered(self):
+        order_webhooks.enqueue_order_event(self.order, 'order.created', items=[])
+        delivery = WebhookDelivery.objects.get()
+
+        delivery.attempts = 2
+        order_webhooks.record_batch([delivery], False, 500, 'HTTP 500')
+        delivery.refresh_from_db()
+        self.assertEqual(delivery.status, 'pending')
+        self.assertEqual(delivery.last_error, 'HTTP 500')
+        self.assertGreater(delivery.next_attempt_at, delivery.updated_at)
+
+        delivery.attempts = 3
+        order_webhooks.record_batch([delivery], False, 500, 'HTTP 500')
+        self.assertFalse(WebhookDelivery.objects.exists())
+        dead_letter = WebhookDeadLetter.objects.get()
+        self.assertEqual((dead_letter.attempts, dead_letter.response_status), (3, 500))
+        self.assertEqual(dead_letter.payload, delivery.payload)
+
+    def test_replay_queues_dead_letters_once(self):
+        dead_letter = WebhookDeadLetter.objects.create(
+            endpoint=self.endpoint, order=self.order, event='order.created', payload={'id': 'evt_1'}, attempts=8,
+        )
+
+        replayed = order_webhooks.replay_dead_letters(WebhookDeadLetter.objects.all())
+        self.assertEqual([delivery.payload for delivery in replayed], [{'id': 'evt_1'}])
+        self.assertEqual(replayed[0].status, 'pending')
+        dead_letter.refresh_from_db()
+        self.assertIsNotNone(dead_letter.replayed_at)
+
+        self.assertEqual(order_webhooks.replay_dead_letters(WebhookDeadLetter.objects.all()), [])
+        self.assertEqual(WebhookDelivery.objects.count(), 1)
+
+    def test_private_and_plain_http_urls_are_rejected(self):
+        for url in ['http://8.8.8.8/hook', 'https://127.0.0.1/hook', 'https://10.0.0.5/hook', 'https://169.254.169.254/']:
+            with self.assertRaises(order_webhooks.UnsafeWebhookURL):
+                order_webhooks.check_url(url)
+        self.assertEqual(order_webhooks.check_url('https://8.8.8.8/hook'), ['8.8.8.8'])
+
+    def test_host_with_any_private_address_is_rejected(self):
+        with mock.patch.object(socket, 'getaddrinfo', return_value=resolves_to('8.8.8.8', '10.0.0.5')):
+            with self.assertRaises(order_webhooks.UnsafeWebhookURL):
+                order_webhooks.check_url('https://pos.example.com/hook')
+
+    def test_batch_is_sent_to_the_checked_address(self):
+        self.endpoint.url = 'https://pos.example.com:8443/hook'
+        order_webhooks.enqueue_order_event(self.order, 'order.created', items=[])
+        response = requests.Response()
+        response.status_code, response.raw = 200, io.BytesIO()
+
+        # The name re-resolves to an internal address right after the check (DNS rebinding)
+        with mock.patch.object(socket, 'getaddrinfo', side_effect=[resolves_to('8.8.8.8'), resolves_to('127.0.0.1')]), \
+                mock.patch.object(order_webhooks.PinnedAddressAdapter, 'send', return_value=response) as send:
+            self.assertEqual(order_webhooks.post_batch(self.endpoint, list(WebhookDelivery.objects.all())), (True, 200, ''))
+
+        request = send.call_args.args[0]
+        self.assertEqual(request.url, 'https://8.8.8.8:8443/hook')
+        self.assertEqual(request.headers['Host'], 'pos.example.com:8443')
+
+    def test_tls_is_checked_against_the_hostname(self):
+        adapter = order_webhooks.PinnedAddressAdapter()
+        request = requests.Request('POST', 'https://8.8.8.8:8443/hook', headers={'Host': 'pos.example.com:8443'}).prepare()
+
+        pool = adapter.get_connection_with_tls_context(request, verify=True)
+
+        self.assertEqual((pool.host, pool.port), ('8.8.8.8', 8443))
+        self.assertEqual(pool.conn_kw['server_hostname'], 'pos.example.com')
+        self.assertEqual(pool.assert_hostname, 'pos.example.com')
+
+    def test_plain_http_is_never_sent(self):
+        with self.assertRaises(requests.exceptions.InvalidSchema):
+            order_webhooks.get_session().post('http://8.8.8.8/hook')
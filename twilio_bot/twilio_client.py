@@ -0,0 +1,150 @@
+# twilio_client.py
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from twilio.http.http_client import TwilioHttpClient
+from twilio.request_validator import RequestValidator
+from twilio.rest import Client
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_limiter = None
+_sender = None
+_init_lock = threading.Lock()
+
+
+def get_twilio_client():
+    """Process-wide Twilio client; its requests session keeps TLS connections alive between sends"""
+    global _client
+    if _client is None:
+        with _init_lock:
+            if _client is None:
+                http_client = TwilioHttpClient(
+                    pool_connections=True,
+                    timeout=getattr(settings, 'TWILIO_HTTP_TIMEOUT', 10),
+                )
+                # Enough pooled connections for every SMS worker, retrying only connection setup
+                http_client.session.mount('https://', HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=getattr(settings, 'TWILIO_SMS_WORKERS', 8) + 4,
+                    max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+                ))
+                _client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN, http_client=http_client)
+    return _client
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, timeout=None):
+        """Block until a token is available; False if `timeout` seconds pass first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+    def release(self, count=1):
+        """Give back tokens that were acquired but not spent"""
+        if count <= 0:
+            return
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + count)
+
+
+def get_sms_limiter():
+    global _limiter
+    if _limiter is None:
+        with _init_lock:
+            if _limiter is None:
+                _limiter = TokenBucket(
+                    rate=getattr(settings, 'TWILIO_SMS_RATE_PER_SECOND', 10),
+                    capacity=getattr(settings, 'TWILIO_SMS_BURST', 20),
+                )
+    return _limiter
+
+
+def sms_status_callback_url():
+    base_url = getattr(settings, 'TWILIO_STATUS_CALLBACK_BASE_URL', '')
+    if not base_url:
+        return None
+    return f"{base_url.rstrip('/')}/api/twilio_bot/sms-status/"
+
+
+def is_twilio_request(request):
+    """Whether a webhook POST carries a valid X-Twilio-Signature for the URL Twilio called"""
+    signature = request.META.get('HTTP_X_TWILIO_SIGNATURE', '')
+    if not signature:
+        return False
+    # Behind a proxy the request's own scheme and host aren't the public URL that Twilio signed
+    base_url = getattr(settings, 'TWILIO_STATUS_CALLBACK_BASE_URL', '')
+    url = f"{base_url.rstrip('/')}{request.get_full_path()}" if base_url else request.build_absolute_uri()
+    return RequestValidator(settings.TWILIO_AUTH_TOKEN).validate(url, request.POST, signature)
+
+
+def send_message(to, body, status_callback=None):
+    """Send one SMS at the account's rate; raises TwilioRestException on failure"""
+    get_sms_limiter().acquire()
+    params = {'body': body, 'from_': settings.TWILIO_PHONE_NUMBER, 'to': to}
+    if status_callback:
+        params['status_callback'] = status_callback
+    return get_twilio_client().messages.create(**params)
+
+
+class SmsSender:
+    """Sends SMS concurrently from a small worker pool, all sharing one rate limiter"""
+
+    def __init__(self, max_workers=None):
+        self.pool = ThreadPoolExecutor(
+            max_workers=max_workers or getattr(settings, 'TWILIO_SMS_WORKERS', 8),
+            thread_name_prefix='sms-sender',
+        )
+
+    def submit(self, to, body, status_callback=None):
+        """Queue one message; the Future resolves to the Twilio MessageInstance"""
+        return self.pool.submit(send_message, to, body, status_callback)
+
+    def send_batch(self, messages):
+        """Send (to, body) pairs; returns a MessageInstance or the exception for each, in order"""
+        futures = [self.submit(to, body, sms_status_callback_url()) for to, body in messages]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def get_sms_sender():
+    global _sender
+    if _sender is None:
+        with _init_lock:
+            if _sender is None:
+                _sender = SmsSender()
+    return _sender
@@ -1,11 +1,20 @@
 # urls.py (in your twilio_bot app)
-from django.urls import path
-from .views import MakeCallView, VoiceAssistantView, DebugView,get_menu_by_twilio_number
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import MakeCallView, VoiceAssistantView, AsyncVoiceAssistantView, PartialSpeechResultView, DebugView,get_menu_by_twilio_number
 from . import views
 
+router = DefaultRouter()
+router.register(r'campaigns', views.CallCampaignViewSet, basename='call-campaign')
+router.register(r'webhooks', views.WebhookEndpointViewSet, basename='webhook-endpoint')
+
 urlpatterns = [
+    path('', include(router.urls)),
     path('make-call/', MakeCallView.as_view(), name='make-call'),
-    path('voice-assistant/', VoiceAssistantView.as_view(), name='voice-assistant'),
+    path('voice-assistant/', AsyncVoiceAssistantView.as_view(), name='voice-assistant'),
+    path('voice-assistant/partial/', PartialSpeechResultView.as_view(), name='voice-partial'),
+    path('call-status/', views.call_status_callback, name='call-status'),
+    path('sms-status/', views.sms_status_callback, name='sms-status'),
     path('debug/', DebugView.as_view(), name='debug'),
     path('get-menu-by-twilio/', get_menu_by_twilio_number, name='get_menu_by_twilio'),
     path('chat/', views.chat_view, name='chat'),
@@ -70,15 +70,9 @@ def send_sms(phone_number, message):
         
         logger.info(f"Sending SMS to formatted number: {formatted_phone}")
         
-        # Create Twilio client
-        client = Client(account_sid, auth_token)
-        
-        # Send SMS
-        message_instance = client.messages.create(
-            body=message,
-            from_=twilio_phone_number,
-            to=formatted_phone
-        )
+        # Shared keep-alive client, throttled to the account's SMS rate
+        from .twilio_client import send_message, sms_status_callback_url
+        message_instance = send_message(formatted_phone, message, sms_status_callback_url())
         
         logger.info(f"SMS sent successfully. Message SID: {message_instance.sid}")
         return True
@@ -106,44 +100,6 @@ def validate_phone_number(phone_number):
 
 
 
-def is_plan_active(subadmin_email):
-    """Check if the subadmin has an active paid plan"""
-    try:
-        from superadmin.models import PlanPayment
-        from authentication.models import CustomUser  # Import your CustomUser model
-        
-        print(f"Checking plan status for subadmin: ==========={subadmin_email}")
-        
-        # Get the CustomUser instance first
-        try:
-            subadmin = CustomUser.objects.get(email=subadmin_email)
-        except CustomUser.DoesNotExist:
-            logger.error(f"Subadmin with email {subadmin_email} not found")
-            return False
-        
-        # Get the latest PAID payment for this subadmin
-        latest_payment = PlanPayment.objects.filter(
-            subadmin=subadmin,  # Now passing the CustomUser instance
-            payment_status='PAID'
-        ).order_by('-created_at').first()
-        
-        print(f"Latest payment found: ============={latest_payment}")
-        
-        if not latest_payment:
-            return False
-        
-        # Check if plan is not expired (assuming 30 days validity)
-        expiry_date = latest_payment.created_at + timedelta(days=90)
-        
-        return timezone.now() < expiry_date
-        
-    except Exception as e:
-        logger.error(f"Error checking plan status for {subadmin_email}: {e}")
-        return False
-
-
-
-
 import speech_recognition as sr
 import openai
 from gtts import gTTS
@@ -19,7 +19,18 @@ from subadmin.models import Menu, BusinessHour, UserSession, RestaurantLink, Ord
 from rest_framework.decorators import api_view
 from django.core.mail import send_mail
 import re
-from .utils import send_sms, format_business_hours, get_current_day, clean_phone_number, is_plan_active
+from .session_store import CallState, get_session_store
+from .notifications import enqueue_order_notifications
+from .order_webhooks import enqueue_order_event
+from . import idempotency, prompt_audio, prompts, speculation
+from .speculation import SPECULATIVE_STEPS, normalize_speech, partial_transcript
+from .call_events import event_from_request, enqueue_event, STATUS_MAP
+from .admission import controller as admission, busy_twiml, send_busy_fallback
+from .menu_resolver import get_resolver
+from .session_registry import get_session_registry, track as track_session, atrack as atrack_session
+from .twilio_client import get_twilio_client, is_twilio_request
+from .notifications import record_delivery_status
+from .utils import send_sms, format_business_hours, get_current_day, clean_phone_number
 from django.views import View
 import json
 import uuid
@@ -28,7 +39,13 @@ from twilio_bot.models import DemoBooking, DemoAvailability
 from .email_service import DemoEmailService
 from .google_calendar_service import GoogleCalendarService
 from django.utils import timezone
+from django.db import transaction
 from authentication.models import CustomUser
+from subadmin.phone_index import resolve_restaurant, resolve_restaurant_id, aresolve_restaurant_id, to_e164
+from subadmin.snapshot import get_snapshot, aget_snapshot
+from subadmin.caller_profile import get_profile, aget_profile
+from superadmin.entitlements import is_entitled, ais_entitled
+from asgiref.sync import sync_to_async
 
 
 # Set up logging
@@ -36,7 +53,8 @@ logger = logging.getLogger(__name__)
 
 # Set your OpenAI key
 openai.api_key = settings.OPENAI_API_KEY
-SESSION_CONTEXT = {}
+
+NO_INPUT_PROMPT = "I didn't receive any input. Please try again."
 
 
 class MakeCallView(APIView):
@@ -48,17 +66,18 @@ class MakeCallView(APIView):
             return Response({"error": "Missing 'to' number"}, status=400)
 
         try:
-            account_sid = settings.TWILIO_ACCOUNT_SID
-            auth_token = settings.TWILIO_AUTH_TOKEN
             from_number = settings.TWILIO_PHONE_NUMBER  
 
-            client = Client(account_sid, auth_token)
+            client = get_twilio_client()
             voice_url = request.build_absolute_uri(reverse('voice-assistant'))
 
             call = client.calls.create(
                 to=to_number,
                 from_=from_number,
-                url=voice_url
+                url=voice_url,
+                status_callback=request.build_absolute_uri(reverse('call-status')),
+                status_callback_event=['initiated', 'ringing', 'answered', 'completed'],
+                status_callback_method='POST'
             )
 
             logger.info(f"Call initiated to {to_number}, CallSid: {call.sid}")
@@ -72,6 +91,11 @@ class MakeCallView(APIView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class VoiceAssistantView(View):
+    snapshot = None
+    caller_profile = None
+    # Counted in admission's in-flight gauge; optional work (speculative partial results) opts out
+    admitted = True
+
     def get_plan_expired_message(self, restaurant):
         
             return (
@@ -81,38 +105,38 @@ class VoiceAssistantView(View):
                 "Please contact the restaurant directly for assistance. Goodbye."
             )
     
+    def dispatch(self, request, *args, **kwargs):
+        if not self.admitted:
+            return super().dispatch(request, *args, **kwargs)
+        with admission.request():
+            return super().dispatch(request, *args, **kwargs)
+    
     def get(self, request):
         """Handle Twilio webhook GET requests (initial call setup)"""
         try:
             call_sid = request.GET.get('CallSid')
-            from_number = request.GET.get('From')
-            to_number = request.GET.get('To')
+            restaurant_number, caller_number = self.get_call_numbers(request.GET)
             call_status = request.GET.get('CallStatus')
             
             response = VoiceResponse()
             
             if call_status == 'in-progress':
-                restaurant = self.get_restaurant_by_phone(to_number)
+                # Only new calls are turned away; turns of calls already admitted are always served
+                overload = admission.overloaded()
+                if overload:
+                    return self.busy_response(call_sid, restaurant_number, caller_number, overload)
+                
+                self.snapshot = get_snapshot(self.get_restaurant_id_by_phone(restaurant_number))
                 
-                if restaurant:
-                    if not is_plan_active(restaurant):
-                        response.say(self.get_plan_expired_message(restaurant))
+                if self.snapshot:
+                    if not is_entitled(self.snapshot.user_id):
+                        response.say(self.get_plan_expired_message(self.snapshot.restaurant_name))
                         response.hangup()
                         return HttpResponse(str(response), content_type='application/xml')
                     
-                    greeting = self.get_welcome_message(restaurant)
-                    
-                    gather = response.gather(
-                        input='speech dtmf',
-                        timeout=10,
-                        speech_timeout='auto',
-                        action=f'/api/twilio_bot/voice-assistant/',
-                        method='POST'
-                    )
-                    gather.say(greeting)
-                    
-                    response.say("I didn't receive any input. Please try again.")
-                    response.redirect('/api/twilio_bot/voice-assistant/')
+                    track_session(call_sid, self.snapshot.restaurant_id, 'welcome')
+                    self.caller_profile = self.load_caller_profile(caller_number)
+                    response = self.build_welcome_response(restaurant_number, caller_number)
                 else:
                     response.say("Sorry, restaurant information is not available. Please try again later.")
             
@@ -126,116 +150,229 @@ class VoiceAssistantView(View):
     
     def post(self, request):
         """Handle Twilio webhook POST requests (user input processing)"""
+        owned = False
         try:
             call_sid = request.POST.get('CallSid')
             speech_result = request.POST.get('SpeechResult', '')
             digits = request.POST.get('Digits', '')
-            from_number = request.POST.get('From')
-            to_number = request.POST.get('To')
-            
-            user_input = speech_result or digits
-            
-            # Clean phone number properly
-            clean_caller_phone = clean_phone_number(from_number)
-            caller_phone_digits = re.sub(r'\D', '', clean_caller_phone)[-10:] if clean_caller_phone else 'Unknown'
-            
-            session, created = UserSession.objects.get_or_create(
-                session_id=call_sid,
-                defaults={
-                    'current_step': 'welcome',
-                    'restaurant': self.get_restaurant_by_phone(to_number),
-                    'customer_info': {'phone': caller_phone_digits}
-                }
-            )
-            
-            if created and session.restaurant:
-                session.customer_info = {
-                    'phone': caller_phone_digits,
-                    'restaurant_name': session.restaurant.restaurant_name,
-                    'restaurant_email': session.restaurant.email_address,
-                    'restaurant_phone': session.restaurant.phone_number,
-                    'restaurant_address': f"{session.restaurant.address}, {session.restaurant.city}, {session.restaurant.state} {session.restaurant.zip_code}"
-                }
-                session.save()
-            
-            response_text = self.process_voice_input(session, user_input)
-            
-            twiml_response = VoiceResponse()
-            
-            # Updated to include new steps
-            if session.current_step in ['menu_selection', 'item_selection', 'order_confirmation']:
-                gather = twiml_response.gather(
-                    input='speech dtmf',
-                    timeout=10,
-                    speech_timeout='auto',
-                    action='/api/twilio_bot/voice-assistant/',
-                    method='POST'
-                )
-                gather.say(response_text)
-                
-                twiml_response.say("I didn't receive any input. Please try again.")
-                twiml_response.redirect('/api/twilio_bot/voice-assistant/')
-            else:
-                twiml_response.say(response_text)
-                twiml_response.say("Thank you for calling! Have a great day!")
-                twiml_response.hangup()
-            
-            return HttpResponse(str(twiml_response), content_type='application/xml')
+            restaurant_number, caller_number = self.get_call_numbers(request.POST)
+            
+            user_input = normalize_speech(speech_result) or digits
+            
+            # Twilio retries slow webhooks with the same action URL and input; answer those with the first result
+            fingerprint = self.get_turn_fingerprint(request, call_sid, user_input)
+            replay, owned = idempotency.begin(fingerprint)
+            if not owned:
+                return self.replay_response(call_sid, replay)
+            
+            # Live call state is kept in the session store; the UserSession row is written at call end
+            session_store = get_session_store()
+            
+            # Partial speech results may already have run this turn for the same words
+            speculative = self.take_speculation(request, call_sid, user_input)
+            if speculative is not None:
+                session, twiml = speculative
+                session_store.save(session)
+                track_session(call_sid, session.restaurant_id, session.current_step)
+                idempotency.finish(fingerprint, twiml)
+                return HttpResponse(twiml, content_type='application/xml')
+            
+            session = session_store.load(call_sid)
+            created = session is None
+            if created:
+                session = self.new_call_state(call_sid, self.get_restaurant_id_by_phone(restaurant_number), caller_number)
+            self.snapshot = get_snapshot(session.restaurant_id)
+            
+            if created:
+                self.fill_customer_info(session)
+            if self.needs_caller_profile(session):
+                self.caller_profile = self.load_caller_profile(session.customer_info.get('phone'))
+            
+            twiml_response = self.run_turn(session, user_input)
+            session_store.save(session)
+            if self.is_call_finished(session):
+                session_store.persist(session)
+            track_session(call_sid, session.restaurant_id, session.current_step, self.is_call_finished(session))
+            
+            twiml = str(twiml_response)
+            idempotency.finish(fingerprint, twiml)
+            return HttpResponse(twiml, content_type='application/xml')
             
         except Exception as e:
             logger.error(f"POST request error: {e}")
+            if owned:
+                idempotency.release(fingerprint)
             response = VoiceResponse()
             response.say("Sorry, there was an error processing your request. Please try again.")
             return HttpResponse(str(response), content_type='application/xml')
     
+    def busy_response(self, call_sid, restaurant_number, caller_number, reason):
+        """Short busy message plus the restaurant's SMS fallback, instead of queueing the caller"""
+        logger.warning(f"Turning away call {call_sid}: {reason}")
+        snapshot = get_snapshot(self.get_restaurant_id_by_phone(restaurant_number))
+        texted = send_busy_fallback(caller_number, snapshot)
+        return HttpResponse(busy_twiml(snapshot, texted), content_type='application/xml')
+    
+    def get_call_numbers(self, params):
+        """(restaurant number, customer number) for a webhook; outbound calls are placed from the restaurant"""
+        if params.get('Direction', '').startswith('outbound'):
+            return params.get('From'), params.get('To')
+        return params.get('To'), params.get('From')
+    
+    def get_action_url(self, session=None):
+        """Webhook URL for the next input, tagged with the step/turn it answers"""
+        if session is None:
+            return '/api/twilio_bot/voice-assistant/'
+        query = urllib.parse.urlencode({'step': session.current_step, 'turn': session.turn})
+        return f'/api/twilio_bot/voice-assistant/?{query}'
+    
+    def get_turn_fingerprint(self, request, call_sid, user_input):
+        return idempotency.turn_fingerprint(call_sid, request.GET.get('step'), request.GET.get('turn'), user_input)
+    
+    def get_partial_result_url(self, session):
+        query = urllib.parse.urlencode({'turn': session.turn})
+        return f'/api/twilio_bot/voice-assistant/partial/?{query}'
+    
+    def take_speculation(self, request, call_sid, user_input):
+        """(state, twiml) computed from partial results for this exact transcript, if any"""
+        turn = request.GET.get('turn')
+        if turn is None or not request.POST.get('SpeechResult') or not user_input:
+            return None
+        return speculation.take(call_sid, turn, user_input)
+    
+    def replay_response(self, call_sid, twiml):
+        """Answer a retried webhook with the TwiML the original request produced"""
+        if twiml is None:
+            logger.warning(f"Duplicate webhook for {call_sid} gave up waiting for the original request")
+            response = VoiceResponse()
+            response.say("Sorry, there was an error processing your request. Please try again.")
+            return HttpResponse(str(response), content_type='application/xml')
+        
+        logger.info(f"Replaying cached TwiML for retried webhook {call_sid}")
+        return HttpResponse(twiml, content_type='application/xml')
+    
+    def build_gather_response(self, prompt, session=None):
+        """TwiML that speaks a prompt and waits for speech or keypad input"""
+        action_url = self.get_action_url(session)
+        gather_options = {}
+        if session is not None and session.current_step in SPECULATIVE_STEPS and getattr(settings, 'IVR_PARTIAL_RESULTS', True):
+            gather_options['partial_result_callback'] = self.get_partial_result_url(session)
+            gather_options['partial_result_callback_method'] = 'POST'
+        response = VoiceResponse()
+        gather = response.gather(
+            input='speech dtmf',
+            timeout=10,
+            speech_timeout='auto',
+            action=action_url,
+            method='POST',
+            **gather_options
+        )
+        self.add_prompt(gather, prompt)
+        
+        self.add_prompt(response, NO_INPUT_PROMPT)
+        response.redirect(action_url)
+        return response
+    
+    def add_prompt(self, verb, text):
+        """<Play> the pre-rendered recording of a static prompt (render_prompt_audio), else <Say> it"""
+        url = prompt_audio.audio_url(text)
+        if url:
+            verb.play(url)
+        else:
+            verb.say(text)
+    
+    def build_welcome_response(self, restaurant_number, caller_number):
+        """Start the IVR: a Gather round-trip per turn, or a bidirectional media stream when one is configured"""
+        stream_url = getattr(settings, 'IVR_MEDIA_STREAM_URL', '')
+        if not stream_url:
+            return self.build_gather_response(self.get_greeting(self.snapshot))
+        
+        response = VoiceResponse()
+        stream = response.connect().stream(url=stream_url)
+        stream.parameter(name='To', value=restaurant_number)
+        stream.parameter(name='From', value=caller_number)
+        return response
+    
+    def run_turn(self, session, user_input):
+        """Advance the call by one input and build the TwiML answering it"""
+        response_text = self.process_voice_input(session, user_input)
+        session.turn += 1
+        return self.build_turn_response(session, response_text)
+    
+    def is_call_finished(self, session):
+        return session.current_step not in ['menu_selection', 'item_selection', 'order_confirmation']
+    
+    def build_turn_response(self, session, response_text):
+        """TwiML for one turn: gather the next input, or say goodbye once the flow is over"""
+        if not self.is_call_finished(session):
+            return self.build_gather_response(response_text, session)
+        
+        twiml_response = VoiceResponse()
+        twiml_response.say(response_text)
+        twiml_response.say("Thank you for calling! Have a great day!")
+        twiml_response.hangup()
+        return twiml_response
+    
+    def new_call_state(self, call_sid, restaurant_id, caller_number):
+        # Clean phone number properly
+        clean_caller_phone = clean_phone_number(caller_number)
+        caller_phone_digits = re.sub(r'\D', '', clean_caller_phone)[-10:] if clean_caller_phone else 'Unknown'
+        return CallState(
+            call_sid=call_sid,
+            restaurant_id=restaurant_id,
+            customer_info={'phone': caller_phone_digits}
+        )
+    
+    def fill_customer_info(self, session):
+        if not self.snapshot:
+            return
+        session.customer_info = {
+            'phone': session.customer_info.get('phone', 'Unknown'),
+            'restaurant_name': self.snapshot.restaurant_name,
+            'restaurant_email': self.snapshot.email_address,
+            'restaurant_phone': self.snapshot.phone_number,
+            'restaurant_address': self.snapshot.full_address
+        }
+    
     def get_restaurant_by_phone(self, phone_number):
         """Get restaurant by phone number"""
         try:
-            clean_phone = clean_phone_number(phone_number)
-            digits_only = re.sub(r'\D', '', clean_phone)[-10:] if clean_phone else ''
-            
-            restaurant = SubAdminProfile.objects.filter(
-                phone_number__contains=digits_only
-            ).first()
-            print(restaurant, "================restaurant==================")
-            return restaurant
+            return resolve_restaurant(phone_number)
         except Exception as e:
             logger.error(f"Error finding restaurant by phone {phone_number}: {e}")
             return None
         
 
-    def get_welcome_message(self, restaurant):
-        print(restaurant, "================restaurant==================")
+    def get_restaurant_id_by_phone(self, phone_number):
+        """Get restaurant id by phone number (no profile query)"""
         try:
-            # If you get an email string, convert to CustomUser
-            if isinstance(restaurant, str):
-                restaurant = CustomUser.objects.get(email=restaurant)
-            # If you get a SubAdminProfile instance, convert to its user
-            elif isinstance(restaurant, SubAdminProfile):
-                restaurant = restaurant.user
-
-            current_day = get_current_day()
-            today_hours = BusinessHour.objects.filter(
-                subadmin_profile=restaurant,
-                day=current_day
-            ).first()
-            print(today_hours, "================today_hours==================")
-
-            if today_hours and today_hours.closed_all_day:
+            return resolve_restaurant_id(phone_number)
+        except Exception as e:
+            logger.error(f"Error finding restaurant by phone {phone_number}: {e}")
+            return None
+
+
+    def get_welcome_message(self, snapshot, day=None, reopens=None):
+        """`day`/`reopens` pin the hours sentence (prompt pre-rendering); by default it follows the schedule"""
+        try:
+            schedule = snapshot.schedule
+            if day is None and reopens is None and schedule and not schedule.is_open():
+                next_open = schedule.next_open()
+                reopens = (schedule.today(next_open), next_open.time())
+            today_hours = snapshot.today_hours() if day is None else snapshot.hours_for(day)
+
+            if reopens:
+                reopen_day, reopen_time = reopens
+                hours_info = f"We are closed right now. We open again on {reopen_day} at {reopen_time.strftime('%I:%M %p')}"
+            elif today_hours and today_hours.closed_all_day:
                 hours_info = "We are closed today"
             elif today_hours:
                 hours_info = f"We are open today from {today_hours.opening_time.strftime('%I:%M %p')} to {today_hours.closing_time.strftime('%I:%M %p')}"
             else:
                 hours_info = "Please check our website for business hours"
 
-            active_menus = Menu.objects.filter(
-                subadmin_profile=restaurant,
-                is_active=True
-            ).count()
-            print(active_menus, "================active_menus==================")
-
-            restaurant_name = getattr(restaurant.sub_admin_profile, 'restaurant_name', 'our restaurant')
-            print(restaurant_name, "================restaurant_name==================")
+            active_menus = len(snapshot.menus)
+            restaurant_name = snapshot.restaurant_name or 'our restaurant'
 
             return f"""Welcome to {restaurant_name}! 
             {hours_info}.
@@ -243,10 +380,67 @@ class VoiceAssistantView(View):
             Press 1 to continue with your order, or say menu to hear our options."""
         except Exception as e:
             logger.error(f"Error creating welcome message: {e}")
-            restaurant_name = getattr(restaurant.sub_admin_profile, 'restaurant_name', 'our restaurant') if restaurant else 'our restaurant'
+            restaurant_name = getattr(snapshot, 'restaurant_name', None) or 'our restaurant'
             return f"Welcome to {restaurant_name}! How can I help you today?"
 
 
+    def load_caller_profile(self, phone_number):
+        """Recent orders of this caller at this restaurant (cached); None on any error"""
+        try:
+            return get_profile(self.snapshot.restaurant_id, phone_number) if self.snapshot else None
+        except Exception as e:
+            logger.error(f"Error loading caller profile: {e}")
+            return None
+    
+    def needs_caller_profile(self, session):
+        # The greeting can be re-spoken after the welcome step and after a cancelled order
+        return session.current_step in ('welcome', 'order_confirmation')
+    
+    def get_reorder(self):
+        """(menu, [(item, quantity)]) of the caller's last order that is still on the menu, else None"""
+        last_order = self.caller_profile.last_order if self.caller_profile else None
+        if last_order is None or not self.snapshot:
+            return None
+        menu = self.snapshot.menu(last_order.menu_id)
+        if menu is None:
+            return None
+        items = [(menu.item(past_item.item_id), past_item.quantity) for past_item in last_order.items]
+        items = [(item, quantity) for item, quantity in items if item is not None]
+        return (menu, items) if items else None
+    
+    def describe_items(self, items):
+        return ', '.join(f"{quantity} {item.name}" if quantity > 1 else item.name for item, quantity in items)
+    
+    def get_greeting(self, snapshot):
+        """Welcome message; repeat callers are offered their last order first"""
+        reorder = self.get_reorder()
+        if not reorder:
+            return self.get_welcome_message(snapshot)
+        
+        _, items = reorder
+        restaurant_name = snapshot.restaurant_name or 'our restaurant'
+        return f"""Welcome back to {restaurant_name}! 
+            Press 1 to repeat your last order of {self.describe_items(items)}.
+            Press 2, or say menu, to hear our options."""
+    
+    def repeat_order(self, session, menu, items):
+        """Load the last order into the session and go straight to confirmation"""
+        session.selected_menu_id = menu.id
+        session.selected_items = [
+            {
+                'item_id': item.id,
+                'name': item.name,
+                'price': float(item.price) if item.price else 0,
+                'quantity': quantity
+            }
+            for item, quantity in items
+        ]
+        session.current_step = 'order_confirmation'
+        
+        return f"""Your last order was {self.describe_items(items)} from {menu.name}.
+            
+            Press 1 to confirm and submit the same order again.
+            Press 2 to cancel and start over."""
     
     def process_voice_input(self, session, user_input):
         """Process user voice input based on current step"""
@@ -265,47 +459,83 @@ class VoiceAssistantView(View):
     def handle_welcome(self, session, user_input):
         """Handle welcome step and transition to menu selection"""
         try:
-            if not session.restaurant:
+            if not self.snapshot:
                 return "Sorry, restaurant information is not available."
             
-            if user_input.lower() in ['1', 'one', 'yes', 'menu', 'order']:
+            reorder = self.get_reorder()
+            if reorder and user_input.lower() in ['1', 'one', 'yes', 'repeat', 'same']:
+                return self.repeat_order(session, *reorder)
+            
+            if user_input.lower() in ['1', 'one', 'yes', 'menu', 'order'] or (reorder and user_input.lower() in ['2', 'two']):
                 session.current_step = 'menu_selection'
-                session.save()
-                return self.show_menu_options(session.restaurant)
+                session.page = 0
+                self.prefetch_menu_items(self.snapshot)
+                return self.show_menu_options(self.snapshot)
             else:
-                return self.get_welcome_message(session.restaurant)
+                return self.get_greeting(self.snapshot)
                 
         except Exception as e:
             logger.error(f"Error in handle_welcome: {e}")
-            return self.get_fallback_message(session.restaurant.id if session.restaurant else None)
+            return self.get_fallback_message()
     
-    def show_menu_options(self, restaurant):
-        """Display available menu categories"""
+    def show_menu_options(self, snapshot, page=0):
+        """Display available menu categories, one page at a time"""
         try:
-            active_menus = Menu.objects.filter(
-                subadmin_profile=restaurant,
-                is_active=True
-            ).order_by('name')
-            
-            if not active_menus:
-                return f"""Sorry, we don't have any active menus available right now. 
-                Please call us directly at {restaurant.phone_number} for assistance."""
-            
-            response = "Here are our available menu categories: "
-            
-            for index, menu in enumerate(active_menus, 1):
-                response += f"Press {index} for {menu.name}. "
-                if menu.description:
-                    response += f"{menu.description}. "
-            
-            response += "Which category would you like to order from?"
-            
-            return response
+            return prompts.get_prompt(snapshot, f'menu_options:{page}', lambda: self.render_menu_options(snapshot, page))
             
         except Exception as e:
             logger.error(f"Error showing menu options: {e}")
             return "Sorry, there was an error loading our menu. Please try again."
     
+    def render_menu_options(self, snapshot, page=0):
+        active_menus = snapshot.menus
+        
+        if not active_menus:
+            return f"""Sorry, we don't have any active menus available right now. 
+            Please call us directly at {snapshot.phone_number} for assistance."""
+        
+        response = "Here are our available menu categories: " if page == 0 else "More categories: "
+        
+        for index, menu in enumerate(self.get_page(active_menus, page), 1):
+            response += f"Press {index} for {menu.name}. "
+            if menu.description:
+                response += f"{menu.description}. "
+        
+        response += self.get_page_footer(active_menus, page, 'categories')
+        response += "Which category would you like to order from?"
+        
+        return response
+    
+    def get_page_size(self):
+        # 9 pages forward and 0 goes back, so at most 8 numbered options per page
+        return min(max(getattr(settings, 'IVR_MENU_PAGE_SIZE', 5), 1), 8)
+    
+    def get_page(self, entries, page):
+        page_size = self.get_page_size()
+        return entries[page * page_size:(page + 1) * page_size]
+    
+    def get_next_page(self, entries, page):
+        """Page after `page`, wrapping to the first page after the last one"""
+        next_page = page + 1
+        return next_page if next_page * self.get_page_size() < len(entries) else 0
+    
+    def get_page_footer(self, entries, page, noun):
+        if len(entries) <= self.get_page_size():
+            return ""
+        if self.get_next_page(entries, page):
+            return f"Press 9 for more {noun}. "
+        return f"Press 9 to hear the {noun} again from the start. "
+    
+    def is_more_request(self, user_input, choice):
+        return choice == 9 or user_input.lower().strip() in ['more', 'next', 'more please']
+    
+    def prefetch_menu_items(self, snapshot):
+        """Render every category's first page of items as the caller reaches menu selection, so the keypress is a cache read"""
+        try:
+            prompts.prefetch(snapshot, 'menu_items:0', self.render_menu_items, snapshot.menus)
+        except Exception as e:
+            logger.error(f"Error prefetching menu item prompts: {e}")
+    
     
     def handle_menu_selection(self, session, user_input):
         """Handle menu category selection - now goes to item selection"""
@@ -319,18 +549,33 @@ class VoiceAssistantView(View):
                 }
                 choice = word_to_num.get(user_input.lower().strip(), 0)
             
-            active_menus = Menu.objects.filter(
-                subadmin_profile=session.restaurant,
-                is_active=True
-            ).order_by('name')
+            active_menus = self.snapshot.menus
             
-            if choice < 1 or choice > len(active_menus):
-                return f"Please choose a valid option between 1 and {len(active_menus)}."
+            if self.is_more_request(user_input, choice) and len(active_menus) > self.get_page_size():
+                session.page = self.get_next_page(active_menus, session.page)
+                return self.show_menu_options(self.snapshot, session.page)
             
-            selected_menu = list(active_menus)[choice - 1]
-            session.selected_menu = selected_menu
+            if choice == 0:
+                # Spoken names: an item goes straight to confirmation, a category to its items
+                resolver = get_resolver(self.snapshot)
+                match = resolver.match_item(user_input)
+                if match is not None:
+                    return self.select_item(session, *match)
+                menu = resolver.match_menu(user_input)
+                if menu is not None:
+                    session.selected_menu_id = menu.id
+                    session.current_step = 'item_selection'
+                    session.page = 0
+                    return self.show_menu_items(menu)
+            
+            page_menus = self.get_page(active_menus, session.page)
+            if choice < 1 or choice > len(page_menus):
+                return f"Please choose a valid option between 1 and {len(page_menus)}."
+            
+            selected_menu = page_menus[choice - 1]
+            session.selected_menu_id = selected_menu.id
             session.current_step = 'item_selection'  # New step for item selection
-            session.save()
+            session.page = 0
             
             return self.show_menu_items(selected_menu)
             
@@ -338,36 +583,40 @@ class VoiceAssistantView(View):
             logger.error(f"Error in handle_menu_selection: {e}")
             return "Please enter a valid number or try again."
     
-    def show_menu_items(self, menu):
-        """Display items within selected menu category"""
+    def show_menu_items(self, menu, page=0):
+        """Display items within selected menu category, one page at a time"""
         try:
-            menu_items = MenuItem.objects.filter(
-                menu=menu,
-                is_available=True
-            ).order_by('display_order', 'name')
-            
-            if not menu_items:
-                return f"""Sorry, {menu.name} items are not available right now. 
-                Press 0 to go back to menu categories or try again later."""
-            
-            response = f"Great! You selected {menu.name}. Here are the available items: "
-            
-            for index, item in enumerate(menu_items, 1):
-                response += f"Press {index} for {item.name}"
-                if item.price:
-                    response += f" at {item.price} rupees"
-                response += ". "
-                if item.description:
-                    response += f"{item.description}. "
-            
-            response += "Press 0 to go back to menu categories. Which item would you like to order?"
-            
-            return response
+            return prompts.get_prompt(self.snapshot, f'menu_items:{page}', lambda: self.render_menu_items(menu, page), menu_id=menu.id)
             
         except Exception as e:
             logger.error(f"Error showing menu items: {e}")
             return "Sorry, there was an error loading menu items. Please try again."
     
+    def render_menu_items(self, menu, page=0):
+        menu_items = menu.items
+        
+        if not menu_items:
+            return f"""Sorry, {menu.name} items are not available right now. 
+            Press 0 to go back to menu categories or try again later."""
+        
+        if page == 0:
+            response = f"Great! You selected {menu.name}. Here are the available items: "
+        else:
+            response = f"More from {menu.name}: "
+        
+        for index, item in enumerate(self.get_page(menu_items, page), 1):
+            response += f"Press {index} for {item.name}"
+            if item.price:
+                response += f" at {item.price} rupees"
+            response += ". "
+            if item.description:
+                response += f"{item.description}. "
+        
+        response += self.get_page_footer(menu_items, page, 'items')
+        response += "Press 0 to go back to menu categories. Which item would you like to order?"
+        
+        return response
+    
     def handle_item_selection(self, session, user_input):
         """Handle specific menu item selection"""
         try:
@@ -380,22 +629,40 @@ class VoiceAssistantView(View):
                 }
                 choice = word_to_num.get(user_input.lower().strip(), -1)
             
+            selected_menu = self.snapshot.menu(session.selected_menu_id)
+            menu_items = selected_menu.items if selected_menu else ()
+            
+            if self.is_more_request(user_input, choice) and len(menu_items) > self.get_page_size():
+                session.page = self.get_next_page(menu_items, session.page)
+                return self.show_menu_items(selected_menu, session.page)
+            
+            if choice == -1:
+                match = get_resolver(self.snapshot).match_item(user_input, session.selected_menu_id)
+                if match is not None:
+                    return self.select_item(session, *match)
+            
             if choice == 0:
                 # Go back to menu selection
                 session.current_step = 'menu_selection'
-                session.selected_menu = None
-                session.save()
-                return self.show_menu_options(session.restaurant)
+                session.selected_menu_id = None
+                session.page = 0
+                self.prefetch_menu_items(self.snapshot)
+                return self.show_menu_options(self.snapshot)
             
-            menu_items = MenuItem.objects.filter(
-                menu=session.selected_menu,
-                is_available=True
-            ).order_by('display_order', 'name')
+            page_items = self.get_page(menu_items, session.page)
+            if choice < 1 or choice > len(page_items):
+                return f"Please choose a valid option between 1 and {len(page_items)}, or press 0 to go back."
             
-            if choice < 1 or choice > len(menu_items):
-                return f"Please choose a valid option between 1 and {len(menu_items)}, or press 0 to go back."
+            return self.select_item(session, selected_menu, page_items[choice - 1])
             
-            selected_item = list(menu_items)[choice - 1]
+        except Exception as e:
+            logger.error(f"Error in handle_item_selection: {e}")
+            return "Please enter a valid number or try again."
+    
+    def select_item(self, session, selected_menu, selected_item):
+        """Add the item to the order and read back the summary for confirmation"""
+        try:
+            session.selected_menu_id = selected_menu.id
             
             # Store selected item
             selected_items = session.selected_items or []
@@ -407,7 +674,6 @@ class VoiceAssistantView(View):
             })
             session.selected_items = selected_items
             session.current_step = 'order_confirmation'
-            session.save()
             
             response = f"""Excellent choice! You've selected {selected_item.name}"""
             if selected_item.price:
@@ -415,8 +681,8 @@ class VoiceAssistantView(View):
             response += f""".
             
             Order Summary:
-            Restaurant: {session.restaurant.restaurant_name}
-            Category: {session.selected_menu.name}
+            Restaurant: {self.snapshot.restaurant_name}
+            Category: {selected_menu.name}
             Item: {selected_item.name}"""
             
             if selected_item.price:
@@ -426,8 +692,8 @@ class VoiceAssistantView(View):
             Your phone: {session.customer_info.get('phone', 'Unknown')}
             
             Restaurant Details:
-            Address: {session.restaurant.address}, {session.restaurant.city}, {session.restaurant.state}
-            Phone: {session.restaurant.phone_number}
+            Address: {self.snapshot.address}, {self.snapshot.city}, {self.snapshot.state}
+            Phone: {self.snapshot.phone_number}
             
             Press 1 to confirm and submit your order request.
             Press 2 to cancel and start over.
@@ -437,7 +703,7 @@ class VoiceAssistantView(View):
             return response
             
         except Exception as e:
-            logger.error(f"Error in handle_item_selection: {e}")
+            logger.error(f"Error in select_item: {e}")
             return "Please enter a valid number or try again."
     
     def handle_order_confirmation(self, session, user_input):
@@ -456,15 +722,13 @@ class VoiceAssistantView(View):
             if choice == 1:
                 order_result = self.process_order(session)
                 session.current_step = 'complete'
-                session.save()
                 return order_result
                 
             elif choice == 2:
                 session.current_step = 'welcome'
-                session.selected_menu = None
+                session.selected_menu_id = None
                 session.selected_items = []
-                session.save()
-                return "Order cancelled. " + self.get_welcome_message(session.restaurant)
+                return "Order cancelled. " + self.get_greeting(self.snapshot)
             
             else:
                 return "Please press 1 to confirm order or 2 to cancel."
@@ -476,164 +740,324 @@ class VoiceAssistantView(View):
     def process_order(self, session):
         """Process the final order and send notifications"""
         try:
-            customer_info = session.customer_info
+            order = self.create_order(session)
+            return self.get_order_success_message(session, order)
             
-            # Create main order
+        except Exception as e:
+            logger.error(f"Error processing order: {e}")
+            return self.get_fallback_message()
+    
+    def create_order(self, session):
+        """Write the order, its items and the notification jobs in one transaction"""
+        customer_info = session.customer_info
+        
+        with transaction.atomic():
             order = Order.objects.create(
                 customer_name=f"Customer from {customer_info.get('phone', 'Unknown')}",
-                customer_email=session.restaurant.email_address,
+                customer_email=self.snapshot.email_address,
                 customer_phone=customer_info.get('phone', ''),
-                restaurant=session.restaurant,
-                menu=session.selected_menu,
+                restaurant_id=self.snapshot.restaurant_id,
+                menu_id=session.selected_menu_id,
                 notes=f"Voice order - Items: {', '.join([item['name'] for item in session.selected_items])}"
             )
             
-            # Create order items
+            # One query for all menu items, one INSERT for all order items
+            menu_items = MenuItem.objects.in_bulk([item_data['item_id'] for item_data in session.selected_items])
+            order_items = []
             for item_data in session.selected_items:
-                try:
-                    menu_item = MenuItem.objects.get(id=item_data['item_id'])
-                    OrderItem.objects.create(
-                        order=order,
-                        menu_item=menu_item,
-                        quantity=item_data.get('quantity', 1)
-                    )
-                except MenuItem.DoesNotExist:
+                menu_item = menu_items.get(item_data['item_id'])
+                if menu_item is None:
                     logger.warning(f"MenuItem {item_data['item_id']} not found")
-            
-            self.send_order_notifications(order)
-            
-            response = f"""🎉 ORDER SUCCESSFUL! 🎉
+                    continue
+                order_items.append(OrderItem(
+                    order=order,
+                    menu_item=menu_item,
+                    quantity=item_data.get('quantity', 1)
+                ))
+            OrderItem.objects.bulk_create(order_items)
+            
+            # Email/SMS go through the notification queue so the TwiML returns immediately
+            enqueue_order_notifications(order)
+            # POS webhooks too; the items already carry their menu items, so no extra queries
+            enqueue_order_event(order, 'order.created', items=order_items)
+        
+        return order
+    
+    def get_order_success_message(self, session, order):
+        customer_info = session.customer_info
+        selected_menu = self.snapshot.menu(session.selected_menu_id)
+        
+        response = f"""🎉 ORDER SUCCESSFUL! 🎉
             
             Your order #{order.id} has been submitted successfully!
             
-            Restaurant: {session.restaurant.restaurant_name}
-            Category: {session.selected_menu.name}
+            Restaurant: {self.snapshot.restaurant_name}
+            Category: {selected_menu.name if selected_menu else ''}
             Items ordered: {', '.join([item['name'] for item in session.selected_items])}
             Your Phone: {customer_info.get('phone', 'Unknown')}
             
             Restaurant Contact:
-            Address: {session.restaurant.address}, {session.restaurant.city}
-            Phone: {session.restaurant.phone_number}
+            Address: {self.snapshot.address}, {self.snapshot.city}
+            Phone: {self.snapshot.phone_number}
             
             📧 Confirmation email sent to restaurant.
             📱 SMS confirmations sent.
             
             A staff member will call you shortly to confirm details and pricing.
             
-            Thank you for choosing {session.restaurant.restaurant_name}!"""
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"Error processing order: {e}")
-            return self.get_fallback_message(session.restaurant.id if session.restaurant else None)
+            Thank you for choosing {self.snapshot.restaurant_name}!"""
+        
+        return response
     
-    def send_order_notifications(self, order):
-        """Send email and SMS notifications with proper phone formatting"""
+    # Keep your existing methods (get_fallback_message, etc.)
+    def get_fallback_message(self):
+        """Get SMS fallback message if system fails"""
         try:
-            # Get ordered items
-            order_items = OrderItem.objects.filter(order=order)
-            items_list = ', '.join([f"{item.menu_item.name} x{item.quantity}" for item in order_items])
-            
-            # Email to restaurant
-            restaurant_subject = f"New Voice Order #{order.id}"
-            restaurant_message = f"""
-            New voice order request received!
-            
-            Order #{order.id}
-            Customer Phone: {order.customer_phone}
-            Selected Category: {order.menu.name}
-            Items Ordered: {items_list}
-            Order Time: {order.created_at.strftime('%Y-%m-%d %H:%M:%S')}
-            
-            Restaurant: {order.restaurant.restaurant_name}
-            Address: {order.restaurant.address}, {order.restaurant.city}, {order.restaurant.state}
-            
-            Please call customer at {order.customer_phone} to confirm details and pricing.
-            
-            Notes: {order.notes}
-            """
-            
-            send_mail(
-                restaurant_subject,
-                restaurant_message,
-                settings.DEFAULT_FROM_EMAIL,
-                [order.restaurant.email_address],
-                fail_silently=True
-            )
+            if self.snapshot and self.snapshot.fallback_message:
+                return self.snapshot.fallback_message
             
-            # SMS notifications with proper formatting
-            customer_sms = f"""🍽️ {order.restaurant.restaurant_name}
-
-Order #{order.id} confirmed!
-
-Items: {items_list}
-
-We'll call you shortly at {order.customer_phone} to confirm details.
+            return "I'm sorry, there was an error processing your request. Please try again or contact the restaurant directly."
+            
+        except Exception as e:
+            logger.error(f"Error getting fallback message: {e}")
+            return "I'm sorry, there was an error processing your request. Please try again."
 
-Restaurant: {order.restaurant.address}, {order.restaurant.city}
-Phone: {order.restaurant.phone_number}
 
-Thank you!"""
-            
-            restaurant_sms = f"""📋 NEW ORDER ALERT
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncVoiceAssistantView(VoiceAssistantView):
+    """Async webhook handlers: under ASGI a call waiting on cache/DB doesn't hold a worker thread.
 
-Order #{order.id}
-Customer: {order.customer_phone}
-Items: {items_list}
-Time: {order.created_at.strftime('%H:%M')}
+    Routing, snapshot, session, dedup and registry I/O are awaited here. The IVR flow itself is shared
+    with VoiceAssistantView and does sync cache/DB reads (prompts, prompt audio, the menu resolver,
+    the order write), so each turn runs it in one sync_to_async call, never on the event loop.
+    """
 
-Please call to confirm."""
+    async def dispatch(self, request, *args, **kwargs):
+        # View.dispatch itself: going through VoiceAssistantView.dispatch would count the request twice
+        handler = View.dispatch(self, request, *args, **kwargs)
+        if not self.admitted:
+            return await handler
+        with admission.request():
+            return await handler
+    
+    async def get(self, request):
+        """Handle Twilio webhook GET requests (initial call setup)"""
+        try:
+            call_sid = request.GET.get('CallSid')
+            restaurant_number, caller_number = self.get_call_numbers(request.GET)
+            call_status = request.GET.get('CallStatus')
             
-            # Send SMS with proper phone formatting
-            customer_sms_success = send_sms(order.customer_phone, customer_sms)
-            restaurant_sms_success = send_sms(order.restaurant.phone_number, restaurant_sms)
+            response = VoiceResponse()
             
-            if customer_sms_success:
-                logger.info(f"Customer SMS sent successfully for order #{order.id}")
-            else:
-                logger.error(f"Failed to send customer SMS for order #{order.id}")
+            if call_status == 'in-progress':
+                overload = admission.overloaded()
+                if overload:
+                    return await sync_to_async(self.busy_response)(call_sid, restaurant_number, caller_number, overload)
                 
-            if restaurant_sms_success:
-                logger.info(f"Restaurant SMS sent successfully for order #{order.id}")
-            else:
-                logger.error(f"Failed to send restaurant SMS for order #{order.id}")
+                self.snapshot = await aget_snapshot(await self.aget_restaurant_id_by_phone(restaurant_number))
+                
+                if self.snapshot:
+                    if not await ais_entitled(self.snapshot.user_id):
+                        response.say(self.get_plan_expired_message(self.snapshot.restaurant_name))
+                        response.hangup()
+                        return HttpResponse(str(response), content_type='application/xml')
+                    
+                    await atrack_session(call_sid, self.snapshot.restaurant_id, 'welcome')
+                    self.caller_profile = await self.aload_caller_profile(caller_number)
+                    response = await sync_to_async(self.build_welcome_response)(restaurant_number, caller_number)
+                else:
+                    response.say("Sorry, restaurant information is not available. Please try again later.")
+            
+            return HttpResponse(str(response), content_type='application/xml')
             
         except Exception as e:
-            logger.error(f"Notification error for order #{order.id}: {e}")
+            logger.error(f"GET request error: {e}")
+            response = VoiceResponse()
+            response.say("Sorry, there was an error. Please try again later.")
+            return HttpResponse(str(response), content_type='application/xml')
     
-    # Keep your existing methods (get_fallback_message, etc.)
-    def get_fallback_message(self, restaurant_id):
-        """Get SMS fallback message if system fails"""
+    async def post(self, request):
+        """Handle Twilio webhook POST requests (user input processing)"""
+        owned = False
         try:
-            if restaurant_id:
-                restaurant = SubAdminProfile.objects.get(id=restaurant_id)
-                fallback_settings = getattr(restaurant, 'sms_fallback_settings', None)
-                if fallback_settings and fallback_settings.is_active:
-                    return fallback_settings.get_processed_message()
-            
-            return "I'm sorry, there was an error processing your request. Please try again or contact the restaurant directly."
+            call_sid = request.POST.get('CallSid')
+            speech_result = request.POST.get('SpeechResult', '')
+            digits = request.POST.get('Digits', '')
+            restaurant_number, caller_number = self.get_call_numbers(request.POST)
+            
+            user_input = normalize_speech(speech_result) or digits
+            
+            fingerprint = self.get_turn_fingerprint(request, call_sid, user_input)
+            replay, owned = await idempotency.abegin(fingerprint)
+            if not owned:
+                return self.replay_response(call_sid, replay)
+            
+            session_store = get_session_store()
+            
+            speculative = await self.atake_speculation(request, call_sid, user_input)
+            if speculative is not None:
+                session, twiml = speculative
+                await session_store.asave(session)
+                await atrack_session(call_sid, session.restaurant_id, session.current_step)
+                await idempotency.afinish(fingerprint, twiml)
+                return HttpResponse(twiml, content_type='application/xml')
+            
+            session = await session_store.aload(call_sid)
+            created = session is None
+            if created:
+                session = self.new_call_state(call_sid, await self.aget_restaurant_id_by_phone(restaurant_number), caller_number)
+            self.snapshot = await aget_snapshot(session.restaurant_id)
+            
+            if created:
+                self.fill_customer_info(session)
+            if self.needs_caller_profile(session):
+                self.caller_profile = await self.aload_caller_profile(session.customer_info.get('phone'))
+            
+            twiml_response = await sync_to_async(self.run_turn)(session, user_input)
+            await session_store.asave(session)
+            if self.is_call_finished(session):
+                await session_store.apersist(session)
+            await atrack_session(call_sid, session.restaurant_id, session.current_step, self.is_call_finished(session))
+            
+            twiml = str(twiml_response)
+            await idempotency.afinish(fingerprint, twiml)
+            return HttpResponse(twiml, content_type='application/xml')
             
         except Exception as e:
-            logger.error(f"Error getting fallback message: {e}")
-            return "I'm sorry, there was an error processing your request. Please try again."
+            logger.error(f"POST request error: {e}")
+            if owned:
+                await idempotency.arelease(fingerprint)
+            response = VoiceResponse()
+            response.say("Sorry, there was an error processing your request. Please try again.")
+            return HttpResponse(str(response), content_type='application/xml')
+    
+    async def atake_speculation(self, request, call_sid, user_input):
+        turn = request.GET.get('turn')
+        if turn is None or not request.POST.get('SpeechResult') or not user_input:
+            return None
+        return await speculation.atake(call_sid, turn, user_input)
+    
+    async def aload_caller_profile(self, phone_number):
+        try:
+            return await aget_profile(self.snapshot.restaurant_id, phone_number) if self.snapshot else None
+        except Exception as e:
+            logger.error(f"Error loading caller profile: {e}")
+            return None
+    
+    async def aget_restaurant_id_by_phone(self, phone_number):
+        try:
+            return await aresolve_restaurant_id(phone_number)
+        except Exception as e:
+            logger.error(f"Error finding restaurant by phone {phone_number}: {e}")
+            return None
+
 
 
-# Debug view to monitor sessions
+@method_decorator(csrf_exempt, name='dispatch')
+class PartialSpeechResultView(AsyncVoiceAssistantView):
+    """Twilio partialResultCallback: run the turn on the interim transcript while the caller is still talking.
+
+    The resulting state and TwiML are cached for the turn; if the final SpeechResult matches, the action
+    webhook answers from the cache instead of doing the work again.
+    """
+    http_method_names = ['post']
+    # Speculation must never make the worker look busier and get real turns or calls shed
+    admitted = False
+    pending_order = False
+
+    async def post(self, request):
+        try:
+            call_sid = request.POST.get('CallSid')
+            turn = request.GET.get('turn')
+            user_input = partial_transcript(request.POST)
+            if not call_sid or turn is None or not user_input:
+                return HttpResponse(status=204)
+            
+            # Speculation is optional work; skip it while the worker is shedding load
+            if admission.overloaded(include_self=False):
+                return HttpResponse(status=204)
+            
+            # Twilio sends a callback per interim result; skip repeats of the transcript already computed
+            if await speculation.apeek(call_sid, turn) == user_input:
+                return HttpResponse(status=204)
+            
+            session = await get_session_store().aload(call_sid)
+            if session is None or str(session.turn) != turn or session.current_step not in SPECULATIVE_STEPS:
+                return HttpResponse(status=204)
+            self.snapshot = await aget_snapshot(session.restaurant_id)
+            if not self.snapshot:
+                return HttpResponse(status=204)
+            
+            # The loaded state is a private copy; it's only kept if the final transcript matches
+            base_turn = session.turn
+            twiml_response = await sync_to_async(self.run_turn)(session, user_input)
+            if self.pending_order:
+                return HttpResponse(status=204)
+            twiml = str(twiml_response)
+            await speculation.astore(call_sid, base_turn, user_input, self.snapshot.version, session, twiml)
+        except Exception as e:
+            logger.error(f"Partial speech result error for {request.POST.get('CallSid')}: {e}")
+        return HttpResponse(status=204)
+    
+    def process_order(self, session):
+        # An order is only ever placed by the final transcript's webhook
+        self.pending_order = True
+        return ''
+
+
+@csrf_exempt
+def call_status_callback(request):
+    """Twilio call status callback: queue the event, CallRecord is written by flush_call_events"""
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+    # A forged status could rewrite call records, fail campaign calls or end live calls
+    if not is_twilio_request(request):
+        logger.warning(f"Rejected call status callback for {request.POST.get('CallSid')}: bad Twilio signature")
+        return HttpResponse(status=403)
+    try:
+        event = event_from_request(request.POST)
+        enqueue_event(event)
+        # Hang-ups mid-flow never reach a final IVR step, so drop the live session and keep its state here too
+        if STATUS_MAP.get(event['status']) in ('completed', 'failed'):
+            track_session(event['call_sid'], finished=True)
+            get_session_store().persist_ended(event['call_sid'])
+    except Exception as e:
+        logger.error(f"Error queueing call status for {request.POST.get('CallSid')}: {e}")
+    return HttpResponse(status=204)
+
+
+@csrf_exempt
+def sms_status_callback(request):
+    """Twilio message status callback: track delivery of queued SMS notifications"""
+    if request.method != 'POST':
+        return HttpResponse(status=405)
+    if not is_twilio_request(request):
+        logger.warning(f"Rejected SMS status callback for {request.POST.get('MessageSid')}: bad Twilio signature")
+        return HttpResponse(status=403)
+    try:
+        record_delivery_status(request.POST.get('MessageSid'), request.POST.get('MessageStatus'),
+                               request.POST.get('ErrorCode'))
+    except Exception as e:
+        logger.error(f"Error recording SMS status for {request.POST.get('MessageSid')}: {e}")
+    return HttpResponse(status=204)
+
+
+# Debug view to monitor live calls
 class DebugView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
-        session_details = {}
-        for call_sid, value in SESSION_CONTEXT.items():
-            session_details[call_sid] = {
-                'restaurant': value.get('restaurant_data', {}).get('restaurant_name'),
-                'current_flow': value.get('current_flow'),
-                'reservation_details': value.get('reservation_details', {}),
-                'last_messages': value.get("messages", [])[-2:] if value.get("messages") else []
-            }
+        registry = get_session_registry()
+        try:
+            limit = min(int(request.GET.get('limit', 20)), 100)
+        except ValueError:
+            limit = 20
+        counts = registry.counts()
         return Response({
-            'active_sessions': len(SESSION_CONTEXT),
-            'sessions': session_details
+            'active_sessions': counts['active_calls'],
+            'by_restaurant': counts['by_restaurant'],
+            'by_step': counts['by_step'],
+            'recent_sessions': registry.recent(limit),
+            'worker_load': admission.stats(),
         })
 
 
@@ -662,28 +1086,13 @@ def get_menu_by_twilio_number(request):
     if not twilio_number:
         return Response({'error': 'Missing phone number in payload.'}, status=400)
         
-    # Normalize the phone number
-    normalized_number = ''.join(filter(str.isdigit, twilio_number))
-    phone_variations = [
-        f"+{normalized_number}",
-        normalized_number.lstrip('91'),  # Remove India code
-        f"+91{normalized_number}" if not normalized_number.startswith('91') else f"+{normalized_number}",
-        f"+1{normalized_number}" if not normalized_number.startswith('1') else f"+{normalized_number}"
-    ]
-    
-    # Match to SubAdmin by phone
-    subadmin = None
-    for phone in phone_variations:
-        try:
-            subadmin = SubAdminProfile.objects.get(phone_number=phone)
-            break
-        except SubAdminProfile.DoesNotExist:
-            continue
+    # Match to SubAdmin through the phone routing index
+    subadmin = resolve_restaurant(twilio_number)
             
     if not subadmin:
         return Response({
             'error': f'No restaurant found for phone number: {twilio_number}',
-            'tried_variations': phone_variations
+            'normalized_number': to_e164(twilio_number)
         }, status=404)
         
     # Get active menu
@@ -1040,4 +1449,130 @@ async def handle_demo_booking_request(self, user_input):
         Would you like me to help you get started with booking a demo?
         """
     
-    return None
\ No newline at end of file
+    return None
+
+
+
+# ====================== Outbound call campaigns ======================
+from django.db.models import Count, Q
+from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser, MultiPartParser
+from .models import CallCampaign
+from .serializers import CallCampaignSerializer, CampaignRecipientSerializer
+
+
+class CallCampaignViewSet(viewsets.ModelViewSet):
+    """Restaurant call campaigns: POST a list of numbers (or a CSV upload); run_call_campaigns dials them"""
+    serializer_class = CallCampaignSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+    http_method_names = ['get', 'post', 'patch', 'delete', 'head', 'options']
+
+    def get_queryset(self):
+        return CallCampaign.objects.filter(restaurant__user=self.request.user).annotate(
+            total_count=Count('recipients'),
+            pending_count=Count('recipients', filter=Q(recipients__status='pending')),
+            dialing_count=Count('recipients', filter=Q(recipients__status='dialing')),
+            completed_count=Count('recipients', filter=Q(recipients__status='completed')),
+            failed_count=Count('recipients', filter=Q(recipients__status='failed')),
+        )
+
+    def create(self, request, *args, **kwargs):
+        try:
+            restaurant = SubAdminProfile.objects.get(user=request.user)
+        except SubAdminProfile.DoesNotExist:
+            return Response({'error': 'SubAdmin profile not found.'}, status=404)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        campaign = serializer.save(restaurant=restaurant)
+
+        data = self.get_serializer(self.get_queryset().get(pk=campaign.pk)).data
+        data['invalid_numbers'] = serializer.context.get('invalid_numbers', [])
+        return Response(data, status=201)
+
+    def _set_status(self, request, from_statuses, to_status):
+        campaign = self.get_object()
+        if campaign.status not in from_statuses:
+            return Response({'error': f'Campaign is {campaign.status}.'}, status=400)
+        CallCampaign.objects.filter(pk=campaign.pk).update(status=to_status, updated_at=timezone.now())
+        return Response(self.get_serializer(self.get_queryset().get(pk=campaign.pk)).data)
+
+    @action(detail=True, methods=['post'])
+    def pause(self, request, pk=None):
+        return self._set_status(request, ['running'], 'paused')
+
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        return self._set_status(request, ['paused'], 'running')
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        return self._set_status(request, ['running', 'paused'], 'cancelled')
+
+    @action(detail=True, methods=['get'])
+    def recipients(self, request, pk=None):
+        campaign = self.get_object()
+        queryset = campaign.recipients.all()
+        if request.query_params.get('status'):
+            queryset = queryset.filter(status=request.query_params['status'])
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(CampaignRecipientSerializer(page, many=True).data)
+
+
+
+# ====================== Order webhooks ======================
+from .models import WebhookEndpoint, generate_webhook_secret
+from .order_webhooks import replay_dead_letters
+from .serializers import WebhookEndpointSerializer, WebhookDeliverySerializer, WebhookDeadLetterSerializer
+
+
+class WebhookEndpointViewSet(viewsets.ModelViewSet):
+    """Restaurant POS webhooks: order events are POSTed in signed batches by run_webhook_dispatcher"""
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return WebhookEndpoint.objects.filter(restaurant__user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        try:
+            restaurant = SubAdminProfile.objects.get(user=request.user)
+        except SubAdminProfile.DoesNotExist:
+            return Response({'error': 'SubAdmin profile not found.'}, status=404)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(restaurant=restaurant)
+        return Response(serializer.data, status=201)
+
+    @action(detail=True, methods=['post'], url_path='rotate-secret')
+    def rotate_secret(self, request, pk=None):
+        endpoint = self.get_object()
+        endpoint.secret = generate_webhook_secret()
+        endpoint.save(update_fields=['secret', 'updated_at'])
+        return Response(self.get_serializer(endpoint).data)
+
+    @action(detail=True, methods=['get'])
+    def deliveries(self, request, pk=None):
+        queryset = self.get_object().deliveries.order_by('-id')
+        if request.query_params.get('status'):
+            queryset = queryset.filter(status=request.query_params['status'])
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(WebhookDeliverySerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path='dead-letters')
+    def dead_letters(self, request, pk=None):
+        page = self.paginate_queryset(self.get_object().dead_letters.filter(replayed_at__isnull=True))
+        return self.get_paginated_response(WebhookDeadLetterSerializer(page, many=True).data)
+
+    @action(detail=True, methods=['post'])
+    def replay(self, request, pk=None):
+        """Queue dead-lettered events again: all of them, or only the ids listed in `dead_letters`"""
+        queryset = self.get_object().dead_letters.filter(replayed_at__isnull=True)
+        if request.data.get('dead_letters'):
+            queryset = queryset.filter(pk__in=request.data['dead_letters'])
+        deliveries = replay_dead_letters(queryset)
+        return Response({'queued': len(deliveries)})
+